@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+'''
+Config panel benchmark against number of projects: first and next
+opening of the panel, adding and deleting a project, search and
+Default menu posting. Rebuild column is the previous way of showing
+the panel: a radio and a Del button created for every project.
+Real Tk is used with a display, otherwise the mocked widget layer
+of mock_tk.py (as in suite.py). Times are in milliseconds.
+'''
+import argparse
+import os
+import sys
+import tempfile
+import time
+from os import path
+
+BENCH_DIR = path.dirname(path.abspath(__file__))
+sys.path.insert(0, path.dirname(BENCH_DIR))
+from storage import JournalStore
+
+
+def timed(app, func) -> float:
+    '''
+    Return milliseconds of the call and pending redraws.
+    '''
+    start = time.perf_counter()
+    func()
+    app.update_idletasks()
+    return (time.perf_counter() - start) * 1000
+
+def rebuild(app, projects: list) -> None:
+    '''
+    Create widgets of all projects rows in a frame and destroy them.
+    '''
+    import tkinter as tk
+    frame = tk.Frame(app.cfg_frame)
+    for idx, prj in enumerate(projects):
+        tk.Radiobutton(frame, text = prj, value = prj,
+            variable = app.choice_project).grid(row = idx, column = 0)
+        tk.Button(frame, text = "Del").grid(row = idx, column = 2)
+    frame.grid(row = 5, column = 0)
+    app.update_idletasks()
+    frame.destroy()
+
+def bench(size: int) -> dict:
+    from gui import Timer
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        db = JournalStore()
+        db.replace({f"project {num}": {} for num in range(size)})
+        db.close()
+        app = Timer()
+        app.withdraw()
+        result = {"first open": timed(app, app.config_frame)}
+        app.config_frame()
+        result["open"] = timed(app, app.config_frame)
+        app.new_project.set("new project")
+        result["add"] = timed(app, app.cfg_add_project)
+        delete = app.cfg_del_project("new project")
+        result["delete"] = timed(app, lambda: (delete(), delete()))
+        result["search"] = timed(app,
+            lambda: app.project_list.search.set("project 1"))
+        app.project_list.search.set("")
+        result["menu"] = timed(app, app.update_def_menu)
+        projects = app.db.project_names()
+        result["rebuild"] = timed(app, lambda: rebuild(app, projects))
+        app.quit_app()
+        os.chdir("/")
+    return result
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = __doc__.strip())
+    parser.add_argument("--sizes", type = int, nargs = "+",
+        default = [10, 100, 1000, 5000])
+    parser.add_argument("--tk", default = "auto",
+        choices = ("auto", "real", "mock"),
+        help = "widget layer, auto is real with a display")
+    args = parser.parse_args()
+
+    if args.tk == "mock" or (args.tk == "auto" and
+            not os.environ.get("DISPLAY")):
+        sys.path.insert(0, BENCH_DIR)
+        import mock_tk
+        mock_tk.install()
+    import tkinter as tk
+    names = None
+    for size in args.sizes:
+        try:
+            result = bench(size)
+        except tk.TclError as error:
+            sys.exit(f"Tk is not available: {error}")
+        if names is None:
+            names = list(result)
+            print(f"{'projects':>8}" + "".join(f"{name:>12}"
+                for name in names))
+        print(f"{size:>8}" + "".join(f"{result[name]:>12.1f}"
+            for name in names))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+'''
+Timer drift benchmark: sleep(1) tick counting against TimerEngine.
+
+Every loop does some simulated per-tick work (label update, checkpoint),
+drift is measured against time.monotonic() and scaled to 8 hours.
+'''
+import argparse
+import sys
+import time
+from os import path
+from threading import Thread
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+from engine import TimerEngine
+
+
+EIGHT_HOURS = 8 * 3600
+
+
+def busy(work: float) -> None:
+    '''
+    Simulate per-tick work.
+    '''
+    end = time.perf_counter() + work
+    while time.perf_counter() < end:
+        pass
+
+def tick_counter(duration: float, work: float, result: dict) -> None:
+    '''
+    Old timer loop: count one second after each sleep(1).
+    '''
+    seconds = 0
+    wakeups = 0
+    start = time.monotonic()
+    while time.monotonic() - start < duration:
+        busy(work)
+        time.sleep(1)
+        seconds += 1
+        wakeups += 1
+    result["tick counter"] = (seconds, time.monotonic() - start, wakeups)
+
+def engine_loop(duration: float, work: float, result: dict,
+        tick: float = 0, name: str = "engine") -> None:
+    '''
+    Engine timer loop, wakes when displayed seconds change
+    or every tick seconds if given.
+    '''
+    engine = TimerEngine()
+    engine.start()
+    wakeups = 0
+    start = time.monotonic()
+    while time.monotonic() - start < duration:
+        engine.poll()
+        busy(work)
+        time.sleep(tick or engine.next_tick())
+        wakeups += 1
+    engine.stop()
+    result[name] = (engine.elapsed(), time.monotonic() - start, wakeups)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = __doc__.strip())
+    parser.add_argument("--seconds", type = float, default = 30,
+        help = "benchmark duration")
+    parser.add_argument("--work", type = float, default = 0.005,
+        help = "simulated work per tick, seconds")
+    args = parser.parse_args()
+
+    result = {}
+    threads = [
+        Thread(target = tick_counter,
+            args = (args.seconds, args.work, result)),
+        Thread(target = engine_loop,
+            args = (args.seconds, args.work, result)),
+        Thread(target = engine_loop,
+            args = (args.seconds, args.work, result, 5, "engine, 5 s ticks")),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    print(f"{'method':<20}{'counted':>10}{'real':>10}" +
+        f"{'drift/8h, s':>14}{'wakeups/h':>12}")
+    for name, (seconds, real, wakeups) in result.items():
+        drift = (real - seconds) / real * EIGHT_HOURS
+        print(f"{name:<20}{seconds:>10.2f}{real:>10.2f}" +
+            f"{drift:>14.1f}{wakeups / real * 3600:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+'''
+Change history against number of events. Every event is a timer
+checkpoint: one journal record plus one audit log event.
+- rebuild: JournalStore load of the database (snapshot plus journal
+  replay) with all its rollups, without compaction the whole journal
+  is replayed, with compaction every COMPACT_RECORDS records at most
+  that many are.
+- log query: HistoryStore.events() of one project, last 50 events.
+- undo: undo of a deleted day, the log is read to find it.
+Times are best of runs in milliseconds.
+'''
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from os import path
+
+BENCH_DIR = path.dirname(path.abspath(__file__))
+sys.path.insert(0, path.dirname(BENCH_DIR))
+import storage
+from history import HistoryStore
+from storage import JournalStore
+from suite import SCALES, TODAY, history
+
+
+def best(func, runs: int, setup = None) -> float:
+    times = []
+    for _ in range(runs):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times)
+
+def rebuild(db_file: str) -> None:
+    db = JournalStore(db_file)
+    for prj in db.project_names():
+        db.rollup(prj, "week")
+    db.close()
+
+def write_events(db_file: str, projects: dict, count: int,
+        compact: int) -> int:
+    '''
+    Write the database and count checkpoints, return number
+    of journal records left.
+    '''
+    storage.COMPACT_RECORDS = compact
+    db = HistoryStore(JournalStore(db_file),
+        path.join(path.dirname(db_file), "data.events"))
+    db.fsync = False
+    db.replace(projects)
+    names = list(projects)
+    for idx in range(count):
+        db.add_time(names[idx % len(names)],
+            TODAY - timedelta(days = idx % 30), 30)
+    db.close()
+    journal = path.splitext(db_file)[0] + ".wal"
+    if not path.exists(journal):
+        return 0
+    with open(journal, "rb") as f:
+        return sum(1 for line in f)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = __doc__.strip())
+    parser.add_argument("--counts", nargs = "+", type = int,
+        default = [0, 1000, 10000, 100000])
+    parser.add_argument("--scale", default = "medium", choices = list(SCALES))
+    parser.add_argument("--runs", type = int, default = 3)
+    args = parser.parse_args()
+
+    projects = history(*SCALES[args.scale])
+    prj = next(iter(projects))
+    print(f"{args.scale}: {len(projects)} projects, " +
+        f"{sum(map(len, projects.values()))} rows")
+    print(f"{'events':>8}{'replay, ms':>12}{'compacted, ms':>15}" +
+        f"{'records':>9}{'log, KiB':>10}{'query, ms':>11}{'undo, ms':>10}")
+    compact = storage.COMPACT_RECORDS
+    for count in args.counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_file = path.join(tmp, "full", "data.wtdb")
+            os.mkdir(path.dirname(db_file))
+            write_events(db_file, projects, count, count + 1)
+            replay = best(lambda: rebuild(db_file), args.runs)
+
+            db_file = path.join(tmp, "compacted", "data.wtdb")
+            os.mkdir(path.dirname(db_file))
+            records = write_events(db_file, projects, count, compact)
+            compacted = best(lambda: rebuild(db_file), args.runs)
+
+            events_file = path.join(tmp, "compacted", "data.events")
+            db = HistoryStore(JournalStore(db_file), events_file)
+            query = best(lambda: db.events(project = prj, limit = 50),
+                args.runs)
+            day = TODAY - timedelta(days = 1)
+            def delete() -> None:
+                db.add_time(prj, day, 60)
+                db.del_day(prj, day)
+            undo = best(db.undo, args.runs, delete)
+            db.close()
+            print(f"{count:>8}{replay:>12.1f}{compacted:>15.1f}" +
+                f"{records:>9}{path.getsize(events_file) / 1024:>10.1f}" +
+                f"{query:>11.1f}{undo:>10.1f}")
+    storage.COMPACT_RECORDS = compact
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+'''
+Idle detection overhead: cost of IdleMonitor.check() per timer tick
+between source queries and with a query on every check, for the
+simulated source and the X screensaver source if a display is available.
+Times are in microseconds.
+'''
+import argparse
+import sys
+import time
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+from engine import TimerEngine
+from idle import IdleMonitor, SimulatedSource, XScreenSaverSource
+
+
+def per_call(func, number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    return (time.perf_counter() - start) * 1e6 / number
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = __doc__.strip())
+    parser.add_argument("--number", type = int, default = 100000)
+    args = parser.parse_args()
+
+    sources = {"simulated": SimulatedSource()}
+    try:
+        sources["x screensaver"] = XScreenSaverSource()
+    except OSError as error:
+        print(f"x screensaver: {error}")
+    engine = TimerEngine()
+    engine.start()
+    print(f"timer poll: {per_call(engine.poll, args.number):.3f} us")
+    for name, source in sources.items():
+        cached = IdleMonitor(source)
+        cached.check()
+        query = IdleMonitor(source, poll = 0)
+        print(f"{name}: check {per_call(cached.check, args.number):.3f} us, " +
+            f"check with query {per_call(query.check, args.number):.3f} us")
+        source.close()
+
+
+if __name__ == "__main__":
+    main()
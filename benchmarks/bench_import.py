@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+'''
+Import benchmark: parse and apply a generated CSV time log, then
+merge a small import into the filled database. Incremental merge time
+depends on the size of the small import, not of the database.
+'''
+import argparse
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+import storage
+import transfer
+
+
+def generate(filename: str, lines: int, projects: int) -> None:
+    '''
+    Write import file with lines spread over projects and days.
+    '''
+    first = date(2000, 1, 1)
+    days = [(first + timedelta(i)).isoformat()
+        for i in range(lines // projects + 1)]
+    names = [f"Project {i}" if i % 10 else f'"Project, {i}"'
+        for i in range(projects)]
+    rnd = random.Random(1)
+    with open(filename, "w") as f:
+        for idx in range(lines):
+            prj = names[idx % projects]
+            day = days[idx // projects]
+            f.write(f"{prj},{day},{rnd.randrange(1, 36000)}\n")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = __doc__.strip())
+    parser.add_argument("--lines", type = int, default = 1000000)
+    parser.add_argument("--projects", type = int, default = 500)
+    parser.add_argument("--merge-lines", type = int, default = 1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = path.join(tmp, "import.txt")
+        generate(filename, args.lines, args.projects)
+        size = path.getsize(filename) / 2 ** 20
+
+        progress = transfer.Progress()
+        result = transfer.parse_file(filename, "merge", progress)
+        print(f"parse: {args.lines} lines, {size:.1f} MiB in " +
+            f"{result.elapsed:.2f} s, {args.lines / result.elapsed:.0f} " +
+            f"lines/s, {result.error_count} errors")
+
+        db = storage.JournalStore(path.join(tmp, "data.wtdb"))
+        start = time.perf_counter()
+        transfer.apply_import(db, result, "merge")
+        print(f"apply: {time.perf_counter() - start:.2f} s")
+
+        small = path.join(tmp, "small.txt")
+        generate(small, args.merge_lines, 2)
+        for mode in ("sum", "max"):
+            start = time.perf_counter()
+            result, diff = transfer.import_file(db, small, mode)
+            print(f"{mode}: {args.merge_lines} lines in " +
+                f"{(time.perf_counter() - start) * 1000:.1f} ms, " +
+                diff.summary())
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
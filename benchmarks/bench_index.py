@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+'''
+Microbenchmarks of today lookup, project totals and rollups
+for projects with long histories, journal backend.
+'''
+import sys
+import tempfile
+import timeit
+from datetime import date, timedelta
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+import storage
+
+
+def bench(stmt, number: int = 1000) -> float:
+    '''
+    Return microseconds per call.
+    '''
+    return timeit.timeit(stmt, number = number) / number * 1e6
+
+def main() -> None:
+    print(f"{'days':>8}{'today, us':>12}{'scan today, us':>16}" +
+        f"{'total, us':>12}{'sum total, us':>15}{'months, us':>12}" +
+        f"{'tick, us':>10}" +
+        f"{'del+set, us':>13}")
+    for size in (1000, 10000, 100000):
+        with tempfile.TemporaryDirectory() as tmp:
+            db = storage.JournalStore(path.join(tmp, "data.wtdb"))
+            first = date(2000, 1, 1)
+            today = first + timedelta(size - 1)
+            db.replace({"prj": {first + timedelta(i): 3600
+                for i in range(size)}})
+            days = dict(db.days("prj"))
+            db.fsync = False
+
+            today_time = bench(lambda: db.day_time("prj", today))
+            scan_today = bench(lambda: [val for day, val in days.items()
+                if day == today], 10)
+            total = bench(lambda: db.total("prj"))
+            month = bench(lambda: db.rollup("prj", "month"))
+            sum_total = bench(lambda: sum(sec for sec in days.values()), 10)
+            tick = bench(lambda: db.add_time("prj", today, 1, save = False))
+
+            def del_set() -> None:
+                db.del_day("prj", first)
+                db.set_time("prj", first, 3600)
+            delete = bench(del_set, 100)
+            db.close()
+
+        print(f"{size:>8}{today_time:>12.2f}{scan_today:>16.2f}" +
+            f"{total:>12.2f}{sum_total:>15.2f}{month:>12.2f}" +
+            f"{tick:>10.2f}{delete:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+'''
+Memory use, snapshot size and load time of the projects database:
+{date: seconds} dicts of previous versions against Days arrays.
+Open time is JournalStore start with the pickle snapshot, index build
+and migration to the current format included (dicts snapshot is
+converted to Days on load). See bench_snapshot.py for the current format.
+'''
+import argparse
+import pickle
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+from storage import Days, JournalStore
+
+
+def measure(build) -> tuple:
+    '''
+    Return (object, allocated MB) of build function result.
+    '''
+    tracemalloc.start()
+    obj = build()
+    size = tracemalloc.get_traced_memory()[0] / 2 ** 20
+    tracemalloc.stop()
+    return obj, size
+
+def timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) * 1000
+
+def open_time(data: bytes) -> float:
+    '''
+    Return milliseconds of JournalStore start with snapshot data.
+    '''
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = path.join(tmp, "data.pyc")
+        with open(db_file, "wb") as f:
+            f.write(data)
+        elapsed = timed(lambda: JournalStore(db_file).close())
+    return elapsed
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = __doc__.strip())
+    parser.add_argument("--years", type = int, default = 10)
+    parser.add_argument("--projects", type = int, default = 100)
+    parser.add_argument("--density", type = float, default = 0.7)
+    args = parser.parse_args()
+
+    random.seed(1)
+    first = date(2000, 1, 1).toordinal()
+    span = args.years * 365
+    rows = [[(first + idx, random.randint(600, 30000)) for idx in range(span)
+        if random.random() < args.density] for num in range(args.projects)]
+    print(f"{sum(map(len, rows))} rows, {args.projects} projects, " +
+        f"{args.years} years")
+
+    dicts, dicts_mb = measure(lambda: {f"project {num}":
+        {date.fromordinal(day): sec for day, sec in days}
+        for num, days in enumerate(rows)})
+    columns, columns_mb = measure(lambda: {prj: Days(days)
+        for prj, days in dicts.items()})
+    print(f"{'layout':<8}{'memory, MB':>12}{'snapshot, MB':>14}" +
+        f"{'load, ms':>10}{'open, ms':>10}")
+    for name, projects, memory in (("dicts", dicts, dicts_mb),
+            ("Days", columns, columns_mb)):
+        data = pickle.dumps({"projects": projects, "default": None},
+            pickle.HIGHEST_PROTOCOL)
+        load = timed(lambda: pickle.loads(data))
+        print(f"{name:<8}{memory:>12.1f}{len(data) / 2 ** 20:>14.2f}" +
+            f"{load:>10.1f}{open_time(data):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
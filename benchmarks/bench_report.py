@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+'''
+Reports benchmark over a synthetic history: years x projects with
+a day worked with given probability, journal backend.
+Times are in milliseconds: cold (columns are loaded), warm (cached)
+and after a timer tick in one project (its columns are rebuilt).
+'''
+import argparse
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+from report import Reports
+from storage import JournalStore, period_key
+
+
+def timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return (time.perf_counter() - start) * 1000
+
+def naive_months(db) -> dict:
+    '''
+    Month totals of all projects by a loop over all rows.
+    '''
+    result = {}
+    for prj, day, sec in db.items():
+        key = period_key(day, "month")
+        result[key] = result.get(key, 0) + sec
+    return result
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = __doc__.strip())
+    parser.add_argument("--years", type = int, default = 10)
+    parser.add_argument("--projects", type = int, default = 500)
+    parser.add_argument("--density", type = float, default = 0.7)
+    args = parser.parse_args()
+
+    random.seed(1)
+    first = date(2000, 1, 1)
+    span = args.years * 365
+    projects = {f"project {num}": {first + timedelta(days = idx):
+        random.randint(600, 30000) for idx in range(span)
+            if random.random() < args.density}
+        for num in range(args.projects)}
+    rows = sum(len(days) for days in projects.values())
+    today = first + timedelta(days = span - 1)
+    one = "project 0"
+
+    reports = {
+        "totals": lambda r: r.totals(),
+        "months, all": lambda r: r.periods("month"),
+        "weeks, all": lambda r: r.periods("week"),
+        "months, one": lambda r: r.periods("month", one),
+        "30d average, all": lambda r: r.rolling_average(30),
+        "streaks, one": lambda r: r.streaks(one, today = today),
+        "billable, all": lambda r: r.billable(900),
+        "billable, one": lambda r: r.billable(900, prj = one),
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        db = JournalStore(path.join(tmp, "data.wtdb"))
+        db.fsync = False
+        db.replace(projects)
+        print(f"{rows} rows, {args.projects} projects, {args.years} years")
+        print(f"naive months loop: {timed(lambda: naive_months(db)):.1f} ms")
+        print(f"{'report':<18}{'cold, ms':>10}{'warm, ms':>10}" +
+            f"{'tick, ms':>10}")
+        for name, func in reports.items():
+            rep = Reports(db)
+            cold = timed(lambda: func(rep))
+            warm = timed(lambda: func(rep))
+            db.add_time(one, today, 1, save = False)
+            tick = timed(lambda: func(rep))
+            print(f"{name:<18}{cold:>10.1f}{warm:>10.3f}{tick:>10.1f}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
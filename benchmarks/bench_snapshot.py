@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+'''
+Snapshot formats: file size, JournalStore open time and full load time
+of the pickle snapshot of previous versions against the block format
+with each codec. Open decodes the default project only (block format),
+full load decodes every project and builds all rollups.
+Times are best of runs in milliseconds.
+'''
+import argparse
+import os
+import pickle
+import sys
+import tempfile
+import time
+from os import path
+
+BENCH_DIR = path.dirname(path.abspath(__file__))
+sys.path.insert(0, path.dirname(BENCH_DIR))
+import snapshot
+from storage import Days, Index, JournalStore
+from suite import SCALES, history
+
+
+def best(func, runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return min(times)
+
+def open_store(db_file: str, full: bool) -> None:
+    db = JournalStore(db_file)
+    db.day_count(db.default)
+    if full:
+        for prj in db.project_names():
+            db.rollup(prj, "week")
+    db.close()
+
+def load_pickle(db_file: str) -> None:
+    '''
+    Load of previous versions: unpickle and build the index.
+    '''
+    with open(db_file, "rb") as f:
+        data = pickle.load(f)
+    Index().build(data["projects"], data["tags"])
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = __doc__.strip())
+    parser.add_argument("--scales", nargs = "+",
+        default = ["medium", "large"], choices = list(SCALES))
+    parser.add_argument("--runs", type = int, default = 5)
+    args = parser.parse_args()
+
+    for scale in args.scales:
+        projects = {prj: Days(days)
+            for prj, days in history(*SCALES[scale]).items()}
+        default = next(iter(projects))
+        rows = sum(len(days) for days in projects.values())
+        print(f"{scale}: {len(projects)} projects, {rows} rows")
+        print(f"  {'format':<10}{'size, KiB':>12}{'open, ms':>10}" +
+            f"{'full, ms':>10}")
+        with tempfile.TemporaryDirectory() as tmp:
+            db_file = path.join(tmp, "data.pyc")
+            with open(db_file, "wb") as f:
+                pickle.dump({"projects": projects, "tags": {},
+                    "default": default}, f, pickle.HIGHEST_PROTOCOL)
+            load = best(lambda: load_pickle(db_file), args.runs)
+            print(f"  {'pickle':<10}{path.getsize(db_file) / 1024:>12.1f}" +
+                f"{load:>10.1f}{load:>10.1f}")
+            os.remove(db_file)
+
+            db_file = path.join(tmp, "data.wtdb")
+            histories = {prj: days.history()
+                for prj, days in projects.items()}
+            for codec in snapshot.CODECS:
+                with open(db_file, "wb") as f:
+                    snapshot.dump(f, default, histories, {}, codec)
+                opened = best(lambda: open_store(db_file, False), args.runs)
+                full = best(lambda: open_store(db_file, True), args.runs)
+                print(f"  {codec:<10}" +
+                    f"{path.getsize(db_file) / 1024:>12.1f}" +
+                    f"{opened:>10.1f}{full:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
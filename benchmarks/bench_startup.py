@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+'''
+Cold start benchmark of headless "status" command
+against bare interpreter start. Exits with 1 when the status
+start time over the interpreter start exceeds the target,
+the interpreter start itself depends on the machine only.
+'''
+import argparse
+import compileall
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from os import path
+
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+SCRIPT = path.join(ROOT, "working_timer.py")
+
+
+def run_times(cmd: list, runs: int, cwd: str) -> list:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd = cwd, check = True,
+            stdout = subprocess.DEVNULL)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = __doc__.strip())
+    parser.add_argument("--runs", type = int, default = 20)
+    parser.add_argument("--target", type = float, default = 50.0,
+        help = "status start time over interpreter start, ms")
+    args = parser.parse_args()
+
+    # Bytecode is cached as after the first run of an installed app,
+    # also with PYTHONDONTWRITEBYTECODE set
+    compileall.compile_dir(ROOT, maxlevels = 0, quiet = 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        subprocess.run([sys.executable, SCRIPT, "start", "bench"], cwd = tmp,
+            check = True, stdout = subprocess.DEVNULL)
+        results = {
+            "python -c pass": run_times([sys.executable, "-c", "pass"],
+                args.runs, tmp),
+            "status": run_times([sys.executable, SCRIPT, "status"],
+                args.runs, tmp),
+        }
+        imports = subprocess.run([sys.executable, "-X", "importtime", SCRIPT,
+            "status"], cwd = tmp, check = True, capture_output = True,
+            text = True).stderr
+
+    for name, times in results.items():
+        print(f"{name:<16} median {statistics.median(times):6.1f} ms, " +
+            f"min {min(times):6.1f} ms")
+    overhead = (statistics.median(results["status"]) -
+        statistics.median(results["python -c pass"]))
+    print(f"status overhead over interpreter start: {overhead:.1f} ms")
+    print("tkinter imported:", "yes" if " tkinter" in imports else "no")
+    if overhead > args.target:
+        print(f"target of {args.target:.0f} ms exceeded")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
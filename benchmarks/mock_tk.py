@@ -0,0 +1,271 @@
+'''
+Mocked tkinter widget layer for headless benchmarks.
+
+install() puts this module in place of tkinter before the GUI is
+imported. Widgets keep their options and rows in Python objects and
+draw nothing, so benchmarks measure the app side of refreshes: data
+fetching, formatting and the number of widget calls. after() callbacks
+run from update() when they are due, like in the Tk event loop.
+'''
+import sys
+import time
+from types import SimpleNamespace
+
+
+END = "end"
+VERTICAL = "vertical"
+HORIZONTAL = "horizontal"
+
+
+class TclError(Exception):
+    pass
+
+
+class Variable:
+    def __init__(self, master = None, value = None):
+        self.value = value
+        self.traces = []
+
+    def set(self, value) -> None:
+        self.value = value
+        for callback in self.traces:
+            callback("", "", "write")
+
+    def get(self):
+        return self.value
+
+    def trace_add(self, mode: str, callback) -> None:
+        self.traces.append(callback)
+
+
+class StringVar(Variable):
+    def get(self) -> str:
+        return "" if self.value is None else str(self.value)
+
+
+class BooleanVar(Variable):
+    def get(self) -> bool:
+        return bool(self.value)
+
+
+class Misc:
+    '''
+    Widget keeping its options, every call is counted.
+    '''
+    calls = 0 # widget calls of all widgets
+    jobs = {} # after job id -> (due time, callback, args)
+    job_num = 0
+
+    def __init__(self, master = None, cnf = None, **kwargs):
+        Misc.calls += 1
+        self.master = master
+        self.options = dict(kwargs)
+        self.children = []
+        self.exists = True
+        self.mapped = False
+        if master is not None:
+            master.children.append(self)
+
+    def configure(self, cnf = None, **kwargs) -> None:
+        Misc.calls += 1
+        self.options.update(cnf or {}, **kwargs)
+
+    config = configure
+
+    def cget(self, key: str):
+        return self.options.get(key, "")
+
+    def __setitem__(self, key: str, value) -> None:
+        self.configure(**{key: value})
+
+    def __getitem__(self, key: str):
+        return self.cget(key)
+
+    def grid(self, **kwargs) -> None:
+        Misc.calls += 1
+        self.mapped = True
+
+    def grid_remove(self) -> None:
+        Misc.calls += 1
+        self.mapped = False
+
+    def grid_columnconfigure(self, *args, **kwargs) -> None:
+        pass
+
+    def bind(self, sequence: str, func = None, add = None) -> None:
+        pass
+
+    bind_all = bind
+
+    def destroy(self) -> None:
+        self.exists = False
+        for child in self.children:
+            child.destroy()
+
+    def winfo_exists(self) -> bool:
+        return self.exists
+
+    def after(self, ms: int, func, *args) -> str:
+        Misc.job_num += 1
+        job = f"after#{Misc.job_num}"
+        Misc.jobs[job] = (time.monotonic() + ms / 1000, func, args)
+        return job
+
+    def after_cancel(self, job: str) -> None:
+        Misc.jobs.pop(job, None)
+
+    def update(self) -> None:
+        '''
+        Run due after() callbacks.
+        '''
+        now = time.monotonic()
+        for job, (due, func, args) in list(Misc.jobs.items()):
+            if due <= now and Misc.jobs.pop(job, None):
+                func(*args)
+
+    def update_idletasks(self) -> None:
+        pass
+
+
+class Tk(Misc):
+    def __init__(self, screenName = None, baseName = None,
+            className = "Tk", **kwargs):
+        Misc.__init__(self)
+
+    def title(self, text: str = None) -> None:
+        pass
+
+    def attributes(self, *args) -> None:
+        pass
+
+    def state(self) -> str:
+        return "normal"
+
+    def withdraw(self) -> None:
+        pass
+
+    def mainloop(self) -> None:
+        pass
+
+
+class Toplevel(Tk):
+    def __init__(self, master = None, **kwargs):
+        Misc.__init__(self, master, **kwargs)
+
+
+class Frame(Misc):
+    pass
+
+
+class Label(Misc):
+    pass
+
+
+class Button(Misc):
+    pass
+
+
+class Radiobutton(Misc):
+    def invoke(self) -> None:
+        Misc.calls += 1
+        self.options["variable"].set(self.options["value"])
+        if self.options.get("command"):
+            self.options["command"]()
+
+
+class Entry(Misc):
+    pass
+
+
+class Menubutton(Misc):
+    pass
+
+
+class Scrollbar(Misc):
+    def set(self, first: float, last: float) -> None:
+        Misc.calls += 1
+
+
+class Menu(Misc):
+    def __init__(self, master = None, **kwargs):
+        Misc.__init__(self, master, **kwargs)
+        self.items = []
+
+    def add_command(self, **kwargs) -> None:
+        self.insert_radiobutton(len(self.items), **kwargs)
+
+    add_radiobutton = add_checkbutton = add_command
+
+    def add_separator(self) -> None:
+        self.add_command()
+
+    def insert_radiobutton(self, index: int, **kwargs) -> None:
+        Misc.calls += 1
+        self.items.insert(index, kwargs)
+
+    def delete(self, first, last = None) -> None:
+        Misc.calls += 1
+        if isinstance(first, str) and first != END:
+            # Index of the item by its label
+            first = next((idx for idx, item in enumerate(self.items)
+                if item.get("label") == first), None)
+            if first is None:
+                return
+        start = 0 if first == END else first
+        stop = len(self.items) if last == END else (last or start) + 1
+        del self.items[start:stop]
+
+
+class Listbox(Misc):
+    def __init__(self, master = None, **kwargs):
+        Misc.__init__(self, master, **kwargs)
+        self.rows = []
+        self.selection = ()
+
+    def insert(self, index, *rows) -> None:
+        Misc.calls += 1
+        index = len(self.rows) if index == END else index
+        self.rows[index:index] = rows
+
+    def delete(self, first, last = None) -> None:
+        Misc.calls += 1
+        start = len(self.rows) - 1 if first == END else first
+        stop = len(self.rows) if last == END else (last or start) + 1
+        del self.rows[start:stop]
+
+    def curselection(self) -> tuple:
+        return self.selection
+
+    def selection_set(self, index: int) -> None:
+        self.selection = (index,)
+
+    def selection_clear(self, first, last = None) -> None:
+        self.selection = ()
+
+
+class Text(Misc):
+    def __init__(self, master = None, **kwargs):
+        Misc.__init__(self, master, **kwargs)
+        self.text = ""
+
+    def insert(self, index, text: str) -> None:
+        self.text += text
+
+    def delete(self, first, last = None) -> None:
+        self.text = ""
+
+
+# Dialogs return benchmark's file names and answers
+filedialog = SimpleNamespace(askopenfilename = lambda **kwargs: "",
+    asksaveasfilename = lambda **kwargs: "")
+messagebox = SimpleNamespace(askyesno = lambda *args, **kwargs: True)
+
+
+def install() -> None:
+    '''
+    Use the mock instead of tkinter for modules imported later.
+    '''
+    module = sys.modules[__name__]
+    sys.modules["tkinter"] = module
+    sys.modules["tkinter.filedialog"] = filedialog
+    sys.modules["tkinter.messagebox"] = messagebox
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+'''
+Concurrent writers stress run: many processes checkpoint timers
+into the same database files at once, some cells are shared by all
+of them. Frequent compaction makes the processes snapshot and reload
+under each other. At the end every counted second must be in the
+database.
+'''
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from multiprocessing import Process
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+import storage
+from storage import Checkpointer, load_db
+
+
+def writer(num: int, rounds: int, backend: str, compact: int) -> None:
+    '''
+    Run a timer of own project and a timer of shared project,
+    both counting one second per round.
+    '''
+    storage.COMPACT_RECORDS = compact
+    db = load_db(backend)
+    db.fsync = False
+    day = date.today() - timedelta(days = num % 3)
+    own = Checkpointer(db, interval = 0)
+    shared = Checkpointer(db, interval = 3600, max_unsaved = 7)
+    own.start(f"writer {num}", day, 0)
+    shared.start("shared", day, db.day_time("shared", day))
+    base = db.day_time("shared", day)
+    for sec in range(1, rounds + 1):
+        own.update(f"writer {num}", day, sec)
+        shared.update("shared", day, base + sec)
+    own.stop()
+    shared.stop()
+    db.close()
+
+def check(backend: str, procs: int, rounds: int) -> list:
+    '''
+    Return list of wrong totals.
+    '''
+    db = load_db(backend)
+    errors = []
+    for num in range(procs):
+        total = db.total(f"writer {num}")
+        if total != rounds:
+            errors.append(f"writer {num}: {total} != {rounds}")
+    if db.total("shared") != procs * rounds:
+        errors.append(f"shared: {db.total('shared')} != {procs * rounds}")
+    db.close()
+    return errors
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = __doc__.strip())
+    parser.add_argument("--procs", type = int, default = 16)
+    parser.add_argument("--rounds", type = int, default = 500)
+    parser.add_argument("--compact", type = int, default = 50,
+        help = "journal records before compaction")
+    parser.add_argument("--backend", default = "journal",
+        choices = ("journal", "sqlite"))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        start = time.perf_counter()
+        workers = [Process(target = writer, args = (num, args.rounds,
+            args.backend, args.compact)) for num in range(args.procs)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        failed = [worker.exitcode for worker in workers if worker.exitcode]
+        errors = check(args.backend, args.procs, args.rounds)
+
+    writes = args.procs * args.rounds * 2
+    print(f"{args.procs} processes, {writes} cell writes in {elapsed:.2f} s" +
+        f" ({writes / elapsed:.0f} writes/s)")
+    if failed:
+        errors.append(f"{len(failed)} processes failed")
+    for error in errors:
+        print(error)
+    print("FAILED" if errors else "OK")
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+'''
+Benchmark suite of storage, import/export and GUI refresh paths
+on synthetic histories of several scales. Results are written to JSON,
+runs of different commits are compared with --compare.
+GUI cases use real Tk when a display is available (e.g. under
+xvfb-run), otherwise the mocked widget layer of mock_tk.py, which
+measures the app side of refreshes without drawing.
+'''
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from os import path
+
+BENCH_DIR = path.dirname(path.abspath(__file__))
+sys.path.insert(0, path.dirname(BENCH_DIR))
+from storage import Checkpointer, load_db, save_projects
+from transfer import apply_import, export_file, parse_file
+
+
+SCALES = {"small": (10, 1), "medium": (100, 5), "large": (500, 10)}
+DENSITY = 0.7 # probability of a worked day
+SEED = 1
+TODAY = date(2020, 1, 1)
+JOURNAL_CHANGES = 1000 # journal records replayed by load with changes
+TAGS = 10 # tagged timers of one project running at once
+
+
+def history(projects: int, years: int) -> dict:
+    '''
+    Return synthetic {project: {day: seconds}} ending with TODAY.
+    '''
+    rand = random.Random(SEED)
+    days = [TODAY - timedelta(days = idx) for idx in range(years * 365)]
+    days.reverse()
+    return {f"project {num}": {day: rand.randint(600, 30000)
+        for day in days if rand.random() < DENSITY}
+        for num in range(projects)}
+
+def measure(func, setup = None, repeat: int = 3, number: int = 1) -> dict:
+    '''
+    Return milliseconds per call of repeated runs.
+    '''
+    runs = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        runs.append((time.perf_counter() - start) * 1000 / number)
+    return {"median": statistics.median(runs), "min": min(runs),
+        "runs": runs}
+
+def bench_storage(backend: str, projects: dict, repeat: int) -> dict:
+    '''
+    Time storage and import/export paths in the current directory.
+    '''
+    results = {}
+    db = load_db(backend)
+    db.replace(projects)
+    db.close()
+    opened = []
+
+    def open_db() -> None:
+        opened.append(load_db(backend))
+    def close_all() -> None:
+        while opened:
+            opened.pop().close()
+
+    results["load_db"] = measure(open_db, close_all, repeat)
+    close_all()
+
+    db = load_db(backend)
+    prj = next(iter(projects))
+    checkpointer = Checkpointer(db)
+    checkpointer.start(prj, TODAY, db.day_time(prj, TODAY))
+    seconds = [db.day_time(prj, TODAY)]
+
+    def checkpoint() -> None:
+        seconds[0] += 1
+        checkpointer.update(prj, TODAY, seconds[0])
+        checkpointer.save()
+        save_projects(db)
+    results["checkpoint + save_projects"] = measure(checkpoint,
+        repeat = repeat, number = 10)
+    checkpointer.stop()
+
+    tags = [f"task {num}" for num in range(TAGS)]
+    for tag in tags:
+        checkpointer.start(prj, TODAY, 0, tag)
+    def checkpoint_tags() -> None:
+        seconds[0] += 1
+        for tag in tags:
+            checkpointer.update(prj, TODAY, seconds[0], tag)
+        checkpointer.save()
+    results[f"checkpoint {TAGS} tagged timers"] = measure(checkpoint_tags,
+        repeat = repeat, number = 10)
+    checkpointer.stop()
+    results["tag_totals"] = measure(lambda: db.tag_totals(prj),
+        repeat = repeat, number = 100)
+
+    for day in range(JOURNAL_CHANGES):
+        db.set_time(prj, TODAY - timedelta(days = day), day)
+    db.close()
+    results[f"load_db, {JOURNAL_CHANGES} changes"] = measure(open_db,
+        close_all, repeat)
+    close_all()
+
+    db = load_db(backend)
+    for fmt in ("csv", "bin"):
+        results[f"export {fmt}"] = measure(
+            lambda: export_file(f"export.{fmt}", db.items(), fmt),
+            repeat = repeat)
+    results["import csv, merge"] = measure(lambda: apply_import(db,
+        parse_file("export.csv", "merge"), "merge"), repeat = repeat)
+    db.close()
+    return results
+
+def bench_gui(projects: dict, repeat: int) -> dict:
+    '''
+    Time GUI paths in the current directory, journal backend.
+    With mocked widgets number of widget calls per call is counted too.
+    '''
+    import gui
+
+    def measure_gui(func, setup = None, repeat: int = 3,
+            number: int = 1) -> dict:
+        calls = getattr(gui.tk.Misc, "calls", None)
+        result = measure(func, setup, repeat, number)
+        if calls is not None:
+            result["widget_calls"] = ((gui.tk.Misc.calls - calls) /
+                (repeat * number))
+        return result
+
+    results = {}
+    db = load_db("journal")
+    db.replace(projects)
+    db.set_default(next(iter(projects)))
+    db.close()
+    apps = []
+
+    def start() -> None:
+        apps.append(gui.Timer())
+    def quit_all() -> None:
+        while apps:
+            apps.pop().quit_app()
+
+    results["start"] = measure_gui(start, quit_all, repeat)
+    results["first config open"] = measure_gui(
+        lambda: apps[-1].config_frame(), lambda: (quit_all(), start()),
+        repeat)
+    quit_all()
+
+    app = gui.Timer()
+    app.withdraw()
+    results["get_cur_project_time"] = measure_gui(app.get_cur_project_time,
+        repeat = repeat, number = 100)
+    app.config_frame()
+    app.details_frame()
+    results["update_details"] = measure_gui(app.update_details,
+        repeat = repeat, number = 10)
+
+    def wait_job() -> None:
+        while app.io.busy():
+            app.update()
+            time.sleep(0.001)
+    names = itertools.cycle(list(projects)[:2])
+    results["switch_project"] = measure_gui(
+        lambda: app.switch_project(next(names)), repeat = repeat, number = 10)
+    wait_job()
+    filename = path.abspath("gui_export.txt")
+    gui.fd.asksaveasfilename = lambda **kwargs: filename
+    gui.fd.askopenfilename = lambda **kwargs: filename
+    results["export_projects"] = measure_gui(
+        lambda: (app.export_projects("csv"), wait_job()), repeat = repeat)
+    results["import_projects"] = measure_gui(
+        lambda: (app.import_projects("merge"), wait_job()), repeat = repeat)
+    app.quit_app()
+    return results
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+            cwd = BENCH_DIR, capture_output = True, text = True,
+            check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(base_file: str, results: dict, threshold: float,
+        min_ms: float) -> list:
+    '''
+    Print best times against base run and return slower cases.
+    Cases faster than min_ms are too noisy to be slower, more widget
+    calls than in base are always reported.
+    '''
+    with open(base_file) as f:
+        base = json.load(f)["results"]
+    slower = []
+    print(f"\n{'case':<48}{'base, ms':>10}{'now, ms':>10}{'ratio':>8}")
+    for name, result in results.items():
+        if name not in base:
+            continue
+        old = base[name]["min"]
+        new = result["min"]
+        ratio = new / old if old else 1.0
+        mark = ""
+        if ratio > 1 + threshold and new >= min_ms:
+            mark = " slower"
+        if result.get("widget_calls", 0) > base[name].get("widget_calls",
+                result.get("widget_calls", 0)):
+            mark += " more widget calls"
+        if mark:
+            slower.append(name)
+        print(f"{name:<48}{old:>10.3f}{new:>10.3f}{ratio:>8.2f}{mark}")
+    return slower
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description = __doc__.strip())
+    parser.add_argument("--scales", nargs = "+", default = ["small", "medium"],
+        choices = list(SCALES))
+    parser.add_argument("--backends", nargs = "+",
+        default = ["journal", "sqlite"], choices = ("journal", "sqlite"))
+    parser.add_argument("--repeat", type = int, default = 5)
+    parser.add_argument("--tk", default = "auto",
+        choices = ("auto", "real", "mock", "none"),
+        help = "widget layer of GUI cases, auto is real with a display")
+    parser.add_argument("--output", default = "bench_results.json")
+    parser.add_argument("--compare", metavar = "BASE_JSON")
+    parser.add_argument("--threshold", type = float, default = 0.2,
+        help = "slowdown ratio over base reported as regression")
+    parser.add_argument("--min-ms", type = float, default = 0.05,
+        help = "faster cases are not compared")
+    args = parser.parse_args()
+
+    tk = args.tk
+    if tk == "auto":
+        tk = "real" if os.environ.get("DISPLAY") else "mock"
+    if tk == "mock":
+        sys.path.insert(0, BENCH_DIR)
+        import mock_tk
+        mock_tk.install()
+
+    results = {}
+    cwd = os.getcwd()
+    for scale in args.scales:
+        projects = history(*SCALES[scale])
+        rows = sum(len(days) for days in projects.values())
+        print(f"{scale}: {len(projects)} projects, {rows} rows")
+        suites = [(backend, lambda backend = backend:
+            bench_storage(backend, projects, args.repeat))
+            for backend in args.backends]
+        if tk != "none":
+            suites.append((f"gui-{tk}",
+                lambda: bench_gui(projects, args.repeat)))
+        for name, func in suites:
+            with tempfile.TemporaryDirectory() as tmp:
+                os.chdir(tmp)
+                try:
+                    cases = func()
+                finally:
+                    os.chdir(cwd)
+            for case, result in cases.items():
+                key = f"{scale}/{name}/{case}"
+                results[key] = result
+                print(f"  {key:<46}{result['median']:>10.3f} ms")
+
+    output = {
+        "commit": git_commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "tk": tk,
+        "scales": {scale: SCALES[scale] for scale in args.scales},
+        "density": DENSITY,
+        "seed": SEED,
+        "repeat": args.repeat,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent = 1)
+    print(f"Results are written to {args.output}")
+    if args.compare:
+        slower = compare(args.compare, results, args.threshold,
+            args.min_ms)
+        if slower:
+            print(f"{len(slower)} cases are slower than base")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+'''
+Command line of the working timer (see working_timer.py).
+
+Without a command starts the GUI, with a command works headless
+on the same database: start, stop, status, report, import, export,
+log and undo.
+tkinter is imported only for the GUI, other modules only by the commands
+using them, so "status" for a status bar starts fast.
+When the daemon is running ("daemon" command) all commands are sent
+to it, so it stays the only writer of the database.
+'''
+import argparse
+import fcntl
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+from os import path
+
+import instrument
+from engine import WORKDAY, format_time, overlapping
+
+
+RUN_FILE = "data.run" # running headless timers: project, tag, day, start
+
+
+def get_project(db, name: str) -> str:
+    '''
+    Return project from arguments or default one.
+    '''
+    if name:
+        return name
+    if db.default and db.has_project(db.default):
+        return db.default
+    return db.first_project()
+
+def timer_name(prj: str, tag: str) -> str:
+    return f"{prj} [{tag}]" if tag else prj
+
+@contextmanager
+def running_timers():
+    '''
+    Yield list of running headless timers, its changes are written back.
+    The file is locked meanwhile, so concurrent starts and stops
+    don't lose each other's timers. Empty list removes the file.
+    '''
+    while True:
+        f = open(RUN_FILE, "a+")
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            # The file could be removed by other process while we waited
+            if path.samestat(os.fstat(f.fileno()), os.stat(RUN_FILE)):
+                break
+        except FileNotFoundError:
+            pass
+        f.close()
+    with f:
+        f.seek(0)
+        data = f.read()
+        timers = json.loads(data) if data else []
+        if isinstance(timers, dict):
+            timers = [timers] # single timer of older versions
+        old = [dict(timer) for timer in timers]
+        yield timers
+        if not timers:
+            os.remove(RUN_FILE)
+        elif timers != old:
+            f.seek(0)
+            f.truncate()
+            json.dump(timers, f)
+
+def today_seconds(timer: dict) -> int:
+    '''
+    Return seconds of the running timer for today.
+    '''
+    today = WORKDAY.today()
+    return int(sum(day_sec for day, day_sec in
+        WORKDAY.split(timer["started"], time.time()) if day == today))
+
+def cmd_start(db, args) -> int:
+    if args.client:
+        state = args.client.call("start", project = args.project,
+            tag = args.tag)
+        print(f"Started {timer_name(state['project'], args.tag)}")
+        return 0
+    prj = get_project(db, args.project)
+    if not prj:
+        print("No project")
+        return 1
+    if not db.has_project(prj):
+        db.add_project(prj)
+    with running_timers() as timers:
+        for timer in timers:
+            if timer["project"] == prj and timer.get("tag") == args.tag:
+                print("Timer is already running for " +
+                    timer_name(prj, args.tag))
+                return 1
+        other = overlapping((prj, args.tag),
+            [(timer["project"], timer.get("tag")) for timer in timers])
+        if other:
+            print(f"Timer is running for {timer_name(*other)}")
+            return 1
+        timers.append({"project": prj, "tag": args.tag,
+            "date": WORKDAY.today().isoformat(), "started": time.time()})
+    print(f"Started {timer_name(prj, args.tag)}")
+    return 0
+
+def cmd_stop(db, args) -> int:
+    if args.client:
+        state = args.client.call("stop", project = args.project,
+            tag = args.tag)
+        for timer in state["stopped"]:
+            print(f"Stopped {timer_name(timer['project'], timer['tag'])}: " +
+                format_time(timer["seconds"]))
+        return 0
+    with running_timers() as timers:
+        stopped = [timer for timer in timers if args.project is None or
+            (timer["project"], timer.get("tag")) == (args.project, args.tag)]
+        if not stopped:
+            print("Timer is not running")
+            return 1
+        with db.group_changes():
+            for timer in stopped:
+                prj, tag = timer["project"], timer.get("tag")
+                sec = 0
+                # A run past the day end is credited to every day it spans
+                for day, day_sec in WORKDAY.split(timer["started"],
+                        time.time()):
+                    db.add_time(prj, day, int(day_sec), tag = tag)
+                    sec += int(day_sec)
+                print(f"Stopped {timer_name(prj, tag)}: {format_time(sec)}")
+        from storage import save_projects
+        save_projects(db)
+        timers[:] = [timer for timer in timers if timer not in stopped]
+    return 0
+
+def cmd_status(db, args) -> int:
+    if args.client and not args.project:
+        state = args.client.call("status")
+        if not state["project"]:
+            print("No project")
+            return 1
+        if not state["running"]:
+            print(f"{state['project']} {format_time(state['seconds'])} stopped")
+        for timer in state["timers"]:
+            print(f"{timer_name(timer['project'], timer['tag'])} " +
+                f"{format_time(timer['seconds'])} running")
+        return 0
+    with running_timers() as timers:
+        timers = [timer for timer in timers
+            if not args.project or timer["project"] == args.project]
+    today = WORKDAY.today()
+    if not timers:
+        prj = get_project(db, args.project)
+        if not prj:
+            print("No project")
+            return 1
+        print(f"{prj} {format_time(db.day_time(prj, today))} stopped")
+        return 0
+    for timer in timers:
+        prj, tag = timer["project"], timer.get("tag")
+        sec = db.tag_time(prj, tag, today) + today_seconds(timer)
+        print(f"{timer_name(prj, tag)} {format_time(sec)} running")
+    return 0
+
+def cmd_report(db, args) -> int:
+    from report import Reports
+    reports = Reports(db)
+    projects = [args.project] if args.project else db.project_names()
+    for prj in projects:
+        line = f"{prj}: {db.total(prj) / 3600:.2f} h"
+        if args.billable:
+            sec = reports.billable(args.billable * 60, args.rounding, prj)
+            line += f", billable {sec / 3600:.2f} h"
+        if args.streaks:
+            current, longest = reports.streaks(prj)
+            line += f", streak {current} days, longest {longest}"
+        if args.average:
+            average = reports.rolling_average(args.average, prj,
+                WORKDAY.today(), WORKDAY.today())
+            if average:
+                line += (f", {args.average} days average" +
+                    f" {average[-1][1] / 3600:.2f} h")
+        print(line)
+        if args.tags:
+            for tag, sec in sorted(db.tag_totals(prj).items()):
+                print(f"  [{tag}]: {sec / 3600:.2f} h")
+        if args.period:
+            for key, sec in sorted(db.rollup(prj, args.period).items()):
+                if isinstance(key, tuple):
+                    key = "-".join(f"{part:02}" for part in key)
+                print(f"  {key}: {sec / 3600:.2f} h")
+    return 0
+
+def cmd_import(db, args) -> int:
+    from transfer import apply_import, import_file, parse_file
+    if args.mode == "replace":
+        if args.dry_run:
+            print("Dry run is available in merge modes only")
+            return 1
+        result = parse_file(args.file, args.mode)
+        apply_import(db, result, args.mode)
+        print(result.summary())
+    else:
+        result, diff = import_file(db, args.file, args.mode, args.dry_run)
+        print(result.summary())
+        print(diff.summary())
+        if args.dry_run:
+            for line in diff.lines():
+                print(line)
+    for line, message in result.errors[1:]:
+        print(f"Line: {line} {message}")
+    return 0
+
+def cmd_export(db, args) -> int:
+    from transfer import export_file
+    start = date.fromisoformat(args.start) if args.start else None
+    end = date.fromisoformat(args.end) if args.end else None
+    rows = db.items(args.project, start, end)
+    count = export_file(args.file, rows, args.format)
+    print(f"Exported {count} lines")
+    return 0
+
+def cmd_log(db, args) -> int:
+    from history import describe
+    since = date.fromisoformat(args.since) if args.since else None
+    for event in db.events(args.kind, args.project, since, args.limit):
+        stamp = datetime.fromtimestamp(event["time"])
+        undone = " (undone)" if event["undone"] else ""
+        print(f"#{event['id']} {stamp:%Y-%m-%d %H:%M:%S} {event['kind']}: " +
+            describe(event) + undone)
+    return 0
+
+def cmd_undo(db, args) -> int:
+    from history import describe
+    events = db.undo()
+    if not events:
+        print("Nothing to undo")
+        return 1
+    for event in events:
+        print(f"Undone #{event['id']} {describe(event)}")
+    return 0
+
+def start_options(parser) -> None:
+    parser.add_argument("project", nargs = "?", help = "default project")
+    parser.add_argument("--tag", help = "task tag inside the project")
+    parser.set_defaults(func = cmd_start)
+
+def stop_options(parser) -> None:
+    parser.add_argument("project", nargs = "?", help = "all timers")
+    parser.add_argument("--tag", help = "task tag inside the project")
+    parser.set_defaults(func = cmd_stop)
+
+def status_options(parser) -> None:
+    parser.add_argument("project", nargs = "?")
+    parser.set_defaults(func = cmd_status)
+
+def report_options(parser) -> None:
+    from report import ROUNDING
+    parser.add_argument("project", nargs = "?")
+    parser.add_argument("--period", choices = ("week", "month", "year"))
+    parser.add_argument("--billable", type = int, metavar = "MINUTES",
+        help = "round every day to billing step")
+    parser.add_argument("--rounding", default = "up", choices = ROUNDING)
+    parser.add_argument("--streaks", action = "store_true",
+        help = "show days in a row worked")
+    parser.add_argument("--average", type = int, metavar = "DAYS",
+        help = "show rolling average of last days")
+    parser.add_argument("--tags", action = "store_true",
+        help = "show hours of project tags")
+    parser.set_defaults(func = cmd_report)
+
+def import_options(parser) -> None:
+    from transfer import IMPORT_MODES
+    parser.add_argument("file")
+    parser.add_argument("--mode", default = "merge", choices = IMPORT_MODES)
+    parser.add_argument("--dry-run", action = "store_true",
+        help = "show changes of a merge without saving them")
+    parser.set_defaults(func = cmd_import)
+
+def export_options(parser) -> None:
+    from transfer import EXPORT_FORMATS
+    parser.add_argument("file")
+    parser.add_argument("--format", default = "csv",
+        choices = list(EXPORT_FORMATS))
+    parser.add_argument("--project", action = "append",
+        help = "project to export, can be repeated")
+    parser.add_argument("--start", help = "first day, iso date")
+    parser.add_argument("--end", help = "last day, iso date")
+    parser.set_defaults(func = cmd_export)
+
+def log_options(parser) -> None:
+    from history import EVENT_KINDS
+    parser.add_argument("--kind", choices = EVENT_KINDS)
+    parser.add_argument("--project")
+    parser.add_argument("--since", help = "first day, iso date")
+    parser.add_argument("--limit", type = int, default = 50,
+        help = "last changes to show, 0 for all")
+    parser.set_defaults(func = cmd_log)
+
+def undo_options(parser) -> None:
+    parser.set_defaults(func = cmd_undo)
+
+# Command: (help, function adding its options)
+COMMANDS = {
+    "start": ("start headless timer", start_options),
+    "stop": ("stop headless timer", stop_options),
+    "status": ("show today time", status_options),
+    "report": ("show project hours", report_options),
+    "import": ("import file", import_options),
+    "export": ("export file", export_options),
+    "log": ("show history of changes", log_options),
+    "undo": ("undo last deletion, import or default change", undo_options),
+    "daemon": ("run timer daemon", None),
+}
+
+def formatter(prog: str) -> argparse.HelpFormatter:
+    '''
+    Return help formatter sized to the terminal without
+    shutil.get_terminal_size(), shutil is slow to import.
+    '''
+    width = int(os.environ.get("COLUMNS", 0))
+    if not width:
+        try:
+            width = os.get_terminal_size(sys.__stdout__.fileno()).columns
+        except (AttributeError, ValueError, OSError):
+            width = 80
+    return argparse.HelpFormatter(prog, width = width - 2)
+
+def parse_args(argv: list):
+    '''
+    Parse arguments. Only the given command is set up (all of them
+    for help or an unknown command), so modules of other commands,
+    needed for their choices, aren't imported.
+    '''
+    parser = argparse.ArgumentParser(prog = "working_timer",
+        description = "Projects working timer. Run without command for GUI.",
+        formatter_class = formatter)
+    parser.add_argument("--profile", metavar = "FILE",
+        help = "record latencies and dump them to JSON file at exit")
+    wanted = argparse.ArgumentParser(prog = "working_timer", add_help = False,
+        formatter_class = formatter)
+    wanted.add_argument("--profile")
+    wanted.add_argument("command", nargs = "?")
+    command = wanted.parse_known_args(argv)[0].command
+    every = command not in COMMANDS or "-h" in argv or "--help" in argv
+    commands = parser.add_subparsers(dest = "command")
+    for name, (text, add_options) in COMMANDS.items():
+        if every or name == command:
+            command_parser = commands.add_parser(name, help = text,
+                formatter_class = formatter)
+            if add_options:
+                add_options(command_parser)
+    return parser.parse_args(argv)
+
+def main(argv: list = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    args = parse_args(argv)
+    if args.profile:
+        instrument.enable(args.profile)
+    if not args.command:
+        from gui import run
+        run()
+        return 0
+    if args.command == "daemon":
+        from daemon import run
+        return run()
+    from client import DaemonError, RemoteStore, connect
+    from storage import load_db
+    args.client = connect()
+    db = RemoteStore(args.client) if args.client else load_db()
+    try:
+        return args.func(db, args)
+    except DaemonError as error:
+        print(error)
+        return 1
+    finally:
+        db.close()
@@ -0,0 +1,226 @@
+'''
+Timer daemon client.
+
+Requests are JSON lines {"cmd": ..., ...} sent over a Unix domain socket,
+replies are {"ok": true, "result": ...} or {"ok": false, "error": ...}.
+Dates, tuples and dicts with non-string keys are tagged for JSON.
+'''
+import json
+import os
+import threading
+from datetime import date
+
+from storage import Store
+
+
+SOCKET_FILE = "data.sock"
+
+
+class DaemonError(Exception):
+    '''
+    Error reply of the daemon.
+    '''
+
+
+def encode(value):
+    '''
+    Return value with dates, tuples and dicts with non-string keys
+    converted for JSON.
+    '''
+    if isinstance(value, date):
+        return {"$d": value.isoformat()}
+    if isinstance(value, dict):
+        if all(isinstance(key, str) for key in value):
+            return {key: encode(val) for key, val in value.items()}
+        return {"$m": [[encode(key), encode(val)]
+            for key, val in value.items()]}
+    if isinstance(value, (list, tuple)):
+        return [encode(item) for item in value]
+    return value
+
+def decode_hook(obj: dict):
+    '''
+    JSON object hook reverting encode().
+    '''
+    if "$d" in obj:
+        return date.fromisoformat(obj["$d"])
+    if "$m" in obj:
+        return {tuple(key) if isinstance(key, list) else key: val
+            for key, val in obj["$m"]}
+    return obj
+
+def dump_line(message: dict) -> bytes:
+    return json.dumps(encode(message), separators = (",", ":")).encode() + b"\n"
+
+def load_line(line: bytes) -> dict:
+    return json.loads(line, object_hook = decode_hook)
+
+
+class Client:
+    '''
+    Blocking daemon client for the GUI and the command line.
+    '''
+    def __init__(self, socket_file: str = SOCKET_FILE):
+        # Commands without a running daemon don't import socket
+        import socket
+        self.socket_file = socket_file
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(socket_file)
+        self.file = self.sock.makefile("rwb")
+        self.lock = threading.Lock() # GUI jobs call from other threads
+
+    def call(self, cmd: str, **params):
+        '''
+        Send request and return result of the reply.
+        '''
+        with self.lock:
+            self.file.write(dump_line({"cmd": cmd, **params}))
+            self.file.flush()
+            line = self.file.readline()
+        if not line:
+            raise DaemonError("Daemon closed connection")
+        reply = load_line(line)
+        if not reply["ok"]:
+            raise DaemonError(reply["error"])
+        return reply["result"]
+
+    def subscribe(self):
+        '''
+        Yield pushed state events on a separate connection
+        until the daemon closes it.
+        '''
+        client = Client(self.socket_file)
+        client.file.write(dump_line({"cmd": "subscribe"}))
+        client.file.flush()
+        try:
+            for line in client.file:
+                yield load_line(line)
+        finally:
+            client.close()
+
+    def close(self) -> None:
+        self.file.close()
+        self.sock.close()
+
+
+class RemoteStore(Store):
+    '''
+    Store interface forwarded to the daemon, so the daemon
+    stays the only writer of the database.
+    '''
+    threadsafe = True # calls hold the client lock
+
+    def __init__(self, client: Client):
+        self.client = client
+
+    @property
+    def default(self) -> str:
+        return self.client.call("default")
+
+    def call(self, method: str, *args):
+        return self.client.call("store", method = method, args = args)
+
+    def project_names(self) -> list:
+        return self.call("project_names")
+
+    def has_project(self, prj: str) -> bool:
+        return self.call("has_project", prj)
+
+    def first_project(self) -> str:
+        return self.call("first_project")
+
+    def day_time(self, prj: str, day: date) -> int:
+        return self.call("day_time", prj, day)
+
+    def days(self, prj: str) -> list:
+        return [tuple(item) for item in self.call("days", prj)]
+
+    def day_times(self, prj: str, days: list) -> list:
+        return self.call("day_times", prj, days)
+
+    def day_count(self, prj: str) -> int:
+        return self.call("day_count", prj)
+
+    def days_slice(self, prj: str, start: int, stop: int) -> list:
+        return [tuple(item) for item in
+            self.call("days_slice", prj, start, stop)]
+
+    def total(self, prj: str) -> int:
+        return self.call("total", prj)
+
+    def rollup(self, prj: str, period: str) -> dict:
+        return self.call("rollup", prj, period)
+
+    def versions(self) -> dict:
+        return self.call("versions")
+
+    def items(self, projects: list = None, start: date = None,
+            end: date = None):
+        return iter([tuple(item) for item in
+            self.call("items", projects, start, end)])
+
+    def set_time(self, prj: str, day: date, sec: int,
+            save: bool = True) -> int:
+        return self.call("set_time", prj, day, sec, save)
+
+    def add_time(self, prj: str, day: date, sec: int,
+            save: bool = True, tag: str = None) -> int:
+        return self.call("add_time", prj, day, sec, save, tag)
+
+    def tag_time(self, prj: str, tag: str, day: date) -> int:
+        return self.call("tag_time", prj, tag, day)
+
+    def tag_totals(self, prj: str) -> dict:
+        return self.call("tag_totals", prj)
+
+    def tag_days(self, prj: str, tag: str) -> list:
+        return [tuple(item) for item in self.call("tag_days", prj, tag)]
+
+    def del_day(self, prj: str, day: date) -> None:
+        self.call("del_day", prj, day)
+
+    def del_days(self, prj: str, days: list) -> None:
+        self.call("del_days", prj, days)
+
+    def add_project(self, prj: str) -> None:
+        self.call("add_project", prj)
+
+    def del_project(self, prj: str) -> None:
+        self.call("del_project", prj)
+
+    def set_default(self, prj: str) -> None:
+        self.call("set_default", prj)
+
+    def replace(self, projects: dict) -> None:
+        self.call("replace", projects)
+
+    def merge(self, projects: dict, add: bool = False) -> None:
+        self.call("merge", projects, add)
+
+    def merge_days(self, projects: dict, policy: str = "overwrite") -> int:
+        return self.call("merge_days", projects, policy)
+
+    def events(self, kind: str = None, project: str = None,
+            since: date = None, limit: int = None) -> list:
+        return self.call("events", kind, project, since, limit)
+
+    def undo(self) -> list:
+        return self.call("undo")
+
+    def flush(self) -> None:
+        self.call("flush")
+
+    def close(self) -> None:
+        self.client.close()
+
+
+def connect(socket_file: str = SOCKET_FILE) -> Client:
+    '''
+    Return client of running daemon or None.
+    '''
+    if not os.path.exists(socket_file):
+        return None
+    try:
+        return Client(socket_file)
+    except (ConnectionRefusedError, FileNotFoundError):
+        return None
@@ -0,0 +1,269 @@
+'''
+Timer daemon.
+
+One process owns the timer and the database, the GUI and the command
+line are thin clients (see client.py) talking over a Unix domain socket.
+A "subscribe" connection gets a push {"event": "state", ...} on every
+timer tick and state change.
+With an X display running timers are paused after idle time
+(see idle.py), time counted while idle is subtracted.
+'''
+import asyncio
+import os
+import signal
+import time
+
+import idle
+import instrument
+from client import SOCKET_FILE, DaemonError, connect, dump_line, load_line
+from engine import WORKDAY, TimerGroup
+from storage import Checkpointer, Store, load_db
+
+
+# Store methods available to clients
+STORE_METHODS = {
+    "project_names", "has_project", "first_project", "day_time", "days",
+    "day_count", "days_slice", "total", "rollup", "versions", "items",
+    "set_time", "add_time", "del_day", "add_project", "del_project",
+    "set_default", "replace", "merge", "flush", "tag_time", "tag_totals",
+    "tag_days", "day_times", "merge_days", "del_days", "events", "undo",
+}
+
+
+class Daemon:
+    '''
+    Timers and database owner serving clients. Several timers of
+    different projects or tags run at once, all driven by one ticker.
+    '''
+    def __init__(self, db: Store, socket_file: str = SOCKET_FILE,
+            idle_monitor: idle.IdleMonitor = None):
+        self.db = db
+        self.socket_file = socket_file
+        self.idle_monitor = idle_monitor
+        self.timers = TimerGroup() # (project, tag) -> engine
+        self.checkpointer = Checkpointer(db)
+        self.subscribers = set()
+        self.tick_task = None
+        self.stopped = None
+
+    def state(self) -> dict:
+        '''
+        Return state of the timers. Project and seconds are the ones
+        of the last started timer or of the default project.
+        '''
+        timers = [{"project": prj, "tag": tag,
+            "seconds": self.timers.get((prj, tag)).seconds()}
+            for prj, tag in self.timers.keys()]
+        if timers:
+            prj = timers[-1]["project"]
+            sec = timers[-1]["seconds"]
+        else:
+            prj = self.db.default or self.db.first_project()
+            sec = self.db.day_time(prj, WORKDAY.today()) if prj else 0
+        return {"project": prj, "seconds": sec, "running": bool(timers),
+            "timers": timers}
+
+    def start(self, project: str = None, tag: str = None) -> dict:
+        prj = project or self.db.default or self.db.first_project()
+        if not prj:
+            raise DaemonError("No project")
+        key = (prj, tag)
+        if key in self.timers:
+            name = f"{prj} [{tag}]" if tag else prj
+            raise DaemonError(f"Timer is already running for {name}")
+        other = self.timers.overlapping(key)
+        if other:
+            name = f"{prj} [{other[1]}]" if other[1] else prj
+            raise DaemonError(f"Timer is running for {name}")
+        if not self.db.has_project(prj):
+            self.db.add_project(prj)
+        day = WORKDAY.today()
+        base = self.db.tag_time(prj, tag, day)
+        self.timers.start(key, base, day)
+        self.checkpointer.start(prj, day, base, tag)
+        if self.tick_task:
+            self.tick_task.cancel()
+        self.tick_task = asyncio.get_running_loop().create_task(self.ticker())
+        return self.state()
+
+    def stop(self, project: str = None, tag: str = None) -> dict:
+        '''
+        Stop timer of the project and tag, all timers without a project.
+        '''
+        keys = self.timers.keys()
+        if project is not None:
+            keys = [key for key in keys if key == (project, tag)]
+        if not keys:
+            raise DaemonError("Timer is not running")
+        stopped = []
+        for key in keys:
+            sec = self.checkpoint(key, self.timers.stop(key))
+            self.timers.remove(key)
+            self.checkpointer.stop(*key)
+            stopped.append({"project": key[0], "tag": key[1], "seconds": sec})
+        if not self.timers:
+            self.tick_task.cancel()
+            self.tick_task = None
+        self.db.flush()
+        return {**self.state(), "stopped": stopped}
+
+    def checkpoint(self, key: tuple, sec: int) -> int:
+        '''
+        Checkpoint seconds of the timer and return them. Time of the day
+        ended while the timer is running is saved and the new day goes on.
+        '''
+        prj, tag = key
+        timer = self.timers.get(key)
+        day = self.timers.days[key]
+        if timer.day != day:
+            for ended, ended_sec in timer.take_ended_days():
+                self.checkpointer.update(prj, ended, ended_sec, tag)
+            self.checkpointer.stop(prj, tag)
+            day = self.timers.days[key] = timer.day
+            base = self.db.tag_time(prj, tag, day)
+            self.checkpointer.start(prj, day, base, tag)
+            timer.add_base(base)
+            sec = timer.seconds()
+        if sec > 0:
+            self.checkpointer.update(prj, day, sec, tag)
+        return sec
+
+    def pause_idle(self, idle_sec: float) -> None:
+        '''
+        Stop all timers after idle_sec seconds without input
+        and subtract time counted while idle, there is no one to ask.
+        '''
+        since = time.time() - idle_sec
+        spans = [(key, day, int(sec)) for key in self.timers.keys()
+            for day, sec in self.timers.get(key).counted_since(since)]
+        self.stop()
+        for (prj, tag), day, sec in spans:
+            if sec > 0:
+                self.db.add_time(prj, day, -sec, tag = tag)
+        self.db.flush()
+        self.broadcast()
+
+    async def ticker(self) -> None:
+        '''
+        Checkpoint running timers and push state to subscribers
+        every time elapsed seconds of any timer change.
+        '''
+        due = None # when the next tick is scheduled
+        while True:
+            if instrument.enabled and due is not None:
+                instrument.observe("daemon.tick_jitter",
+                    max(0.0, time.monotonic() - due))
+            if self.idle_monitor:
+                idle_sec = self.idle_monitor.check()
+                if idle_sec:
+                    self.pause_idle(idle_sec)
+                    return
+            for key, sec in self.timers.poll():
+                self.checkpoint(key, sec)
+            self.broadcast()
+            delay = self.timers.next_tick()
+            due = time.monotonic() + delay
+            await asyncio.sleep(delay)
+
+    def broadcast(self) -> None:
+        line = dump_line({"event": "state", **self.state()})
+        for writer in list(self.subscribers):
+            if writer.is_closing():
+                self.subscribers.discard(writer)
+                continue
+            writer.write(line)
+
+    @instrument.timed("daemon.request")
+    def dispatch(self, request: dict):
+        '''
+        Run client request and return its result.
+        '''
+        cmd = request.get("cmd")
+        if cmd == "status":
+            return self.state()
+        if cmd in ("start", "stop"):
+            func = self.start if cmd == "start" else self.stop
+            result = func(request.get("project"), request.get("tag"))
+            self.broadcast()
+            return result
+        if cmd == "default":
+            return self.db.default
+        if cmd == "shutdown":
+            self.stopped.set()
+            return None
+        if cmd == "store":
+            method = request.get("method")
+            if method not in STORE_METHODS:
+                raise DaemonError(f"Unknown store method: {method}")
+            result = getattr(self.db, method)(*request.get("args", []))
+            if method == "items":
+                result = list(result)
+            if method in ("del_day", "add_project", "del_project",
+                    "set_default", "replace", "merge", "merge_days",
+                    "del_days", "undo"):
+                self.broadcast()
+            return result
+        raise DaemonError(f"Unknown command: {cmd}")
+
+    async def handle(self, reader, writer) -> None:
+        '''
+        Serve one client connection.
+        '''
+        try:
+            while line := await reader.readline():
+                request = load_line(line)
+                if request.get("cmd") == "subscribe":
+                    self.subscribers.add(writer)
+                    writer.write(dump_line({"event": "state", **self.state()}))
+                    continue
+                try:
+                    reply = {"ok": True, "result": self.dispatch(request)}
+                except Exception as error:
+                    reply = {"ok": False, "error": str(error)}
+                writer.write(dump_line(reply))
+                await writer.drain()
+        except (ConnectionError, ValueError, asyncio.CancelledError):
+            pass # client is gone or daemon shuts down
+        finally:
+            self.subscribers.discard(writer)
+            writer.close()
+
+    async def serve(self) -> None:
+        '''
+        Serve clients until shutdown command or termination signal.
+        '''
+        self.stopped = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.stopped.set)
+        server = await asyncio.start_unix_server(self.handle,
+            path = self.socket_file)
+        try:
+            await self.stopped.wait()
+        finally:
+            server.close()
+            if self.timers:
+                self.stop()
+            for writer in self.subscribers:
+                writer.close()
+            os.remove(self.socket_file)
+
+
+def run(socket_file: str = SOCKET_FILE) -> int:
+    '''
+    Run the daemon in foreground.
+    '''
+    client = connect(socket_file)
+    if client:
+        client.close()
+        print("Daemon is already running")
+        return 1
+    if os.path.exists(socket_file):
+        os.remove(socket_file) # stale socket of killed daemon
+    db = load_db()
+    db.fsync = True # there is no window to freeze, every change is synced
+    try:
+        asyncio.run(Daemon(db, socket_file, idle.monitor()).serve())
+    finally:
+        db.close()
+    return 0
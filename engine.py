@@ -0,0 +1,294 @@
+'''
+Timer engine.
+
+Elapsed time is calculated from time.monotonic() intervals on request
+instead of being counted by ticks, so the timer doesn't drift
+with loop overhead or late wakeups.
+Intervals are split at work day boundaries: a day starts at
+WORKING_TIMER_DAY_START hour in WORKING_TIMER_TZ timezone (local
+time by default), so a session running past midnight is credited
+to both days.
+'''
+import math
+import os
+import time
+from datetime import date, datetime, timedelta
+
+
+SUSPEND_GAP = 30 # seconds without polls treated as system suspend
+TIMEZONE = os.environ.get("WORKING_TIMER_TZ") # zoneinfo name
+DAY_START = int(os.environ.get("WORKING_TIMER_DAY_START", 0)) # hour
+
+
+class WorkDay:
+    '''
+    Work days calendar: day of a timestamp and day boundaries.
+    '''
+    def __init__(self, timezone: str = None, day_start: int = 0):
+        self.tz = None # local time
+        if timezone:
+            from zoneinfo import ZoneInfo
+            self.tz = ZoneInfo(timezone)
+        self.day_start = timedelta(hours = day_start)
+
+    def day(self, ts: float) -> date:
+        '''
+        Return work day of the timestamp.
+        '''
+        return (datetime.fromtimestamp(ts, self.tz) - self.day_start).date()
+
+    def today(self) -> date:
+        return self.day(time.time())
+
+    def end(self, day: date) -> float:
+        '''
+        Return timestamp when the work day ends.
+        '''
+        end = datetime.combine(day + timedelta(days = 1),
+            datetime.min.time()) + self.day_start
+        return end.replace(tzinfo = self.tz).timestamp()
+
+    def split(self, start: float, end: float) -> list:
+        '''
+        Return [(day, seconds)] of wall clock interval split at day ends.
+        '''
+        result = []
+        while start < end:
+            day = self.day(start)
+            stop = min(end, self.end(day))
+            result.append((day, stop - start))
+            start = stop
+        return result
+
+
+WORKDAY = WorkDay(TIMEZONE, DAY_START)
+
+
+class TimerEngine:
+    '''
+    Stopwatch of the current work day: accumulated seconds of finished
+    intervals of the day and the start of the running one.
+    '''
+    def __init__(self, base: int = 0, clock = time.monotonic,
+            suspend_gap: float = SUSPEND_GAP, wall = time.time,
+            workday: WorkDay = WORKDAY):
+        self.clock = clock
+        self.wall = wall
+        self.workday = workday
+        self.suspend_gap = suspend_gap
+        self.base = base # seconds of finished intervals
+        self.started = None # clock value of running interval start
+        self.started_wall = None # wall time of running interval start
+        self.last_poll = None
+        self.day = None # work day of counted seconds
+        self.day_end = None # wall time when running interval's day ends
+        self.intervals = [] # finished intervals: (day, wall start, wall end)
+        self.ended_days = [] # (day, seconds) of days ended while running
+
+    @property
+    def running(self) -> bool:
+        return self.started is not None
+
+    def reset(self, base: int = 0, day: date = None) -> None:
+        '''
+        Stop the timer and set accumulated seconds of the day.
+        '''
+        self.base = base
+        self.day = day
+        self.started = None
+        self.last_poll = None
+        self.ended_days = []
+
+    def add_base(self, sec: int) -> None:
+        '''
+        Add seconds of the day recorded elsewhere, the running
+        interval goes on.
+        '''
+        self.base += sec
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self.open(self.clock(), self.wall())
+
+    def open(self, now: float, wall: float) -> None:
+        '''
+        Start interval at clock and wall time, a new day
+        starts from zero.
+        '''
+        day = self.workday.day(wall)
+        if self.day is None:
+            self.day = day
+        elif day != self.day:
+            self.ended_days.append((self.day, int(self.base)))
+            self.day = day
+            self.base = 0
+        self.started = now
+        self.started_wall = wall
+        self.last_poll = now
+        self.day_end = self.workday.end(day)
+
+    def close(self, now: float) -> None:
+        '''
+        Finish running interval at clock time.
+        '''
+        self.base += now - self.started
+        self.intervals.append((self.day, self.started_wall,
+            self.started_wall + now - self.started))
+        self.started = None
+
+    def stop(self) -> int:
+        '''
+        Stop the timer and return elapsed seconds of the day.
+        '''
+        if self.running:
+            self.poll()
+            self.close(self.clock())
+            self.last_poll = None
+        return self.seconds()
+
+    def elapsed(self) -> float:
+        '''
+        Return elapsed time with fractions of second.
+        '''
+        if not self.running:
+            return self.base
+        return self.base + self.clock() - self.started
+
+    def seconds(self) -> int:
+        return int(self.elapsed())
+
+    def poll(self) -> int:
+        '''
+        Return elapsed seconds of the day. Called periodically by the timer
+        loop: a gap between polls longer than suspend_gap means the system
+        was suspended (on platforms where monotonic clock counts suspend),
+        the gap is not counted. Running interval is split at the day end.
+        '''
+        if self.running:
+            now = self.clock()
+            if now - self.last_poll > self.suspend_gap:
+                self.close(self.last_poll)
+                self.open(now, self.wall())
+            self.last_poll = now
+            while self.started_wall + now - self.started >= self.day_end:
+                boundary = self.started + self.day_end - self.started_wall
+                end = self.day_end
+                self.close(boundary)
+                self.open(boundary, end)
+        return self.seconds()
+
+    def counted_since(self, since: float) -> list:
+        '''
+        Return [(day, seconds)] counted from wall time since till now.
+        '''
+        intervals = list(self.intervals)
+        if self.running:
+            intervals.append((self.day, self.started_wall,
+                self.started_wall + self.clock() - self.started))
+        result = {}
+        for day, start, end in reversed(intervals):
+            if end <= since:
+                break
+            result[day] = result.get(day, 0) + end - max(start, since)
+        return sorted(result.items())
+
+    def take_ended_days(self) -> list:
+        '''
+        Return and forget (day, seconds) of days ended while running.
+        '''
+        days = self.ended_days
+        self.ended_days = []
+        return days
+
+    def next_tick(self) -> float:
+        '''
+        Return seconds until elapsed seconds value changes.
+        '''
+        elapsed = self.elapsed()
+        return math.floor(elapsed) + 1 - elapsed
+
+
+class TimerGroup:
+    '''
+    Timers running at the same time, keyed by (project, tag).
+    They are all polled by one scheduler tick, there is no thread
+    or loop per timer.
+    '''
+    def __init__(self, factory = TimerEngine):
+        self.factory = factory
+        self.timers = {} # (project, tag) -> TimerEngine, in start order
+        self.days = {} # (project, tag) -> work day of recorded seconds
+
+    def __contains__(self, key: tuple) -> bool:
+        return key in self.timers
+
+    def __len__(self) -> int:
+        return len(self.timers)
+
+    def keys(self) -> list:
+        return list(self.timers)
+
+    def get(self, key: tuple) -> TimerEngine:
+        return self.timers.get(key)
+
+    def start(self, key: tuple, base: int, day: date) -> TimerEngine:
+        '''
+        Start the timer from base seconds of the day.
+        '''
+        timer = self.factory()
+        timer.reset(base, day)
+        timer.start()
+        self.timers[key] = timer
+        self.days[key] = day
+        return timer
+
+    def stop(self, key: tuple) -> int:
+        '''
+        Stop the timer and return its elapsed seconds of the day.
+        The timer is kept for its ended days until it's removed.
+        '''
+        return self.timers[key].stop()
+
+    def overlapping(self, key: tuple) -> tuple:
+        return overlapping(key, self.timers)
+
+    def remove(self, key: tuple) -> None:
+        self.timers.pop(key, None)
+        self.days.pop(key, None)
+
+    def poll(self) -> list:
+        '''
+        Return [(key, seconds)] of all running timers.
+        '''
+        return [(key, timer.poll()) for key, timer in list(self.timers.items())]
+
+    def next_tick(self) -> float:
+        '''
+        Return seconds until elapsed seconds of any timer change.
+        '''
+        return min((timer.next_tick() for timer in self.timers.values()),
+            default = 1.0)
+
+
+def overlapping(key: tuple, keys) -> tuple:
+    '''
+    Return the (project, tag) of keys which counts the same seconds
+    as the key, or None. Tagged time is added to the project too,
+    so the untagged timer of a project can't run with its tagged ones.
+    '''
+    prj, tag = key
+    for other in keys:
+        if other[0] == prj and (other[1] is None) != (tag is None):
+            return other
+    return None
+
+def format_time(seconds: int) -> str:
+    '''
+    Return seconds as string in H:M:S format.
+    '''
+    if seconds == 0:
+        return "--:--:--"
+    minutes, sec = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02}:{minutes:02}:{sec:02}"
@@ -0,0 +1,1056 @@
+'''
+Projects working timer GUI.
+'''
+import queue
+import time
+import tkinter as tk
+from tkinter import filedialog as fd
+from tkinter import messagebox
+from threading import Thread
+
+import idle
+import instrument
+from client import DaemonError, RemoteStore, connect
+from engine import WORKDAY, TimerGroup, format_time
+from history import describe
+from storage import Checkpointer, load_db, save_projects
+from transfer import (EXPORT_FORMATS, IMPORT_MODES, Progress, apply_import,
+    export_file, parse_file)
+from widgets import SearchList, VirtualList
+from worker import IOExecutor
+
+
+ICONIC_TICK = 10 # seconds between ticks of iconified window, < SUSPEND_GAP
+EVENTS_MS = 100 # daemon state events polling
+CONFIG_ROWS = 10 # visible rows of config projects list
+
+class Timer(tk.Tk):
+    '''
+    App GUI class.
+    '''
+    def __init__(self, idle_source = None):
+        '''
+        Main app init. idle_source overrides default source
+        of idle time (see idle.py).
+        '''
+        self.wtitle = "Working timer"
+        tk.Tk.__init__(self, className = self.wtitle)
+        self.title(self.wtitle)
+
+        self.main_bg = "#222"
+        self.main_font = "roboto, 10"
+        self.label_col = {"bg": "#222", "fg": "#b38600"}
+        self.colors = {
+            "green": {"bg": "#28a745", "fg": "#eee", "hover": "#1e7b34"},
+            "yellow": {"bg": "#ffc107", "fg": "#222", "hover": "#b38600"},
+            "grey": {"bg": "#6c757d", "fg": "#eee", "hover": "#474d52"},
+            "red": {"bg": "#f8d7da", "fg": "#721c24", "hover": "#f5c6cb"},
+            "but_hl": "#474d52"
+        }
+        self.configure(background = self.main_bg)
+
+        # with running daemon the GUI is its client and shows daemon's timer
+        self.client = connect()
+        self.db = RemoteStore(self.client) if self.client else load_db()
+        self.remote_running = False # daemon's timers state
+        self.remote_timers = set() # (project, tag) of daemon's timers
+        self.events = queue.Queue() # daemon state events from listener
+        self.checkpointer = Checkpointer(self.db)
+        self.cur_project = tk.StringVar() # current project
+        self.default_project = tk.StringVar()
+        self.choice_project = tk.StringVar() # choosen project from config frame
+        self.new_project = tk.StringVar() # new project from config frame
+        self.cur_date = WORKDAY.today()
+        self.timer_job = None # scheduled timer tick
+        self.tick_due = None # monotonic time of scheduled tick
+        self.diag_window = None # Diagnostics window
+        self.status_job = None # scheduled status label clearing
+        self.io = IOExecutor(self, self.flash_status) # file jobs and saves
+        self.export_current = tk.BooleanVar() # export current project only
+        self.cfg_frame = None # Config frame, built on first show
+        self.config_hidden = True # Config frame state
+        self.details_hidden = True # Details frame state
+        self.del_confirmed = None # project of del button pressed once
+        self.def_menu_items = [] # projects of Default menu
+        if self.db.default:
+            self.default_project.set(self.db.default)
+        # if default project exists in base,
+        # set it to cur_project esle set first found project
+        self.cur_project.set(self.get_default_project())
+        # if current project has time in base for today,
+        # insert time into timer_seconds else insert 0
+        self.timer_seconds = self.get_cur_project_time()
+        # running timers keyed by (project, tag), the GUI starts
+        # untagged timers, one per project
+        self.timers = TimerGroup()
+        self.idle_keys = [] # timers paused by idle detection
+        # ((project, tag), day, seconds) counted while idle
+        self.idle_spans = []
+
+        # Widgets
+        project_label_text = "No project"
+        if not self.cur_project.get().lower() == "none":
+            project_label_text = self.cur_project.get()
+        self.project_label = tk.Label(self, text = project_label_text,
+            width = 18, padx = 0, pady = 0, bg = self.label_col["bg"],
+            fg = self.label_col["fg"], font = self.main_font)
+        self.project_label.grid(row = 0, column = 0)
+
+        self.timer_button = tk.Button(self, text = "Start",
+            command = self.run_timer, width = 6, padx = 0, pady = 0,
+            font = self.main_font, state = "disabled")
+        if self.cur_project.get():
+            self.timer_button.configure(state = "active")
+        self.timer_button.grid(row = 0, column = 1)
+        self.set_btn_color(self.timer_button, "green")
+
+        self.timer_label = tk.Label(self,
+            text = format_time(self.timer_seconds), width = 10, padx = 0,
+            pady = 0, bg = self.label_col["bg"], fg = self.label_col["fg"],
+            font = self.main_font)
+        self.timer_label.grid(row = 0, column = 2)
+
+        self.config_button = tk.Button(self, text = "Cfg",
+            command = self.config_frame, width = 4, padx = 0, pady = 0,
+            font = self.main_font)
+        self.config_button.grid(row = 0, column = 3)
+        self.set_btn_color(self.config_button, "grey")
+
+        self.quit_button = tk.Button(self, text = "Quit",
+            command = self.quit_app, width = 6, padx = 0, pady = 0,
+            font = self.main_font)
+        self.quit_button.grid(row = 0, column = 4)
+        self.set_btn_color(self.quit_button, "grey")
+        self.bind("<Map>", self.on_map)
+        # daemon's timers are paused by the daemon
+        self.idle_monitor = None
+        if not self.client:
+            self.idle_monitor = idle.monitor(self, idle_source)
+        if self.client:
+            Thread(target = self.listen_daemon, daemon = True).start()
+            self.after(EVENTS_MS, self.check_events)
+
+    def get_default_project(self) -> str:
+        '''
+        Return default project from config file
+        if it's in the database.
+        '''
+        if self.db.has_project(self.default_project.get()):
+            return self.default_project.get()
+        return self.db.first_project()
+
+    def save_default_project(self) -> None:
+        '''
+        Set default project to the database.
+        '''
+        default = self.default_project.get()
+        if not default.lower() == "none":
+            self.db.set_default(default)
+            self.save()
+
+    @instrument.timed("ui.get_cur_project_time")
+    def get_cur_project_time(self) -> int:
+        '''
+        Return time for current project
+        if it has today time in the database.
+        '''
+        prj = self.cur_project.get()
+        if not prj.lower() == "none":
+            return self.db.day_time(prj, self.cur_date)
+        return 0
+
+    def set_btn_color(self, button, color) -> None:
+        '''
+        Button color setter.
+        '''
+        button.configure(
+            bg = self.colors[color]["bg"],
+            fg = self.colors[color]["fg"],
+            activebackground = self.colors[color]["hover"],
+            activeforeground = self.colors[color]["fg"],
+            highlightbackground = self.colors["but_hl"]
+        )
+
+    @instrument.timed("ui.update_details")
+    def update_details(self) -> None:
+        '''
+        Update list of data in details frame
+        '''
+        if self.details_hidden:
+            return
+        prj = self.cur_project.get()
+        # Show last days of the project, only visible rows are rendered
+        self.details_list.set_size(self.db.day_count(prj))
+        self.update_details_time()
+
+    def update_details_time(self) -> None:
+        '''
+        Update project hours in details frame
+        '''
+        if "time_label" in self.__dict__:
+            self.time_label.configure(text = self.project_hours())
+
+    def project_hours(self) -> str:
+        '''
+        Return project hours text with hours of its tags,
+        which are included in project hours.
+        '''
+        prj = self.cur_project.get()
+        lines = ["Project hours: {:.2f}".format(self.db.total(prj) / 3600)]
+        for tag, sec in sorted(self.db.tag_totals(prj).items()):
+            lines.append("{}: {:.2f}".format(tag, sec / 3600))
+        return "\n".join(lines)
+
+    @instrument.timed("ui.fetch_details")
+    def fetch_details(self, start: int, stop: int) -> list:
+        '''
+        Return details list rows from start to stop.
+        '''
+        prj = self.cur_project.get()
+        return [(day, f"Day: {day} Sec: {sec} Time: {format_time(sec)}")
+            for day, sec in self.db.days_slice(prj, start, stop)]
+
+    def details_frame(self) -> None:
+        '''
+        Show the frame with details about the project.
+        '''
+        def del_date() -> None:
+            '''
+            Delete selected date.
+            '''
+            self.clear_del_confirmed()
+            rem_date = self.details_list.selected_key()
+            # The running timer counts on top of today's seconds
+            if (rem_date in (self.cur_date, WORKDAY.today()) and
+                    self.cur_project.get() in self.running_projects()):
+                self.flash_status("Not allowed while timer is on")
+            elif rem_date:
+                self.db.del_day(self.cur_project.get(), rem_date)
+                self.save()
+                self.details_list.delete_selected()
+                # Update current seconds if removed today data
+                self.timer_seconds = self.get_cur_project_time()
+                self.timer_label.configure(
+                    text = format_time(self.timer_seconds))
+                self.update_details_time()
+            else:
+                self.flash_status("Date not selected")
+
+
+        self.clear_del_confirmed()
+        if not self.details_hidden:
+            self.det_frame.destroy()
+            self.details_hidden = True
+            self.set_btn_color(self.details_button, "yellow")
+            return
+
+        self.details_hidden = False
+        self.set_btn_color(self.details_button, "green")
+        self.det_frame = tk.Frame(self.cfg_frame)
+        self.det_frame.configure(background = self.main_bg)
+        self.det_frame.grid(row = 4, column = 0, columnspan = 3)
+
+        # Widgets
+        self.details_list = VirtualList(self.det_frame, self.fetch_details,
+            width = 36, height = 10, background = self.main_bg)
+        self.details_list.grid(row = 0, column = 0, columnspan = 2)
+
+        self.time_label = tk.Label(self.det_frame,
+            text = self.project_hours(), width = 24,
+            padx = 0, pady = 0, bg = self.label_col["bg"],
+            fg = self.label_col["fg"], font = self.main_font)
+        self.time_label.grid(row = 1, column = 0, columnspan = 2, padx = 4,
+            pady = 8)
+
+        # Fill listbox with project data
+        self.update_details()
+
+        del_button = tk.Button(self.det_frame, text = "Delete selected",
+            command = del_date, width = 16, padx = 0, pady = 0,
+            font = self.main_font)
+        del_button.grid(row = 2, column = 0, columnspan = 2, padx = 4,
+            pady = 10)
+        self.set_btn_color(del_button, "grey")
+
+    def make_project_row(self, parent, row: int) -> tuple:
+        '''
+        Create widgets of config projects list row.
+        '''
+        radio = tk.Radiobutton(parent, variable = self.choice_project,
+            command = self.cfg_switch_project, borderwidth = 0,
+            relief = "flat", padx = 0, pady = 0, highlightthickness = 0,
+            width = 18, anchor = "w", bg = self.main_bg,
+            fg = self.label_col["fg"],
+            highlightbackground = self.colors["but_hl"],
+            activebackground = self.colors["yellow"]["hover"],
+            activeforeground = self.colors["yellow"]["fg"],
+            font = self.main_font)
+        radio.grid(row = row, column = 0, sticky = "W")
+        del_button = tk.Button(parent, text = "Del", width = 4, padx = 0,
+            pady = 0, font = self.main_font)
+        del_button.grid(row = row, column = 2, sticky = "E")
+        return radio, del_button
+
+    def render_project_row(self, widgets: tuple, project: str) -> None:
+        '''
+        Show the project in config projects list row.
+        '''
+        radio, del_button = widgets
+        text = project
+        if project in self.running_projects():
+            text += " *"
+        radio.configure(text = text, value = project)
+        del_button.configure(command = self.cfg_del_project(project))
+        if self.del_confirmed == project:
+            self.set_btn_color(del_button, "red")
+            del_button.configure(state = "active")
+        else:
+            self.set_btn_color(del_button, "grey")
+            del_button.configure(
+                state = "disabled" if self.del_confirmed else "active")
+
+    @instrument.timed("ui.update_config")
+    def update_config_projects(self) -> None:
+        '''
+        Update projects in config frame, only rows showing
+        other projects than before are redrawn.
+        '''
+        if self.config_hidden:
+            return
+        self.choice_project.set(self.cur_project.get())
+        self.project_list.set_keys(self.db.project_names())
+
+    @instrument.timed("ui.config_frame")
+    def config_frame(self) -> None:
+        '''
+        Show or hide config frame. The frame is built on first show
+        and kept hidden afterwards.
+        '''
+        if not self.config_hidden:
+            self.clear_del_confirmed()
+            if not self.details_hidden:
+                self.details_frame()
+            self.cfg_frame.grid_remove()
+            self.config_hidden = True
+            self.set_btn_color(self.config_button, "grey")
+            return
+        self.config_hidden = False
+        self.set_btn_color(self.config_button, "green")
+        if self.cfg_frame:
+            self.cfg_frame.grid()
+        else:
+            self.build_config_frame()
+        self.new_project.set("New project")
+        self.update_config_projects()
+
+    def build_config_frame(self) -> None:
+        '''
+        Create config frame widgets.
+        '''
+        self.cfg_frame = tk.Frame(self)
+        self.cfg_frame.configure(background = self.main_bg)
+        self.cfg_frame.grid(row = 1, column = 0, columnspan = 5)
+        self.cfg_frame.grid_columnconfigure(1, minsize = 30) # spacer
+
+
+        # Widgets
+        config_label = tk.Label(self.cfg_frame, text = "Projects", width = 10,
+            padx = 0, pady = 0, bg = self.label_col["bg"], fg = "#fff",
+            font = "roboto, 12")
+        config_label.grid(row = 0, column = 0, pady = 4)
+
+        new_entry = tk.Entry(self.cfg_frame, textvariable = self.new_project,
+            bg = self.label_col["fg"], fg = self.label_col["bg"], width = 26,
+            font = self.main_font)
+        new_entry.grid(row = 2, column = 0, pady = 8, sticky = "W")
+
+        add_button = tk.Button(self.cfg_frame, text = "Add",
+            command = self.cfg_add_project, width = 4, padx = 0, pady = 0,
+            font = self.main_font)
+        add_button.grid(row = 2, column = 0, sticky = "E")
+        self.set_btn_color(add_button, "yellow")
+
+        self.status_label = tk.Label(self.cfg_frame, text = " ", padx = 0,
+            pady = 0, bg = self.label_col["bg"], fg = self.label_col["fg"],
+            font = self.main_font)
+        self.status_label.grid(row = 3, column = 0, columnspan = 3, pady = 10)
+
+        # Projects list with search (row 1), rows are rendered on demand
+        self.project_list = SearchList(self.cfg_frame, self.make_project_row,
+            self.render_project_row, height = CONFIG_ROWS,
+            background = self.main_bg)
+        self.project_list.grid(row = 1, column = 0, sticky = "N")
+        self.project_list.body.grid_columnconfigure(1, minsize = 20)
+        self.project_list.entry.configure(bg = self.label_col["fg"],
+            fg = self.label_col["bg"], font = self.main_font)
+        self.project_list.empty_label.configure(text = "No projects",
+            padx = 0, pady = 0, bg = self.label_col["bg"], fg = "#fff",
+            font = self.main_font)
+
+        # Buttons frame (row 1)
+        buttons_frame = tk.Frame(self.cfg_frame)
+        buttons_frame.configure(background = self.main_bg)
+        buttons_frame.grid(row = 1, column = 2)
+
+        # Import menu with import modes
+        self.import_button = tk.Menubutton(buttons_frame, text = "Import",
+            relief = "raised", width = 8, padx = 1, pady = 1,
+            font = self.main_font)
+        import_menu = tk.Menu(self.import_button, tearoff = 0)
+        for mode in IMPORT_MODES:
+            import_menu.add_command(label = mode.capitalize(),
+                command = lambda mode = mode: self.import_projects(mode),
+                font = self.main_font)
+        import_menu.add_separator()
+        import_menu.add_command(label = "Cancel", command = self.cancel_job,
+            font = self.main_font)
+        self.import_button["menu"] = import_menu
+        self.import_button.grid(row = 0, column = 0, padx = 1, sticky = "E")
+        self.set_btn_color(self.import_button, "yellow")
+
+        # Export menu with formats
+        self.export_button = tk.Menubutton(buttons_frame, text = "Export",
+            relief = "raised", width = 8, padx = 1, pady = 1,
+            font = self.main_font)
+        export_menu = tk.Menu(self.export_button, tearoff = 0)
+        for fmt in EXPORT_FORMATS:
+            export_menu.add_command(label = fmt.upper(),
+                command = lambda fmt = fmt: self.export_projects(fmt),
+                font = self.main_font)
+        export_menu.add_separator()
+        export_menu.add_checkbutton(label = "Current project only",
+            variable = self.export_current, font = self.main_font)
+        export_menu.add_command(label = "Cancel", command = self.cancel_job,
+            font = self.main_font)
+        self.export_button["menu"] = export_menu
+        self.export_button.grid(row = 1, column = 0, padx = 1, sticky = "E")
+        self.set_btn_color(self.export_button, "yellow")
+
+        # Default project menu, filled when it's posted
+        def_menu_btn = tk.Menubutton(buttons_frame, text = "Default",
+            relief = "raised", width = 8, padx = 1, pady = 1,
+            font = self.main_font)
+        self.def_menu = tk.Menu(def_menu_btn, tearoff = 0,
+            postcommand = self.update_def_menu)
+        def_menu_btn["menu"] = self.def_menu
+        def_menu_btn.grid(row = 2, column = 0, padx = 1, sticky = "E")
+        self.set_btn_color(def_menu_btn, "yellow")
+
+        self.details_button = tk.Button(buttons_frame, text = "Details",
+            command = self.details_frame, width = 8, padx = 0, pady = 0,
+            font = self.main_font)
+        self.details_button.grid(row = 3, column = 0, padx = 0, sticky = "E")
+        self.set_btn_color(self.details_button, "yellow")
+
+        undo_button = tk.Button(buttons_frame, text = "Undo",
+            command = self.undo_change, width = 8, padx = 0, pady = 0,
+            font = self.main_font)
+        undo_button.grid(row = 4, column = 0, padx = 0, sticky = "E")
+        self.set_btn_color(undo_button, "grey")
+
+        if instrument.enabled:
+            diag_button = tk.Button(buttons_frame, text = "Diag",
+                command = self.diagnostics_window, width = 8, padx = 0,
+                pady = 0, font = self.main_font)
+            diag_button.grid(row = 5, column = 0, padx = 0, sticky = "E")
+            self.set_btn_color(diag_button, "grey")
+
+    def update_def_menu(self) -> None:
+        '''
+        Sync Default menu with projects: remove deleted ones
+        and insert new ones, whole menu is rebuilt only
+        if projects order changed.
+        '''
+        names = self.db.project_names()
+        if names == self.def_menu_items:
+            return
+        keep = set(names)
+        for idx in reversed(range(len(self.def_menu_items))):
+            if self.def_menu_items[idx] not in keep:
+                self.def_menu.delete(idx)
+                del self.def_menu_items[idx]
+        old = set(self.def_menu_items)
+        if self.def_menu_items != [prj for prj in names if prj in old]:
+            self.def_menu.delete(0, tk.END)
+            self.def_menu_items = []
+            old = set()
+        for idx, prj in enumerate(names):
+            if prj not in old:
+                self.def_menu.insert_radiobutton(idx,
+                    label = prj, variable = self.default_project,
+                    value = prj, command = self.save_default_project,
+                    font = self.main_font)
+                self.def_menu_items.insert(idx, prj)
+
+    def clear_del_confirmed(self) -> None:
+        '''
+        Clear state of delete confirmation and reset buttons color
+        '''
+        if self.del_confirmed:
+            self.del_confirmed = None
+            self.project_list.refresh()
+
+    def flash_status(self, text: str) -> None:
+        if self.config_hidden:
+            return
+        if self.status_job:
+            self.after_cancel(self.status_job)
+        self.status_label.configure(text = text)
+        self.status_job = self.after(5000, self.clear_status)
+
+    def clear_status(self) -> None:
+        self.status_job = None
+        if not self.config_hidden:
+            self.status_label.configure(text = " ")
+
+    def switch_project(self, project: str) -> None:
+        '''
+        Switch current project. Called from config switch and delete functions
+        '''
+        # Save time for current project
+        self.save()
+        # Set timer's settings for another project
+        self.cur_project.set(project)
+        self.project_label.configure(text = project)
+        self.timer_seconds = self.get_cur_project_time()
+        self.timer_label.configure(text = format_time(self.timer_seconds))
+        self.show_timer_button()
+        self.clear_del_confirmed()
+        self.update_details()
+
+    def cfg_switch_project(self) -> None:
+        '''
+        Switch current project in config frame,
+        timers of other projects keep running.
+        '''
+        project = self.choice_project.get()
+        if project == self.cur_project.get():
+            return
+        self.switch_project(project)
+
+    def cfg_add_project(self) -> None:
+        '''
+        Add new project from config frame.
+        Switch current project to new.
+        '''
+        if self.timer_on():
+            self.flash_status("Not allowed while timer is on")
+            return
+        new_prj = self.new_project.get()
+        self.db.add_project(new_prj)
+        self.save()
+        self.update_config_projects()
+        self.project_list.see(new_prj)
+
+    def cfg_del_project(self, project: str):
+        '''
+        Return function with particular project
+        for each delete button command.
+        '''
+        def wrapper() -> None:
+            '''
+            Delete project from config frame.
+            Switch current project to first found in database.
+            '''
+            if self.timer_on():
+                self.flash_status("Not allowed while timer is on")
+                return
+            if self.del_confirmed:
+                self.db.del_project(project)
+                # Set timer's settings for other project
+                first = self.db.first_project()
+                if first:
+                    self.switch_project(first)
+                self.clear_del_confirmed()
+                self.update_config_projects()
+            else:
+                self.del_confirmed = project
+                self.project_list.refresh()
+        return wrapper
+
+    def undo_change(self) -> None:
+        '''
+        Undo the last deletion, import or default change.
+        '''
+        if self.timer_on():
+            self.flash_status("Not allowed while timer is on")
+            return
+        if self.io.job:
+            self.flash_status(f"{self.io.job.name} is running")
+            return
+        self.clear_del_confirmed()
+        events = self.db.undo()
+        if not events:
+            self.flash_status("Nothing to undo")
+            return
+        if self.db.default:
+            self.default_project.set(self.db.default)
+        project = self.cur_project.get()
+        if not self.db.has_project(project):
+            project = self.get_default_project()
+        if project:
+            self.switch_project(project)
+        self.update_config_projects()
+        self.flash_status(f"Undone: {describe(events[-1])}")
+
+    def run_timer(self) -> None:
+        '''
+        Run or stop the timer of current project.
+        '''
+        self.clear_del_confirmed()
+        if self.io.job:
+            # A replace import would drop time counted meanwhile
+            self.flash_status(f"{self.io.job.name} is running")
+            return
+        if self.client:
+            self.run_remote_timer()
+        elif (self.cur_project.get(), None) in self.timers:
+            self.stop_timer((self.cur_project.get(), None))
+        else:
+            if self.idle_keys:
+                self.resume_idle()
+            if (self.cur_project.get(), None) not in self.timers:
+                self.start_timer()
+
+    def timer_on(self) -> bool:
+        '''
+        Return True if any timer is running.
+        '''
+        if self.client:
+            return self.remote_running
+        return bool(self.timers)
+
+    def running_projects(self) -> set:
+        keys = self.remote_timers if self.client else self.timers.keys()
+        return {prj for prj, tag in keys}
+
+    def show_timer_button(self) -> None:
+        '''
+        Show Start or Pause button for the timer of current project.
+        '''
+        key = (self.cur_project.get(), None)
+        running = key in (self.remote_timers if self.client else self.timers)
+        text = "Pause" if running else "Start"
+        if text != self.timer_button.cget("text"):
+            self.timer_button.configure(text = text)
+            self.set_btn_color(self.timer_button,
+                "yellow" if running else "green")
+            if not self.config_hidden:
+                self.project_list.refresh()
+
+    def run_remote_timer(self) -> None:
+        '''
+        Start or stop daemon's timer of current project. New state
+        comes back with the reply and to all subscribed clients.
+        '''
+        prj = self.cur_project.get()
+        try:
+            if (prj, None) in self.remote_timers:
+                state = self.client.call("stop", project = prj)
+            else:
+                state = self.client.call("start",
+                    project = None if prj.lower() == "none" else prj)
+        except (DaemonError, OSError) as error:
+            self.flash_status(str(error))
+            return
+        self.show_state(state)
+
+    def listen_daemon(self) -> None:
+        '''
+        Pass daemon state events to the Tk thread, None when
+        the daemon is gone. Runs in a background thread.
+        '''
+        try:
+            for event in self.client.subscribe():
+                self.events.put(event)
+        except OSError:
+            pass
+        self.events.put(None)
+
+    def check_events(self) -> None:
+        '''
+        Show the last daemon state event.
+        '''
+        state = False
+        while not self.events.empty():
+            state = self.events.get_nowait()
+        if state is None:
+            self.remote_running = False
+            self.remote_timers = set()
+            self.timer_button.configure(text = "Start", state = "disabled")
+            self.set_btn_color(self.timer_button, "green")
+            self.title(f"{self.wtitle} (daemon stopped)")
+            return
+        if state:
+            self.show_state(state)
+        self.after(EVENTS_MS, self.check_events)
+
+    def show_state(self, state: dict) -> None:
+        '''
+        Show daemon's timers state. Project of a new timer
+        becomes current one, unless current project has a timer.
+        '''
+        running = state["running"]
+        prj = state["project"]
+        timers = {(timer["project"], timer["tag"]): timer["seconds"]
+            for timer in state.get("timers", [])}
+        cur_prj = self.cur_project.get()
+        started = set(timers) - self.remote_timers
+        if (started and prj and prj != cur_prj and
+                cur_prj not in {key[0] for key in timers}):
+            cur_prj = prj
+            self.cur_project.set(prj)
+            self.project_label.configure(text = prj)
+            self.update_details()
+        if (cur_prj, None) in timers:
+            self.timer_seconds = timers[(cur_prj, None)]
+        elif prj == cur_prj and not running:
+            self.timer_seconds = state["seconds"]
+        text = format_time(self.timer_seconds)
+        if text != self.timer_label.cget("text"):
+            self.timer_label.configure(text = text)
+        changed = set(timers) != self.remote_timers
+        self.remote_timers = set(timers)
+        self.remote_running = running
+        self.show_timer_button()
+        if changed:
+            self.update_details()
+
+    def start_timer(self, key: tuple = None) -> None:
+        '''
+        Start the timer, of current project by default. All timers
+        are driven by one tick on the Tk event loop.
+        '''
+        today = WORKDAY.today()
+        if today != self.cur_date:
+            self.cur_date = today
+            self.timer_seconds = self.get_cur_project_time()
+            self.update_details()
+        cur_key = (self.cur_project.get(), None)
+        key = key or cur_key
+        other = self.timers.overlapping(key)
+        if other:
+            name = f"{other[0]} [{other[1]}]" if other[1] else other[0]
+            self.flash_status(f"Timer is running for {name}")
+            return
+        base = self.timer_seconds
+        if key != cur_key:
+            base = self.db.tag_time(key[0], key[1], self.cur_date)
+        self.timers.start(key, base, self.cur_date)
+        if self.counted(key[0]):
+            self.checkpointer.start(key[0], self.cur_date, base, key[1])
+        self.show_timer_button()
+        if self.timer_job:
+            self.after_cancel(self.timer_job)
+        self.tick()
+
+    def counted(self, prj: str) -> bool:
+        '''
+        Return True if time of the project is saved.
+        '''
+        return not prj.lower() == "none"
+
+    @instrument.timed("ui.tick")
+    def tick(self) -> None:
+        '''
+        Timer tick: poll and checkpoint all running timers, refresh
+        the label if H:M:S string of current project changed and
+        schedule the next tick. Iconified window is refreshed rarely,
+        elapsed time comes from the engines anyway.
+        '''
+        if instrument.enabled and self.tick_due is not None:
+            instrument.observe("ui.tick_jitter",
+                max(0.0, time.monotonic() - self.tick_due))
+        if self.idle_monitor:
+            idle_sec = self.idle_monitor.check()
+            if idle_sec:
+                self.pause_idle(idle_sec)
+                return
+        cur_key = (self.cur_project.get(), None)
+        writes = self.checkpointer.writes
+        for key, sec in self.timers.poll():
+            sec = self.checkpoint(key, sec)
+            if key == cur_key:
+                self.timer_seconds = sec
+        if self.checkpointer.writes != writes:
+            self.save()
+        text = format_time(self.timer_seconds)
+        if text != self.timer_label.cget("text"):
+            self.timer_label.configure(text = text)
+        if not self.timers:
+            self.timer_job = None
+            self.tick_due = None
+            return
+        delay = self.timers.next_tick()
+        if self.state() == "iconic":
+            delay += ICONIC_TICK - 1
+        self.tick_due = time.monotonic() + delay
+        self.timer_job = self.after(int(delay * 1000) + 1, self.tick)
+
+    def checkpoint(self, key: tuple, sec: int) -> int:
+        '''
+        Checkpoint seconds of the timer and return them. Time of the day
+        ended while the timer is running is saved and the new day goes on.
+        '''
+        prj, tag = key
+        counted = self.counted(prj)
+        timer = self.timers.get(key)
+        day = self.timers.days[key]
+        if timer.day != day:
+            for ended, ended_sec in timer.take_ended_days():
+                if counted:
+                    self.checkpointer.update(prj, ended, ended_sec, tag)
+            self.checkpointer.stop(prj, tag)
+            day = self.timers.days[key] = timer.day
+            base = self.db.tag_time(prj, tag, day) if counted else 0
+            if counted:
+                self.checkpointer.start(prj, day, base, tag)
+            timer.add_base(base)
+            sec = timer.seconds()
+            if day > self.cur_date:
+                self.cur_date = day
+                self.timer_seconds = self.get_cur_project_time()
+                self.update_details()
+        if counted and sec > 0:
+            self.checkpointer.update(prj, day, sec, tag)
+        return sec
+
+    def pause_idle(self, idle_sec: float) -> None:
+        '''
+        Stop all timers after idle_sec seconds without input. Time
+        counted while idle is subtracted at once or asked about
+        on resume, see idle.IDLE_ACTION.
+        '''
+        since = time.time() - idle_sec
+        spans = [(key, day, int(sec)) for key in self.timers.keys()
+            for day, sec in self.timers.get(key).counted_since(since)]
+        self.idle_keys = self.timers.keys()
+        self.stop_timer()
+        self.title(f"{self.wtitle} (idle {int(idle_sec // 60)} min)")
+        if idle.IDLE_ACTION == "subtract":
+            self.drop_idle(spans)
+        else:
+            self.idle_spans = spans
+
+    def resume_idle(self) -> None:
+        '''
+        Ask whether to keep time counted while idle,
+        then start timers paused by idle detection again.
+        '''
+        spans, self.idle_spans = self.idle_spans, []
+        keys, self.idle_keys = self.idle_keys, []
+        self.title(self.wtitle)
+        if spans:
+            minutes = max(sec for key, day, sec in spans) // 60
+            if not messagebox.askyesno(self.wtitle,
+                    f"Keep {minutes} min counted while idle?"):
+                self.drop_idle(spans)
+        for key in keys:
+            if key in self.timers or (self.counted(key[0]) and
+                    not self.db.has_project(key[0])):
+                continue
+            self.start_timer(key)
+        if self.idle_monitor:
+            self.idle_monitor.reset()
+
+    def drop_idle(self, spans: list) -> None:
+        '''
+        Subtract time counted while idle.
+        '''
+        for (prj, tag), day, sec in spans:
+            if self.counted(prj) and sec > 0:
+                self.db.add_time(prj, day, -sec, tag = tag)
+        self.save()
+        self.timer_seconds = self.get_cur_project_time()
+        self.timer_label.configure(text = format_time(self.timer_seconds))
+        self.update_details()
+
+    def on_map(self, event) -> None:
+        '''
+        Refresh the timer at once when the window is deiconified.
+        '''
+        if event.widget is self and self.timer_job:
+            self.after_cancel(self.timer_job)
+            self.tick_due = None
+            self.tick()
+
+    def stop_timer(self, key: tuple = None) -> None:
+        '''
+        Stop the timer, all timers without a key, and save its time.
+        '''
+        keys = [key] if key else self.timers.keys()
+        for key in keys:
+            if key not in self.timers:
+                continue
+            sec = self.checkpoint(key, self.timers.stop(key))
+            self.timers.remove(key)
+            self.checkpointer.stop(*key)
+            if key == (self.cur_project.get(), None):
+                self.timer_seconds = sec
+                self.timer_label.configure(text = format_time(sec))
+        if not self.timers and self.timer_job:
+            self.after_cancel(self.timer_job)
+            self.timer_job = None
+            self.tick_due = None
+        self.show_timer_button()
+        self.save()
+
+    def save(self) -> None:
+        '''
+        Sync changes to disk in background, saves requested in quick
+        succession are coalesced. Changes themselves are written when
+        they are made, without a sync (see storage.FSYNC). Stores used
+        by the Tk thread only are saved at once.
+        '''
+        if self.db.threadsafe:
+            self.io.save(lambda: save_projects(self.db))
+        else:
+            save_projects(self.db)
+
+    def diagnostics_window(self) -> None:
+        '''
+        Show instrumentation data: latency histograms and counters.
+        '''
+        def refresh() -> None:
+            text.configure(state = "normal")
+            text.delete("1.0", tk.END)
+            text.insert(tk.END, instrument.format_report())
+            text.configure(state = "disabled")
+
+        def dump() -> None:
+            filename = fd.asksaveasfilename(parent = self.diag_window,
+                filetypes = [("JSON files", "*.json")],
+                initialfile = "profile.json", defaultextension = ".json")
+            if filename:
+                instrument.dump(filename)
+
+        if self.diag_window and self.diag_window.winfo_exists():
+            self.diag_window.destroy()
+        self.diag_window = tk.Toplevel(self)
+        self.diag_window.title(f"{self.wtitle}: diagnostics")
+        self.diag_window.configure(background = self.main_bg)
+        text = tk.Text(self.diag_window, width = 76, height = 24,
+            bg = self.main_bg, fg = self.label_col["fg"],
+            font = "monospace, 9")
+        text.grid(row = 0, column = 0, columnspan = 3)
+        buttons = (("Refresh", refresh), ("Dump JSON", dump),
+            ("Reset", lambda: (instrument.reset(), refresh())))
+        for idx, (label, command) in enumerate(buttons):
+            button = tk.Button(self.diag_window, text = label,
+                command = command, width = 10, padx = 0, pady = 0,
+                font = self.main_font)
+            button.grid(row = 1, column = idx, pady = 6)
+            self.set_btn_color(button, "yellow" if idx < 2 else "grey")
+        refresh()
+
+    def import_projects(self, mode: str = "merge") -> None:
+        '''
+        Import projects from text file with simple format:
+        "project name",date,seconds, or JSON Lines and binary exports.
+        The file is parsed and applied in a background thread, see
+        IMPORT_MODES for modes. Stores used by the Tk thread only
+        are changed through a store of their own (Store.for_thread).
+        '''
+        if self.timer_on():
+            self.flash_status("Not allowed while timer is on")
+            return
+        if self.io.job:
+            self.flash_status(f"{self.io.job.name} is running")
+            return
+        self.clear_del_confirmed()
+        filename = fd.askopenfilename(
+            title = 'Open a file',
+            filetypes = [("Text files", "*.txt"), ("CSV files", "*.csv"),
+                ("JSON Lines", "*.jsonl"), ("Binary export", "*.wtx")])
+
+        if not filename:
+            self.flash_status("No file choosen")
+            return
+        progress = Progress()
+        def work() -> tuple:
+            result = parse_file(filename, mode, progress)
+            if progress.cancelled:
+                return result, None
+            db = self.db.for_thread()
+            try:
+                return result, apply_import(db, result, mode)
+            finally:
+                if db is not self.db:
+                    db.close()
+        def done(work_result: tuple) -> None:
+            result, diff = work_result
+            self.flash_status(diff.summary() if diff else result.summary())
+            # Merge modes touch only imported projects, so do the views
+            if diff and self.db.has_project(self.cur_project.get()):
+                if self.cur_project.get() in diff.affected():
+                    self.timer_seconds = self.get_cur_project_time()
+                    self.timer_label.configure(
+                        text = format_time(self.timer_seconds))
+                    self.update_details()
+                if diff.new_projects:
+                    self.update_config_projects()
+                return
+            self.cur_project.set(self.get_default_project())
+            self.timer_seconds = self.get_cur_project_time()
+            self.timer_label.configure(text = format_time(self.timer_seconds))
+            self.update_details()
+            self.update_config_projects()
+        self.io.submit("Import", work, progress, done)
+
+    def export_projects(self, fmt: str = "csv") -> None:
+        '''
+        Export projects to a file in background thread, text format is:
+        "project name",date,seconds. See EXPORT_FORMATS for formats.
+        '''
+        if self.timer_on():
+            self.flash_status("Not allowed while timer is on")
+            return
+        if self.io.job:
+            self.flash_status(f"{self.io.job.name} is running")
+            return
+        self.clear_del_confirmed()
+        ext = EXPORT_FORMATS[fmt]
+        types = [(f"{fmt.upper()} files", f"*{ext}")]
+
+        filename = fd.asksaveasfilename(filetypes = types,
+            initialfile = f"export{ext}",
+            defaultextension = ext)
+        if not filename:
+            return
+        projects = self.db.project_names()
+        if self.export_current.get():
+            projects = [self.cur_project.get()]
+        progress = Progress(sum(self.db.day_count(prj) for prj in projects))
+        rows = self.db.items(projects)
+        def done(count: int) -> None:
+            self.flash_status(f"Exported {count} lines")
+        self.io.submit("Export",
+            lambda: export_file(filename, rows, fmt, progress), progress, done)
+
+    def cancel_job(self) -> None:
+        '''
+        Cancel running import or export.
+        '''
+        if not self.io.cancel():
+            self.flash_status("Nothing to cancel")
+
+    def quit_app(self) -> None:
+        '''
+        Stop the timer, save database and quit the app.
+        Daemon's timer keeps running without the GUI.
+        '''
+        if not self.client:
+            self.stop_timer()
+        if self.idle_monitor:
+            self.idle_monitor.close()
+        self.io.shutdown()
+        self.db.close()
+        self.destroy()
+
+def run() -> None:
+    '''
+    Start the GUI.
+    '''
+    app = Timer()
+    app.attributes("-topmost", True)
+    app.mainloop()
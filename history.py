@@ -0,0 +1,715 @@
+'''
+Change history: audit log and undo of database changes.
+
+HistoryStore wraps a Store and records every change made through it
+as an event of an append-only log (data.events): timer checkpoints
+(tick batches), set and deleted days, added and deleted projects,
+imports and default project changes. Events of destructive changes
+keep what is needed to undo them: seconds of the deleted day and
+its tags, history of the deleted project, old seconds of merged days.
+A replace import keeps the replaced database as a snapshot file
+(see snapshot.py) next to the log.
+Undo reverts the last change which isn't undone yet by adding back
+the difference, so time counted after the change is kept, and records
+an "undo" event. Changes made inside Store.group_changes() (e.g. all
+windows of an import) are undone together.
+The database itself stays a snapshot plus a journal replayed on load
+(storage.py), compaction keeps the replay short. The log is trimmed
+to the newer half when it grows over MAX_LOG_BYTES.
+Log lines are journal records (storage.encode_record), processes
+sharing the log take flock on it. The log is synced to disk with
+the journal by flush(), events of undoable changes at once when every
+journal record is (storage.FSYNC).
+'''
+import fcntl
+import json
+import os
+import threading
+import time
+from array import array
+from contextlib import contextmanager, nullcontext
+from datetime import date, datetime
+from os import path
+
+import instrument
+import snapshot
+from storage import Store, decode_record, encode_record, merge_value
+
+
+EVENTS_FILE = "data.events"
+MAX_LOG_BYTES = 8 * 1024 * 1024 # log size which drops the older half
+TAIL_BLOCK = 4096 # bytes read back from the log end for the last event
+EVENT_KINDS = ("ticks", "set", "del_day", "del_days", "add_project",
+    "del_project", "default", "replace", "merge", "undo")
+
+
+def describe(event: dict) -> str:
+    '''
+    Return one line text of the event.
+    '''
+    kind = event["kind"]
+    prj = event.get("project")
+    if kind == "ticks":
+        return ", ".join(f"{f'{prj} [{tag}]' if tag else prj} {day} {sec:+d} s"
+            for prj, tag, day, sec in event["cells"])
+    if kind == "set":
+        return f"{prj} {event['day']} set to {event['seconds']} s"
+    if kind == "del_day":
+        return f"{prj} {event['day']} deleted, {event['seconds'] / 3600:.2f} h"
+    if kind == "del_days":
+        return (f"{prj} {len(event['days'])} days deleted, " +
+            f"{event['seconds'] / 3600:.2f} h")
+    if kind == "add_project":
+        return f"{prj} added"
+    if kind == "del_project":
+        return f"{prj} deleted, {event['seconds'] / 3600:.2f} h"
+    if kind == "default":
+        return f"default project {prj}"
+    if kind == "replace":
+        return f"all projects replaced by {len(event['projects'])} imported"
+    if kind == "merge":
+        return (f"{event['changed']} days of {len(event['projects'])} " +
+            f"projects merged ({event['policy']})")
+    if kind == "undo":
+        return "undo of " + ", ".join(f"#{idx}" for idx in event["events"])
+    return kind
+
+def public(event: dict, undone: set = frozenset()) -> dict:
+    '''
+    Return the event without its undo data.
+    '''
+    result = {key: val for key, val in event.items() if key != "undo"}
+    result["undoable"] = "undo" in event
+    result["undone"] = event["id"] in undone
+    return result
+
+def undone_ids(events: list) -> set:
+    return {idx for event in events if event["kind"] == "undo"
+        for idx in event["events"]}
+
+def untagged(days: dict, tags: dict) -> dict:
+    '''
+    Return {day: seconds} of a project without seconds of its
+    {tag: {day: seconds}}, tag seconds are a part of project seconds.
+    '''
+    days = dict(days)
+    for tag_days in tags.values():
+        for day, sec in tag_days.items():
+            days[day] = days.get(day, 0) - sec
+    return {day: sec for day, sec in days.items() if sec}
+
+def to_pairs(days: list) -> list:
+    return [[day.toordinal(), sec] for day, sec in days]
+
+def from_pairs(pairs: list) -> dict:
+    return {date.fromordinal(ordinal): sec for ordinal, sec in pairs}
+
+def to_history(days: list) -> tuple:
+    '''
+    Return snapshot history of (day, seconds) pairs.
+    '''
+    return (array("i", [day.toordinal() for day, sec in days]),
+        array("i", [sec for day, sec in days]))
+
+
+class EventLog:
+    '''
+    Append-only log of events, one journal record per line.
+    Event ids grow by one, the last id is read back from the log
+    when other processes appended to it.
+    '''
+    def __init__(self, filename: str = EVENTS_FILE):
+        self.filename = filename
+        self.file = None # kept open between events
+        self.lock = threading.RLock()
+        self.last_id = 0
+        self.stat = None # (inode, size) of the log after the last known event
+
+    @contextmanager
+    def opened(self):
+        '''
+        Yield the log opened for reading and appending with flock held.
+        '''
+        with self.lock:
+            while True:
+                if not self.file:
+                    self.file = open(self.filename, "a+b")
+                fcntl.flock(self.file, fcntl.LOCK_EX)
+                try:
+                    # The log could be trimmed by other process
+                    if path.samestat(os.fstat(self.file.fileno()),
+                            os.stat(self.filename)):
+                        break
+                except FileNotFoundError:
+                    pass
+                self.close()
+            f = self.file
+            try:
+                yield f
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+                if f is not self.file: # replaced by trim()
+                    f.close()
+
+    def close(self) -> None:
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+
+    def read(self, f, needle: bytes = None) -> list:
+        '''
+        Return events of the log, only of lines with the needle
+        if it's given, damaged lines are skipped. Lines are filtered
+        before they are decoded, so events of a kind are read fast.
+        '''
+        f.seek(0)
+        lines = f if needle is None else (line for line in f if needle in line)
+        return [event for event in map(decode_record, lines)
+            if event is not None]
+
+    def next_id(self, f) -> int:
+        st = os.fstat(f.fileno())
+        if self.stat != (st.st_ino, st.st_size):
+            self.last_id = self.tail(f, st.st_size)
+            self.stat = (st.st_ino, st.st_size)
+        return self.last_id + 1
+
+    def tail(self, f, size: int) -> int:
+        '''
+        Return id of the last event, 0 if there is none. A torn last
+        line is ended, so the next event starts on its own line.
+        '''
+        if size:
+            f.seek(size - 1)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+        pos = size
+        data = b""
+        while pos:
+            start = max(0, pos - TAIL_BLOCK)
+            f.seek(start)
+            data = f.read(pos - start) + data
+            pos = start
+            lines = data.splitlines(keepends = True)
+            # The first line could start in a block not read yet
+            data = lines.pop(0) if pos and lines else b""
+            for line in reversed(lines):
+                event = decode_record(line)
+                if event is not None:
+                    return event["id"]
+        return 0
+
+    def write(self, f, kind: str, fields: dict, sync: bool = False) -> dict:
+        '''
+        Append the event to the log opened by opened() and return it.
+        '''
+        event = {"id": self.next_id(f), "time": time.time(), "kind": kind,
+            **fields}
+        f.write(encode_record(event))
+        f.flush()
+        if sync:
+            os.fsync(f.fileno())
+        st = os.fstat(f.fileno())
+        self.last_id = event["id"]
+        self.stat = (st.st_ino, st.st_size)
+        if st.st_size > MAX_LOG_BYTES:
+            self.trim(f)
+        return event
+
+    def flush(self) -> None:
+        '''
+        Make sure all written events are on disk.
+        '''
+        with self.lock:
+            if self.file:
+                os.fsync(self.file.fileno())
+
+    def backup_file(self, event_id: int) -> str:
+        return f"{self.filename}.{event_id}.wtdb"
+
+    def trim(self, f) -> None:
+        '''
+        Replace the log with its newer half, backups of dropped
+        events are removed.
+        '''
+        f.seek(0)
+        lines = f.readlines()
+        keep = len(lines)
+        size = 0
+        while keep and size + len(lines[keep - 1]) <= MAX_LOG_BYTES // 2:
+            keep -= 1
+            size += len(lines[keep])
+        for line in lines[:keep]:
+            if b'"backup"' in line:
+                event = decode_record(line)
+                if event and path.exists(self.backup_file(event["id"])):
+                    os.remove(self.backup_file(event["id"]))
+        tmp_file = self.filename + ".tmp"
+        with open(tmp_file, "wb") as tmp:
+            tmp.writelines(lines[keep:])
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        os.replace(tmp_file, self.filename)
+        st = os.stat(self.filename)
+        self.stat = (st.st_ino, st.st_size)
+        # The old log is unlocked and closed by opened()
+        self.file = None
+
+
+class HistoryStore(Store):
+    '''
+    Store wrapper recording changes to the event log. Every changing
+    method is overridden to record its event, reads go to the wrapped
+    store.
+    '''
+    def __init__(self, db: Store, filename: str = EVENTS_FILE):
+        self.db = db
+        self.log = EventLog(filename)
+        self.ticks = {} # (project, day, tag) -> seconds not checkpointed yet
+        self.ticks_lock = threading.Lock()
+        self.local = threading.local() # group of changes of the thread
+
+    @property
+    def default(self) -> str:
+        return self.db.default
+
+    @property
+    def threadsafe(self) -> bool:
+        return self.db.threadsafe
+
+    @property
+    def fsync(self) -> bool:
+        return self.db.fsync
+
+    @fsync.setter
+    def fsync(self, value: bool) -> None:
+        # Journal setting of the wrapped store
+        self.db.fsync = value
+
+    def project_names(self) -> list:
+        return self.db.project_names()
+
+    def has_project(self, prj: str) -> bool:
+        return self.db.has_project(prj)
+
+    def first_project(self) -> str:
+        return self.db.first_project()
+
+    def day_time(self, prj: str, day: date) -> int:
+        return self.db.day_time(prj, day)
+
+    def days(self, prj: str) -> list:
+        return self.db.days(prj)
+
+    def day_times(self, prj: str, days: list) -> list:
+        return self.db.day_times(prj, days)
+
+    def day_count(self, prj: str) -> int:
+        return self.db.day_count(prj)
+
+    def days_slice(self, prj: str, start: int, stop: int) -> list:
+        return self.db.days_slice(prj, start, stop)
+
+    def total(self, prj: str) -> int:
+        return self.db.total(prj)
+
+    def rollup(self, prj: str, period: str) -> dict:
+        return self.db.rollup(prj, period)
+
+    def versions(self) -> dict:
+        return self.db.versions()
+
+    def items(self, projects: list = None, start: date = None,
+            end: date = None):
+        return self.db.items(projects, start, end)
+
+    def tag_time(self, prj: str, tag: str, day: date) -> int:
+        return self.db.tag_time(prj, tag, day)
+
+    def tag_totals(self, prj: str) -> dict:
+        return self.db.tag_totals(prj)
+
+    def tag_days(self, prj: str, tag: str) -> list:
+        return self.db.tag_days(prj, tag)
+
+    def flush(self) -> None:
+        self.db.flush()
+        self.log.flush()
+
+    @contextmanager
+    def locked(self):
+        '''
+        Yield the opened log holding its lock and the journal lock,
+        so old seconds read for an event are current.
+        '''
+        with self.log.opened() as f:
+            locked = getattr(self.db, "locked", None)
+            with locked() if locked else nullcontext():
+                yield f
+
+    def record(self, f, kind: str, fields: dict, undo: dict = None) -> dict:
+        '''
+        Append event of a change, undo data makes it undoable.
+        '''
+        if undo is not None:
+            if getattr(self.local, "grouped", False):
+                if self.local.group is None:
+                    self.local.group = self.log.next_id(f)
+                fields["group"] = self.local.group
+            fields["undo"] = undo
+        return self.log.write(f, kind, fields,
+            sync = undo is not None and self.fsync)
+
+    @contextmanager
+    def group_changes(self):
+        '''
+        Put undoable changes made inside into one group, undone
+        together, and record their tick batches as one event.
+        '''
+        if getattr(self.local, "grouped", False):
+            yield
+            return
+        self.local.grouped = True
+        self.local.group = None
+        self.local.ticks = []
+        try:
+            yield
+        finally:
+            self.local.grouped = False
+            if self.local.ticks:
+                self.record_ticks(self.local.ticks)
+
+    def record_ticks(self, cells: list) -> None:
+        '''
+        Record [project, tag, day, seconds] cells saved to the store.
+        '''
+        projects = list(dict.fromkeys(cell[0] for cell in cells))
+        with self.log.opened() as f:
+            self.record(f, "ticks", {"projects": projects, "cells": cells})
+
+    def set_time(self, prj: str, day: date, sec: int,
+            save: bool = True) -> int:
+        if not save:
+            return self.db.set_time(prj, day, sec, save)
+        with self.locked() as f:
+            old = self.db.day_time(prj, day)
+            result = self.db.set_time(prj, day, sec, save)
+            self.record(f, "set", {"project": prj, "day": day.isoformat(),
+                "seconds": sec}, {"seconds": old})
+        return result
+
+    def add_time(self, prj: str, day: date, sec: int,
+            save: bool = True, tag: str = None) -> int:
+        '''
+        Add seconds to the store, seconds added since the last save
+        of the cell are recorded when it's saved.
+        '''
+        key = (prj, day, tag)
+        batch = 0
+        with self.ticks_lock:
+            if save:
+                batch = self.ticks.pop(key, 0) + sec
+            else:
+                self.ticks[key] = self.ticks.get(key, 0) + sec
+        result = self.db.add_time(prj, day, sec, save, tag)
+        if batch:
+            cell = [prj, tag, day.isoformat(), batch]
+            if getattr(self.local, "grouped", False):
+                self.local.ticks.append(cell)
+            else:
+                self.record_ticks([cell])
+        return result
+
+    def del_day(self, prj: str, day: date) -> None:
+        with self.locked() as f:
+            sec = self.db.day_time(prj, day)
+            tags = {tag: self.db.tag_time(prj, tag, day)
+                for tag in self.db.tag_totals(prj)}
+            self.db.del_day(prj, day)
+            self.record(f, "del_day", {"project": prj,
+                "day": day.isoformat(), "seconds": sec},
+                {"tags": {tag: sec for tag, sec in tags.items() if sec}})
+
+    def del_days(self, prj: str, days: list) -> None:
+        '''
+        Delete the days as one change, with seconds of every day
+        and its tags recorded.
+        '''
+        if not days:
+            return
+        with self.locked() as f:
+            secs = self.db.day_times(prj, days)
+            wanted = set(days)
+            tags = {}
+            for tag in self.db.tag_totals(prj):
+                pairs = [(day, sec) for day, sec in self.db.tag_days(prj, tag)
+                    if day in wanted and sec]
+                if pairs:
+                    tags[tag] = to_pairs(pairs)
+            self.db.del_days(prj, days)
+            self.record(f, "del_days", {"project": prj,
+                "days": [day.isoformat() for day in days],
+                "seconds": sum(secs)}, {"seconds": secs, "tags": tags})
+
+    def add_project(self, prj: str) -> None:
+        with self.locked() as f:
+            if self.db.has_project(prj):
+                return
+            self.db.add_project(prj)
+            self.record(f, "add_project", {"project": prj})
+
+    def del_project(self, prj: str) -> None:
+        with self.locked() as f:
+            days = self.db.days(prj)
+            tags = {tag: to_pairs(self.db.tag_days(prj, tag))
+                for tag in self.db.tag_totals(prj)}
+            self.db.del_project(prj)
+            self.record(f, "del_project", {"project": prj,
+                "seconds": sum(sec for day, sec in days)},
+                {"days": to_pairs(days), "tags": tags})
+
+    def set_default(self, prj: str) -> None:
+        with self.locked() as f:
+            old = self.db.default
+            self.db.set_default(prj)
+            if old != prj:
+                # The first default can't be unset
+                self.record(f, "default", {"project": prj},
+                    {"project": old} if old else None)
+
+    def replace(self, projects: dict) -> None:
+        '''
+        Replace all projects, the old ones are kept in a backup
+        snapshot until the event is trimmed from the log.
+        '''
+        # Replace joins running compaction, so the journal lock isn't held
+        with self.log.opened() as f:
+            self.backup(self.log.backup_file(self.log.next_id(f)))
+            self.db.replace(projects)
+            self.record(f, "replace", {"projects": list(projects)},
+                {"backup": True})
+
+    def backup(self, filename: str) -> None:
+        '''
+        Write all projects and their tags to a snapshot file.
+        '''
+        projects = {}
+        tags = {}
+        for prj in self.db.project_names():
+            projects[prj] = to_history(self.db.days(prj))
+            prj_tags = {tag: to_history(self.db.tag_days(prj, tag))
+                for tag in self.db.tag_totals(prj)}
+            if prj_tags:
+                tags[prj] = prj_tags
+        tmp_file = filename + ".tmp"
+        with open(tmp_file, "wb") as f:
+            snapshot.dump(f, self.db.default, projects, tags)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, filename)
+
+    def close(self) -> None:
+        self.log.flush()
+        self.log.close()
+        self.db.close()
+
+    def for_thread(self):
+        db = self.db.for_thread()
+        if db is self.db:
+            return self
+        return HistoryStore(db, self.log.filename)
+
+    def merge(self, projects: dict, add: bool = False) -> None:
+        self.merge_days(projects, "sum" if add else "overwrite")
+
+    def merge_days(self, projects: dict, policy: str = "overwrite") -> int:
+        '''
+        Merge days into the projects, old and new seconds
+        of changed days are recorded.
+        '''
+        with self.locked() as f:
+            cells = {}
+            new = []
+            for prj, days in projects.items():
+                if self.db.has_project(prj):
+                    old = self.db.day_times(prj, list(days))
+                else:
+                    new.append(prj)
+                    old = [0] * len(days)
+                prj_cells = []
+                for (day, sec), old_sec in zip(days.items(), old):
+                    sec = merge_value(policy, old_sec, sec)
+                    if sec != old_sec:
+                        prj_cells.append([day.toordinal(), old_sec, sec])
+                if prj_cells:
+                    cells[prj] = prj_cells
+            result = self.db.merge_days(projects, policy)
+            if cells or new:
+                self.record(f, "merge", {"projects": list(cells),
+                    "policy": policy,
+                    "changed": sum(map(len, cells.values()))},
+                    {"cells": cells, "new": new})
+        return result
+
+    @instrument.timed("history.events")
+    def events(self, kind: str = None, project: str = None,
+            since: date = None, limit: int = None) -> list:
+        '''
+        Return logged events, oldest first, without undo data:
+        of the kind, the project and since the day if given,
+        only the last limit ones.
+        '''
+        needles = [] # JSON of wanted values filtering raw lines
+        if kind:
+            needles.append(b'"kind":' + json.dumps(kind).encode())
+        if project:
+            needles.append(json.dumps(project).encode())
+        if since is not None:
+            since = datetime.combine(since, datetime.min.time()).timestamp()
+        with self.log.opened() as f:
+            undone = undone_ids(self.log.read(f, b'"kind":"undo"'))
+            f.seek(0)
+            lines = f.readlines()
+        result = []
+        # Newest first, so the last limit events are decoded only
+        for line in reversed(lines):
+            if not all(needle in line for needle in needles):
+                continue
+            event = decode_record(line)
+            if event is None:
+                continue
+            if since is not None and event["time"] < since:
+                break
+            if kind and event["kind"] != kind:
+                continue
+            if project and event.get("project") != project and (
+                    project not in event.get("projects", ())):
+                continue
+            result.append(public(event, undone))
+            if len(result) == limit:
+                break
+        result.reverse()
+        return result
+
+    @instrument.timed("history.undo")
+    def undo(self) -> list:
+        '''
+        Undo the last change which isn't undone yet, with all changes
+        of its group. Return undone events, an empty list if there
+        is nothing to undo.
+        '''
+        with self.log.opened() as f:
+            # Undoable events and undo events
+            events = self.log.read(f, b'"undo"')
+            undone = undone_ids(events)
+            stack = [event for event in events
+                if "undo" in event and event["id"] not in undone]
+            if not stack:
+                return []
+            group = stack[-1].get("group")
+            targets = [stack[-1]]
+            if group is not None:
+                targets = [event for event in stack
+                    if event.get("group") == group]
+            for event in reversed(targets):
+                self.revert(event)
+            if self.fsync:
+                self.db.flush()
+            self.record(f, "undo",
+                {"events": [event["id"] for event in targets]})
+        return [public(event) for event in targets]
+
+    def revert(self, event: dict) -> None:
+        '''
+        Revert the change of the event in the wrapped store.
+        '''
+        kind = event["kind"]
+        undo = event["undo"]
+        prj = event.get("project")
+        if kind == "set":
+            day = date.fromisoformat(event["day"])
+            # A day set from none is removed, unless time was added since
+            if not undo["seconds"] and (
+                    self.db.day_time(prj, day) == event["seconds"]):
+                self.db.del_day(prj, day)
+            else:
+                self.db.add_time(prj, day, undo["seconds"] - event["seconds"])
+        elif kind == "del_day":
+            day = date.fromisoformat(event["day"])
+            tags = {tag: {day: sec} for tag, sec in undo["tags"].items()}
+            self.restore(prj, {day: event["seconds"]}, tags)
+        elif kind == "del_days":
+            days = {date.fromisoformat(day): sec
+                for day, sec in zip(event["days"], undo["seconds"]) if sec}
+            tags = {tag: from_pairs(pairs)
+                for tag, pairs in undo["tags"].items()}
+            self.restore(prj, days, tags)
+        elif kind == "del_project":
+            self.db.add_project(prj)
+            tags = {tag: from_pairs(pairs)
+                for tag, pairs in undo["tags"].items()}
+            self.restore(prj, from_pairs(undo["days"]), tags)
+        elif kind == "default":
+            self.db.set_default(undo["project"])
+        elif kind == "replace":
+            self.revert_replace(self.log.backup_file(event["id"]))
+        elif kind == "merge":
+            self.revert_merge(undo["cells"], undo["new"])
+
+    def restore(self, prj: str, days: dict, tags: dict) -> None:
+        '''
+        Add back {day: seconds} of the project and {tag: {day: seconds}}
+        of its tags.
+        '''
+        days = untagged(days, tags)
+        if days:
+            self.db.merge_days({prj: days}, "sum")
+        self.add_tags(prj, tags)
+
+    def add_tags(self, prj: str, tags: dict) -> None:
+        for tag, days in tags.items():
+            for day, sec in days.items():
+                self.db.add_time(prj, day, sec, tag = tag)
+
+    def revert_replace(self, filename: str) -> None:
+        '''
+        Replace all projects with the backup snapshot.
+        '''
+        snap = snapshot.Snapshot(filename)
+        tags = {}
+        for prj, tag, entry in snap.tags:
+            days, seconds = snap.read(entry)
+            tags.setdefault(prj, {})[tag] = from_pairs(zip(days, seconds))
+        projects = {}
+        for prj, entry in snap.projects:
+            days, seconds = snap.read(entry)
+            projects[prj] = untagged(from_pairs(zip(days, seconds)),
+                tags.get(prj, {}))
+        self.db.replace(projects)
+        for prj, prj_tags in tags.items():
+            self.add_tags(prj, prj_tags)
+        if snap.default:
+            self.db.set_default(snap.default)
+
+    def revert_merge(self, cells: dict, new: list) -> None:
+        '''
+        Subtract merged seconds from the days and remove days
+        and new projects left without time.
+        '''
+        for prj, prj_cells in cells.items():
+            if prj in new and self.db.total(prj) == sum(
+                    sec for day, old, sec in prj_cells):
+                self.db.del_project(prj)
+                continue
+            deltas = {date.fromordinal(day): old - sec
+                for day, old, sec in prj_cells}
+            self.db.merge_days({prj: deltas}, "sum")
+            added = [day for day, old, sec in prj_cells if not old]
+            added = [date.fromordinal(day) for day in added]
+            self.db.del_days(prj, [day for day, sec in
+                zip(added, self.db.day_times(prj, added)) if not sec])
+        for prj in new:
+            if (prj not in cells and self.db.has_project(prj) and
+                    not self.db.total(prj)):
+                self.db.del_project(prj)
@@ -0,0 +1,190 @@
+'''
+Idle detection: seconds since the last user input.
+
+Sources of idle time:
+- XScreenSaverSource: idle time of the X11 display from the screensaver
+  extension (libXss via ctypes), one local X request per query.
+- TkSource: time since the last input event of the app windows. It
+  doesn't see work in other apps, so it's only used when chosen with
+  WORKING_TIMER_IDLE_SOURCE=app.
+- SimulatedSource: idle time set by hand, for tests and benchmarks.
+
+IdleMonitor is checked from the timer tick and queries its source at most
+every IDLE_POLL seconds, between queries a check is one clock comparison.
+Idle threshold is WORKING_TIMER_IDLE seconds (0 disables detection),
+WORKING_TIMER_IDLE_ACTION is "ask" to ask about the idle time on resume
+or "subtract" to drop it at once.
+'''
+import ctypes
+import ctypes.util
+import os
+import time
+
+import instrument
+
+
+IDLE_THRESHOLD = int(os.environ.get("WORKING_TIMER_IDLE", 300)) # seconds
+IDLE_ACTION = os.environ.get("WORKING_TIMER_IDLE_ACTION", "ask")
+IDLE_SOURCE = os.environ.get("WORKING_TIMER_IDLE_SOURCE", "x11") # or "app"
+IDLE_POLL = 5 # seconds between idle time queries
+
+
+class XScreenSaverInfo(ctypes.Structure):
+    _fields_ = [
+        ("window", ctypes.c_ulong),
+        ("state", ctypes.c_int),
+        ("kind", ctypes.c_int),
+        ("til_or_since", ctypes.c_ulong),
+        ("idle", ctypes.c_ulong), # milliseconds
+        ("event_mask", ctypes.c_ulong),
+    ]
+
+
+class XScreenSaverSource:
+    '''
+    Idle time of X11 display from the screensaver extension.
+    OSError is raised if the library, display or extension is missing.
+    '''
+    def __init__(self, display: str = None):
+        xlib_name = ctypes.util.find_library("X11")
+        xss_name = ctypes.util.find_library("Xss")
+        if not xlib_name or not xss_name:
+            raise OSError("X11 screensaver library not found")
+        xlib = self.xlib = ctypes.cdll.LoadLibrary(xlib_name)
+        xss = self.xss = ctypes.cdll.LoadLibrary(xss_name)
+        xlib.XOpenDisplay.restype = ctypes.c_void_p
+        xlib.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        xlib.XDefaultRootWindow.restype = ctypes.c_ulong
+        xlib.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        xlib.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        xlib.XFree.argtypes = [ctypes.c_void_p]
+        xss.XScreenSaverQueryExtension.argtypes = [ctypes.c_void_p,
+            ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int)]
+        xss.XScreenSaverAllocInfo.restype = ctypes.POINTER(XScreenSaverInfo)
+        xss.XScreenSaverQueryInfo.argtypes = [ctypes.c_void_p,
+            ctypes.c_ulong, ctypes.POINTER(XScreenSaverInfo)]
+
+        self.display = xlib.XOpenDisplay(display.encode() if display else None)
+        if not self.display:
+            raise OSError("Cannot open X display")
+        event_base, error_base = ctypes.c_int(), ctypes.c_int()
+        if not xss.XScreenSaverQueryExtension(self.display,
+                ctypes.byref(event_base), ctypes.byref(error_base)):
+            xlib.XCloseDisplay(self.display)
+            raise OSError("X screensaver extension is not available")
+        self.root = xlib.XDefaultRootWindow(self.display)
+        self.info = xss.XScreenSaverAllocInfo()
+
+    def idle(self) -> float:
+        self.xss.XScreenSaverQueryInfo(self.display, self.root, self.info)
+        return self.info.contents.idle / 1000
+
+    def close(self) -> None:
+        if self.display:
+            self.xlib.XFree(self.info)
+            self.xlib.XCloseDisplay(self.display)
+            self.display = None
+
+
+class TkSource:
+    '''
+    Time since the last key press, button press or pointer motion
+    in the app windows. Input to other apps isn't seen.
+    '''
+    events = ("<Any-KeyPress>", "<Any-ButtonPress>", "<Motion>")
+
+    def __init__(self, widget, clock = time.monotonic):
+        self.clock = clock
+        self.last = clock()
+        for sequence in self.events:
+            widget.bind_all(sequence, self.touch, add = "+")
+
+    def touch(self, event = None) -> None:
+        self.last = self.clock()
+
+    def idle(self) -> float:
+        return self.clock() - self.last
+
+    def close(self) -> None:
+        pass
+
+
+class SimulatedSource:
+    '''
+    Idle time set by hand.
+    '''
+    def __init__(self, idle: float = 0.0):
+        self.value = idle
+
+    def set(self, idle: float) -> None:
+        self.value = idle
+
+    def idle(self) -> float:
+        return self.value
+
+    def close(self) -> None:
+        pass
+
+
+class IdleMonitor:
+    '''
+    Idle detector checked from the timer tick.
+    '''
+    def __init__(self, source, threshold: float = IDLE_THRESHOLD,
+            poll: float = IDLE_POLL, clock = time.monotonic):
+        self.source = source
+        self.threshold = threshold
+        self.poll = poll
+        self.clock = clock
+        self.next_query = 0.0
+
+    def check(self) -> float:
+        '''
+        Return idle seconds when they reach the threshold, otherwise 0.
+        '''
+        now = self.clock()
+        if now < self.next_query:
+            return 0
+        self.next_query = now + self.poll
+        idle = self.query()
+        return idle if idle >= self.threshold else 0
+
+    @instrument.timed("idle.query")
+    def query(self) -> float:
+        return self.source.idle()
+
+    def reset(self) -> None:
+        '''
+        Query the source on the next check.
+        '''
+        self.next_query = 0.0
+
+    def close(self) -> None:
+        self.source.close()
+
+
+def default_source(widget = None):
+    '''
+    Return X screensaver source, or None without a display or libXss:
+    idle time of the app windows alone would stop timers of someone
+    working in other apps. Tk source of the widget is returned only
+    if IDLE_SOURCE is "app".
+    '''
+    if IDLE_SOURCE == "app":
+        return TkSource(widget) if widget is not None else None
+    if os.environ.get("DISPLAY"):
+        try:
+            return XScreenSaverSource()
+        except OSError:
+            pass
+    return None
+
+def monitor(widget = None, source = None) -> IdleMonitor:
+    '''
+    Return idle monitor of the source (default one if not given),
+    None if detection is disabled or there is no source.
+    '''
+    if not IDLE_THRESHOLD:
+        return None
+    source = source or default_source(widget)
+    return IdleMonitor(source) if source else None
@@ -0,0 +1,166 @@
+'''
+Opt-in instrumentation: latency histograms and counters of storage I/O,
+UI refreshes and timer ticks.
+
+Enabled with WORKING_TIMER_PROFILE environment variable or --profile
+option, both name a JSON file the data is dumped to at exit. While
+disabled an instrumented function only checks one flag.
+'''
+import atexit
+import json
+import os
+import time
+from functools import wraps
+from threading import Lock
+
+
+PROFILE_FILE = os.environ.get("WORKING_TIMER_PROFILE")
+BUCKETS = 32 # histogram buckets: powers of two of microseconds
+
+enabled = False
+histograms = {} # name -> Histogram
+counters = {} # name -> number
+started = time.time()
+lock = Lock()
+
+
+class Histogram:
+    '''
+    Latency histogram with log2 buckets of microseconds:
+    bucket n counts values from 2 ** (n - 1) to 2 ** n microseconds.
+    '''
+    __slots__ = ("count", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+        self.buckets = [0] * BUCKETS
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+        idx = min(int(seconds * 1e6).bit_length(), BUCKETS - 1)
+        self.buckets[idx] += 1
+
+    def percentile(self, pct: float) -> float:
+        '''
+        Return upper bound in seconds of the bucket with pct percentile.
+        '''
+        rank = self.count * pct / 100
+        seen = 0
+        for idx, num in enumerate(self.buckets):
+            seen += num
+            if num and seen >= rank:
+                return min(2 ** idx / 1e6, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "min": self.min or 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": self.max,
+            "total": self.total,
+            "buckets": list(self.buckets),
+        }
+
+
+def enable(filename: str = None) -> None:
+    '''
+    Start recording, dump the data to the file at exit.
+    '''
+    global enabled
+    enabled = True
+    if filename:
+        atexit.register(dump, filename)
+
+def observe(name: str, seconds: float) -> None:
+    '''
+    Add latency to the histogram.
+    '''
+    with lock:
+        hist = histograms.get(name)
+        if hist is None:
+            hist = histograms[name] = Histogram()
+        hist.add(seconds)
+
+def count(name: str, num: int = 1) -> None:
+    '''
+    Add num to the counter.
+    '''
+    with lock:
+        counters[name] = counters.get(name, 0) + num
+
+def timed(name: str):
+    '''
+    Decorator recording latency of the function calls.
+    '''
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+def report() -> dict:
+    '''
+    Return all recorded data.
+    '''
+    with lock:
+        return {
+            "started": started,
+            "uptime": time.time() - started,
+            "histograms": {name: hist.summary()
+                for name, hist in sorted(histograms.items())},
+            "counters": dict(sorted(counters.items())),
+        }
+
+def format_report() -> str:
+    '''
+    Return recorded data as a text table, times in milliseconds.
+    '''
+    data = report()
+    lines = [f"{'name':<24}{'count':>8}{'mean':>9}{'p50':>9}{'p95':>9}" +
+        f"{'p99':>9}{'max':>9}"]
+    for name, hist in data["histograms"].items():
+        lines.append(f"{name:<24}{hist['count']:>8}" + "".join(
+            f"{hist[key] * 1000:>9.2f}"
+            for key in ("mean", "p50", "p95", "p99", "max")))
+    if data["counters"]:
+        lines.append("")
+    for name, num in data["counters"].items():
+        lines.append(f"{name:<24}{num:>8}")
+    return "\n".join(lines)
+
+def dump(filename: str) -> None:
+    '''
+    Write recorded data to JSON file.
+    '''
+    with open(filename, "w") as f:
+        json.dump(report(), f, indent = 1)
+
+def reset() -> None:
+    global started
+    with lock:
+        histograms.clear()
+        counters.clear()
+        started = time.time()
+
+
+if PROFILE_FILE:
+    enable(PROFILE_FILE)
@@ -0,0 +1,170 @@
+'''
+Incremental merge of imported (project, day, seconds) rows into the store.
+
+Rows are streamed and merged in windows of RUN_ROWS rows: rows of
+the window are grouped by project, existing seconds of their days are
+looked up and only changed days are written with one store call
+(Store.merge_days). Work is proportional to the import and memory
+to RUN_ROWS, other projects and days are not touched. Rows needn't
+be sorted.
+A dry run computes the same diff without writing, a day repeated in
+two windows is compared with the stored seconds both times.
+'''
+from storage import MERGE_POLICIES, merge_value
+
+
+MAX_CHANGES = 100 # changed cells kept in the diff
+RUN_ROWS = 100000 # rows merged with one store call
+
+
+class ProjectDiff:
+    '''
+    Changes of one project.
+    '''
+    __slots__ = ("added", "changed", "unchanged", "delta")
+
+    def __init__(self):
+        self.added = 0 # new days
+        self.changed = 0 # existing days with other seconds
+        self.unchanged = 0
+        self.delta = 0 # seconds added to the project
+
+
+class MergeDiff:
+    '''
+    Changes of a merge per project and first MAX_CHANGES changed cells.
+    '''
+    def __init__(self, policy: str, dry_run: bool = False):
+        self.policy = policy
+        self.dry_run = dry_run
+        self.projects = {} # project -> ProjectDiff
+        self.new_projects = []
+        self.changes = [] # (project, day, old seconds, new seconds)
+        self.change_count = 0
+
+    def project(self, prj: str) -> ProjectDiff:
+        diff = self.projects.get(prj)
+        if diff is None:
+            diff = self.projects[prj] = ProjectDiff()
+        return diff
+
+    def add(self, diff: ProjectDiff, prj: str, day, old: int,
+            new: int) -> None:
+        if old == new:
+            diff.unchanged += 1
+            return
+        if old:
+            diff.changed += 1
+        else:
+            diff.added += 1
+        diff.delta += new - old
+        self.change_count += 1
+        if len(self.changes) < MAX_CHANGES:
+            self.changes.append((prj, day, old, new))
+
+    def add_new(self, diff: ProjectDiff, prj: str, days: dict) -> None:
+        '''
+        Add days of a new project, every day with seconds is added.
+        '''
+        for day, sec in days.items():
+            if not sec:
+                diff.unchanged += 1
+            elif len(self.changes) < MAX_CHANGES:
+                self.changes.append((prj, day, 0, sec))
+        added = len(days) - diff.unchanged
+        diff.added += added
+        diff.delta += sum(days.values())
+        self.change_count += added
+
+    def affected(self) -> list:
+        '''
+        Return projects with changed days.
+        '''
+        return [prj for prj, diff in self.projects.items()
+            if diff.added or diff.changed]
+
+    def summary(self) -> str:
+        added = sum(diff.added for diff in self.projects.values())
+        changed = sum(diff.changed for diff in self.projects.values())
+        delta = sum(diff.delta for diff in self.projects.values())
+        text = "Would merge" if self.dry_run else "Merged"
+        return (f"{text} ({self.policy}): {len(self.affected())} projects," +
+            f" {len(self.new_projects)} new, {added} days added," +
+            f" {changed} changed, {delta / 3600:+.2f} h")
+
+    def lines(self) -> list:
+        '''
+        Return text lines of changed projects and first changed days.
+        '''
+        lines = []
+        for prj in self.affected():
+            diff = self.projects[prj]
+            new = " (new)" if prj in self.new_projects else ""
+            lines.append(f"{prj}{new}: {diff.added} added, " +
+                f"{diff.changed} changed, {diff.unchanged} unchanged, " +
+                f"{diff.delta / 3600:+.2f} h")
+        for prj, day, old, new in self.changes:
+            lines.append(f"  {prj} {day}: {old} -> {new}")
+        if self.change_count > len(self.changes):
+            lines.append(f"  ... {self.change_count - len(self.changes)}" +
+                " more changes")
+        return lines
+
+
+def project_runs(rows, policy: str):
+    '''
+    Yield {project: {day: seconds}} of every RUN_ROWS rows.
+    Repeated days of a window are combined by the policy.
+    '''
+    runs = {}
+    count = 0
+    for prj, day, sec in rows:
+        days = runs.get(prj)
+        if days is None:
+            days = runs[prj] = {}
+        if day in days:
+            sec = merge_value(policy, days[day], sec)
+        days[day] = sec
+        count += 1
+        if count >= RUN_ROWS:
+            yield runs
+            runs = {}
+            count = 0
+    if runs:
+        yield runs
+
+def merge_rows(db, rows, policy: str = "overwrite",
+        dry_run: bool = False) -> MergeDiff:
+    '''
+    Merge (project, day, seconds) rows into the store with one
+    of MERGE_POLICIES and return the diff. Dry run only returns it.
+    '''
+    if policy not in MERGE_POLICIES:
+        raise ValueError(f"Unknown merge policy: {policy}")
+    diff = MergeDiff(policy, dry_run)
+    known = set(db.project_names())
+    # All windows are undone as one change
+    with db.group_changes():
+        for runs in project_runs(rows, policy):
+            changed = {}
+            for prj, days in runs.items():
+                prj_diff = diff.project(prj)
+                if prj not in known:
+                    # Every policy keeps imported seconds of a new project
+                    known.add(prj)
+                    diff.new_projects.append(prj)
+                    diff.add_new(prj_diff, prj, days)
+                    changed[prj] = days
+                    continue
+                prj_changed = {}
+                for (day, sec), old in zip(days.items(),
+                        db.day_times(prj, list(days))):
+                    new = merge_value(policy, old, sec)
+                    diff.add(prj_diff, prj, day, old, new)
+                    if new != old:
+                        prj_changed[day] = sec
+                if prj_changed:
+                    changed[prj] = prj_changed
+            if changed and not dry_run:
+                db.merge_days(changed, policy)
+    return diff
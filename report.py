@@ -0,0 +1,260 @@
+'''
+Reports over the projects history.
+
+Project history is loaded into columns on first use: stdlib arrays
+of day ordinals and seconds sorted by day, plus prefix sums, so a sum
+over any days range is one subtraction after a bisect. Reports of all
+projects use one dense column of seconds per day. Columns and results
+are cached and rebuilt only for projects whose data changed
+(Store.versions).
+'''
+from array import array
+from bisect import bisect_left
+from datetime import date, timedelta
+from itertools import accumulate
+
+from engine import WORKDAY
+
+
+BILLING_STEP = 900 # seconds, billable time is rounded to quarters of hour
+ROUNDING = ("up", "nearest", "down")
+
+
+class Columns:
+    '''
+    Project history in columns.
+    '''
+    __slots__ = ("days", "seconds", "prefix")
+
+    def __init__(self, pairs: list):
+        pairs.sort()
+        self.days = array("i", [day.toordinal() for day, sec in pairs])
+        self.seconds = array("i", [sec for day, sec in pairs])
+        self.prefix = array("q", accumulate(self.seconds, initial = 0))
+
+    def total(self) -> int:
+        return self.prefix[-1]
+
+    def range_sum(self, start: int, end: int) -> int:
+        '''
+        Return seconds of days from start to end ordinal, end excluded.
+        '''
+        prefix = self.prefix
+        return (prefix[bisect_left(self.days, end)] -
+            prefix[bisect_left(self.days, start)])
+
+
+class Reports:
+    '''
+    Cached reports of the database.
+    '''
+    def __init__(self, db):
+        self.db = db
+        self.versions = {}
+        self.columns = {} # project -> Columns
+        self.cache = {} # project or None for all -> {report key: result}
+        self.first = None # ordinal of the first day of daily column
+        self.daily = None # seconds of all projects per day, built on demand
+
+    def refresh(self) -> None:
+        '''
+        Drop columns and cached results of changed projects.
+        '''
+        versions = self.db.versions()
+        if versions == self.versions:
+            return
+        for prj in set(self.versions) | set(versions):
+            if self.versions.get(prj) == versions.get(prj):
+                continue
+            old = self.columns.pop(prj, None)
+            if old and self.daily is not None:
+                self.add_daily(old, -1)
+            self.cache.pop(prj, None)
+        self.cache.pop(None, None)
+        self.versions = versions
+
+    def add_daily(self, columns: Columns, sign: int) -> None:
+        '''
+        Add or subtract project seconds to the daily column.
+        '''
+        if not columns.days:
+            return
+        if self.first is None:
+            self.first = columns.days[0]
+        if columns.days[0] < self.first:
+            grow = self.first - columns.days[0]
+            self.daily[0:0] = array("q", bytes(8 * grow))
+            self.first -= grow
+        size = columns.days[-1] - self.first + 1
+        if size > len(self.daily):
+            self.daily.frombytes(bytes(8 * (size - len(self.daily))))
+        daily = self.daily
+        first = self.first
+        for day, sec in zip(columns.days, columns.seconds):
+            daily[day - first] += sign * sec
+
+    def cached(self, prj: str, key: tuple, func):
+        '''
+        Return cached result of the project (None for all projects)
+        or compute it.
+        '''
+        cache = self.cache.setdefault(prj, {})
+        if key not in cache:
+            cache[key] = func()
+        return cache[key]
+
+    def all_columns(self) -> Columns:
+        '''
+        Return dense daily column of all projects as Columns.
+        '''
+        columns = Columns.__new__(Columns)
+        first = self.first or 0
+        columns.days = range(first, first + len(self.daily))
+        columns.seconds = self.daily
+        columns.prefix = array("q", accumulate(self.daily, initial = 0))
+        return columns
+
+    def project_columns(self, prj: str = None) -> Columns:
+        '''
+        Return columns of the project or daily columns of all projects.
+        '''
+        if prj is None:
+            if self.daily is None:
+                self.daily = array("q")
+                for columns in self.columns.values():
+                    self.add_daily(columns, 1)
+            for name in self.versions:
+                self.project_columns(name)
+            return self.cached(None, ("columns",), self.all_columns)
+        columns = self.columns.get(prj)
+        if columns is None:
+            if prj not in self.versions:
+                return Columns([])
+            columns = self.columns[prj] = Columns(self.db.days(prj))
+            if self.daily is not None:
+                self.add_daily(columns, 1)
+        return columns
+
+    def totals(self) -> dict:
+        '''
+        Return {project: seconds}.
+        '''
+        self.refresh()
+        return {prj: self.project_columns(prj).total()
+            for prj in self.versions}
+
+    def periods(self, period: str, prj: str = None) -> dict:
+        '''
+        Return seconds per "week", "month" or "year" of the project
+        or all projects. Keys are the same as Store.rollup() keys.
+        '''
+        def compute() -> dict:
+            columns = self.project_columns(prj)
+            if not len(columns.days):
+                return {}
+            result = {}
+            bounds = period_bounds(columns.days[0], columns.days[-1], period)
+            for (key, start), (_, end) in zip(bounds, bounds[1:]):
+                sec = columns.range_sum(start, end)
+                if sec:
+                    result[key] = sec
+            return result
+        self.refresh()
+        return self.cached(prj, ("periods", period), compute)
+
+    def rolling_average(self, window: int = 7, prj: str = None,
+            start: date = None, end: date = None) -> list:
+        '''
+        Return [(day, average seconds per day of window days ending
+        with the day)] for days from start to end, the history span
+        by default.
+        '''
+        def compute() -> list:
+            columns = self.project_columns(prj)
+            if not len(columns.days):
+                return []
+            first = start.toordinal() if start else columns.days[0]
+            last = end.toordinal() if end else columns.days[-1]
+            days = columns.days
+            prefix = columns.prefix
+            # prefix sums at day bounds, one bisect per day
+            sums = [prefix[bisect_left(days, ordinal)]
+                for ordinal in range(first - window + 1, last + 2)]
+            return [(date.fromordinal(first + idx),
+                (sums[idx + window] - sums[idx]) / window)
+                for idx in range(last - first + 1)]
+        self.refresh()
+        return self.cached(prj, ("rolling", window, start, end), compute)
+
+    def streaks(self, prj: str = None, min_seconds: int = 1,
+            today: date = None) -> tuple:
+        '''
+        Return (current, longest) numbers of consecutive days
+        with at least min_seconds. Current streak ends today
+        or yesterday, as today may be not worked yet.
+        '''
+        today = (today or WORKDAY.today()).toordinal()
+        def compute() -> tuple:
+            columns = self.project_columns(prj)
+            longest = length = 0
+            last = None
+            for day, sec in zip(columns.days, columns.seconds):
+                if sec < min_seconds:
+                    continue
+                length = length + 1 if last == day - 1 else 1
+                longest = max(longest, length)
+                last = day
+            current = length if last is not None and last >= today - 1 else 0
+            return current, longest
+        self.refresh()
+        return self.cached(prj, ("streaks", min_seconds, today), compute)
+
+    def billable(self, step: int = BILLING_STEP, rounding: str = "up",
+            prj: str = None) -> int:
+        '''
+        Return billable seconds of the project or all projects,
+        time of every day is rounded to step seconds.
+        '''
+        def compute(name: str) -> int:
+            seconds = self.project_columns(name).seconds
+            if rounding == "up":
+                steps = sum(-(-sec // step) for sec in seconds)
+            elif rounding == "nearest":
+                steps = sum((sec + step // 2) // step for sec in seconds)
+            else:
+                steps = sum(sec // step for sec in seconds)
+            return steps * step
+        self.refresh()
+        key = ("billable", step, rounding)
+        projects = [prj] if prj else list(self.versions)
+        return sum(self.cached(name, key, lambda: compute(name))
+            for name in projects)
+
+
+def period_bounds(first: int, last: int, period: str) -> list:
+    '''
+    Return [(period key, first day ordinal)] of periods from the one
+    of first ordinal to the one after last ordinal.
+    '''
+    day = date.fromordinal(first)
+    if period == "week":
+        day -= timedelta(days = day.weekday())
+    elif period == "month":
+        day = day.replace(day = 1)
+    else:
+        day = day.replace(month = 1, day = 1)
+    bounds = []
+    while True:
+        if period == "week":
+            key = day.isocalendar()[:2]
+            next_day = day + timedelta(days = 7)
+        elif period == "month":
+            key = day.year, day.month
+            next_day = (day + timedelta(days = 31)).replace(day = 1)
+        else:
+            key = day.year
+            next_day = day.replace(year = day.year + 1)
+        bounds.append((key, day.toordinal()))
+        if day.toordinal() > last:
+            return bounds
+        day = next_day
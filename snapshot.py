@@ -0,0 +1,151 @@
+'''
+Snapshot file format of the journal backend.
+
+Layout, little-endian:
+- HEADER: MAGIC, format version and length of the index.
+- index: JSON {"default": project, "projects": [[project, entry], ...],
+  "tags": [[project, tag, entry], ...]}, entry is [offset, size, count,
+  total, crc32, codec] of a block, offsets start after the index.
+- blocks: one per project and per tag history, int32 day ordinals as
+  deltas to the previous day followed by int32 seconds, compressed
+  with the codec of the block.
+The file is opened with mmap and only its index is read, blocks are
+decoded when a history is first used and unchanged blocks are copied
+as they are by the next snapshot. Days are mostly consecutive, so
+their deltas compress to a few bytes.
+Codec of written blocks is WORKING_TIMER_SNAPSHOT_CODEC: "zlib"
+(default), "lzma" or "none".
+'''
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from itertools import accumulate
+from operator import sub
+
+
+MAGIC = b"WTDB"
+VERSION = 1
+HEADER = struct.Struct("<4sHI") # magic, version, index length
+
+
+def lzma_compress(data: bytes) -> bytes:
+    import lzma # imported for lzma snapshots only, it's slow to import
+    return lzma.compress(data)
+
+def lzma_decompress(data: bytes) -> bytes:
+    import lzma
+    return lzma.decompress(data)
+
+CODECS = {
+    "none": (bytes, bytes),
+    "zlib": (zlib.compress, zlib.decompress),
+    "lzma": (lzma_compress, lzma_decompress),
+}
+CODEC = os.environ.get("WORKING_TIMER_SNAPSHOT_CODEC", "zlib")
+OFFSET, SIZE, COUNT, TOTAL, CRC, CODEC_NAME = range(6) # entry fields
+
+
+def is_snapshot(filename: str) -> bool:
+    '''
+    Return True if the file is in this format, not an old pickle.
+    '''
+    with open(filename, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+def encode_block(days: array, seconds: array, codec: str = CODEC) -> bytes:
+    deltas = array("i", days[:1])
+    deltas.extend(map(sub, days[1:], days))
+    deltas.extend(seconds)
+    if sys.byteorder == "big":
+        deltas.byteswap()
+    return CODECS[codec][0](deltas.tobytes())
+
+def decode_block(data: bytes, count: int, codec: str) -> tuple:
+    '''
+    Return (day ordinals, seconds) arrays of the block.
+    '''
+    values = array("i")
+    values.frombytes(CODECS[codec][1](data))
+    if sys.byteorder == "big":
+        values.byteswap()
+    return array("i", accumulate(values[:count])), values[count:]
+
+
+class Snapshot:
+    '''
+    Snapshot file opened with mmap. ValueError is raised for a file
+    of unknown format or version and for corrupted blocks.
+    '''
+    def __init__(self, filename: str):
+        with open(filename, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        magic, version, length = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError(f"Unknown snapshot format: {filename}")
+        if version > VERSION:
+            raise ValueError(f"Snapshot format version {version} " +
+                f"is newer than supported {VERSION}: {filename}")
+        self.base = HEADER.size + length
+        index = json.loads(self.map[HEADER.size:self.base])
+        self.default = index["default"]
+        self.projects = index["projects"] # [[project, entry], ...]
+        self.tags = index["tags"] # [[project, tag, entry], ...]
+
+    def raw(self, entry: list) -> bytes:
+        '''
+        Return compressed block of the entry.
+        '''
+        start = self.base + entry[OFFSET]
+        data = self.map[start:start + entry[SIZE]]
+        if zlib.crc32(data) != entry[CRC]:
+            raise ValueError("Corrupted snapshot block")
+        return data
+
+    def read(self, entry: list) -> tuple:
+        '''
+        Return (day ordinals, seconds) arrays of the entry.
+        '''
+        return decode_block(self.raw(entry), entry[COUNT], entry[CODEC_NAME])
+
+
+def dump(f, default: str, projects: dict, tags: dict,
+        codec: str = CODEC) -> None:
+    '''
+    Write snapshot of {project: history} and {project: {tag: history}}
+    to the binary file. A history is (day ordinals, seconds) arrays or
+    (entry, compressed block) copied from another snapshot.
+    '''
+    blocks = []
+    offset = 0
+
+    def add(history) -> list:
+        nonlocal offset
+        if isinstance(history[0], list):
+            entry, data = history
+            entry = list(entry)
+        else:
+            days, seconds = history
+            data = encode_block(days, seconds, codec)
+            entry = [0, 0, len(days), sum(seconds), zlib.crc32(data), codec]
+        entry[OFFSET] = offset
+        entry[SIZE] = len(data)
+        blocks.append(data)
+        offset += len(data)
+        return entry
+
+    index = {
+        "default": default,
+        "projects": [[prj, add(history)] for prj, history in projects.items()],
+        "tags": [[prj, tag, add(history)]
+            for prj, prj_tags in tags.items()
+                for tag, history in prj_tags.items()],
+    }
+    index = json.dumps(index, separators = (",", ":")).encode()
+    f.write(HEADER.pack(MAGIC, VERSION, len(index)))
+    f.write(index)
+    for data in blocks:
+        f.write(data)
@@ -0,0 +1,1639 @@
+'''
+Projects database storage.
+
+Two backends share the Store interface:
+- journal (default): the database is kept in memory as a snapshot file
+  plus an append-only journal. Every project history is a pair of int32
+  arrays of day ordinals and seconds sorted by day. Every change appends
+  one small record to the journal, the snapshot is rewritten only when
+  the journal is compacted. Processes sharing the files take fcntl
+  locks and catch up with each other's records before writing.
+  Histories of the snapshot (see snapshot.py) are decoded on first use,
+  old pickle snapshots are migrated on load. Records are synced to disk
+  by flush(), every record with WORKING_TIMER_FSYNC=1.
+- sqlite: the database is a local SQLite file with (project, day)
+  primary key, nothing is loaded up front and aggregates come from SQL.
+Backend is chosen with WORKING_TIMER_BACKEND environment variable.
+'''
+import fcntl
+import json
+import os
+import struct
+import time
+import zlib
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left
+from datetime import date, timedelta
+from contextlib import contextmanager
+from os import path
+from threading import Lock, RLock, Thread
+
+import instrument
+import snapshot
+
+
+DB_FILE = "data.wtdb"
+LEGACY_DB_FILE = "data.pyc" # pickle snapshot of older versions
+SQLITE_FILE = "data.sqlite"
+BACKEND = os.environ.get("WORKING_TIMER_BACKEND", "journal")
+COMPACT_RECORDS = 2000 # journal records before background compaction
+SQL_CHUNK = 500 # values per SQL IN list
+BULK_CELLS = 64 # cells of a project set by rebuilding its history
+JOURNAL_LOCK = 0 # lock file byte held while journal is read or written
+COMPACT_LOCK = 1 # lock file byte held while snapshot is written
+# Lock file content: counters of journal rotations and written snapshots
+GENERATIONS = struct.Struct("<QQ")
+# Running timer checkpoints: seconds between saves
+# and unsaved seconds which force a save
+CHECKPOINT_INTERVAL = int(os.environ.get("WORKING_TIMER_CHECKPOINT", 30))
+CHECKPOINT_UNSAVED = 2 * CHECKPOINT_INTERVAL
+# Sync every change to disk at once instead of leaving it to flush()
+FSYNC = bool(int(os.environ.get("WORKING_TIMER_FSYNC", 0)))
+# Conflict policies of merged days: imported seconds replace existing ones,
+# are added to them or the larger value is kept
+MERGE_POLICIES = ("overwrite", "sum", "max")
+
+
+class Store(ABC):
+    '''
+    Projects database interface used by the app.
+    '''
+    default = None # default project
+    threadsafe = False # can be written and flushed from other threads
+    fsync = False # every change is synced to disk, not only by flush()
+
+    @abstractmethod
+    def project_names(self) -> list:
+        '''
+        Return project names in the order they were added.
+        '''
+
+    @abstractmethod
+    def has_project(self, prj: str) -> bool:
+        '''
+        Return True if the project exists.
+        '''
+
+    def first_project(self) -> str:
+        '''
+        Return first project or None if there are no projects.
+        '''
+        names = self.project_names()
+        return names[0] if names else None
+
+    @abstractmethod
+    def day_time(self, prj: str, day: date) -> int:
+        '''
+        Return project seconds for the day.
+        '''
+
+    @abstractmethod
+    def days(self, prj: str) -> list:
+        '''
+        Return (day, seconds) pairs of the project.
+        '''
+
+    def day_times(self, prj: str, days: list) -> list:
+        '''
+        Return project seconds for every day of the list.
+        '''
+        return [self.day_time(prj, day) for day in days]
+
+    def day_count(self, prj: str) -> int:
+        return len(self.days(prj))
+
+    def days_slice(self, prj: str, start: int, stop: int) -> list:
+        '''
+        Return (day, seconds) pairs of the project from start to stop.
+        '''
+        return self.days(prj)[start:stop]
+
+    def total(self, prj: str) -> int:
+        '''
+        Return project seconds for all days.
+        '''
+        return sum(sec for day, sec in self.days(prj))
+
+    def rollup(self, prj: str, period: str) -> dict:
+        '''
+        Return project seconds per "week", "month" or "year".
+        Keys are (iso year, iso week), (year, month) and year.
+        '''
+        result = {}
+        for day, sec in self.days(prj):
+            key = period_key(day, period)
+            result[key] = result.get(key, 0) + sec
+        return result
+
+    @abstractmethod
+    def versions(self) -> dict:
+        '''
+        Return {project: version}, a project version changes
+        whenever its data changes.
+        '''
+
+    def items(self, projects: list = None, start: date = None,
+            end: date = None):
+        '''
+        Yield (project, day, seconds) for projects (all by default),
+        days from start to end inclusive if given. Every project history
+        is copied before it's yielded, so it's safe to iterate
+        in another thread.
+        '''
+        for prj in projects or self.project_names():
+            for day, sec in self.days(prj):
+                if (start and day < start) or (end and day > end):
+                    continue
+                yield prj, day, sec
+
+    @abstractmethod
+    def set_time(self, prj: str, day: date, sec: int,
+            save: bool = True) -> int:
+        '''
+        Set project seconds for the day.
+        '''
+
+    @abstractmethod
+    def add_time(self, prj: str, day: date, sec: int,
+            save: bool = True, tag: str = None) -> int:
+        '''
+        Add seconds to project time for the day. Unlike set_time
+        changes of the cell by other writers are kept. Seconds
+        of a tag are added to the tag time too, so project time
+        always includes its tags.
+        '''
+
+    def tag_time(self, prj: str, tag: str, day: date) -> int:
+        '''
+        Return seconds of the project tag for the day,
+        project seconds without a tag.
+        '''
+        if tag is None:
+            return self.day_time(prj, day)
+        return dict(self.tag_days(prj, tag)).get(day, 0)
+
+    @abstractmethod
+    def tag_totals(self, prj: str) -> dict:
+        '''
+        Return {tag: seconds} of the project tags.
+        '''
+
+    @abstractmethod
+    def tag_days(self, prj: str, tag: str) -> list:
+        '''
+        Return (day, seconds) pairs of the project tag.
+        '''
+
+    @abstractmethod
+    def del_day(self, prj: str, day: date) -> None:
+        '''
+        Delete the day of the project with its tag days.
+        '''
+
+    def del_days(self, prj: str, days: list) -> None:
+        for day in days:
+            self.del_day(prj, day)
+
+    @abstractmethod
+    def add_project(self, prj: str) -> None:
+        '''
+        Add the project without time, if it doesn't exist.
+        '''
+
+    @abstractmethod
+    def del_project(self, prj: str) -> None:
+        '''
+        Delete the project with its tags.
+        '''
+
+    @abstractmethod
+    def set_default(self, prj: str) -> None:
+        '''
+        Set the default project.
+        '''
+
+    @abstractmethod
+    def replace(self, projects: dict) -> None:
+        '''
+        Replace all projects with {project: {day: seconds}} dict.
+        '''
+
+    def merge(self, projects: dict, add: bool = False) -> None:
+        '''
+        Merge {project: {day: seconds}} dict into the database:
+        overwrite existing days or add seconds to them.
+        '''
+        self.merge_days(projects, "sum" if add else "overwrite")
+
+    @abstractmethod
+    def merge_days(self, projects: dict, policy: str = "overwrite") -> None:
+        '''
+        Merge {project: {day: seconds}} into the database with one
+        of MERGE_POLICIES, only the given days are touched. Seconds
+        of the running timer not saved yet are kept.
+        '''
+
+    @contextmanager
+    def group_changes(self):
+        '''
+        Make changes inside one undoable change of stores
+        with history (see history.py), e.g. all windows of an import
+        or all cells of a checkpoint.
+        '''
+        yield
+
+    def events(self, kind: str = None, project: str = None,
+            since: date = None, limit: int = None) -> list:
+        '''
+        Return logged changes, none without history.
+        '''
+        return []
+
+    def undo(self) -> list:
+        '''
+        Undo the last change, return undone events.
+        '''
+        return []
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def for_thread(self):
+        '''
+        Return store to be used by another thread: this one if it's
+        threadsafe, else a new one of the same file, closed by the caller.
+        '''
+        return self
+
+
+class Days:
+    '''
+    History of one project: day ordinals and seconds in int32 arrays
+    sorted by day. Takes a fraction of the memory and snapshot size
+    of {date: seconds} dict.
+    '''
+    __slots__ = ("days", "seconds")
+
+    def __init__(self, days: dict = None):
+        pairs = sorted((day.toordinal(), sec)
+            for day, sec in (days or {}).items())
+        self.days = array("i", [day for day, sec in pairs])
+        self.seconds = array("i", [sec for day, sec in pairs])
+
+    @classmethod
+    def from_pairs(cls, pairs: list):
+        '''
+        Return history of (day ordinal, seconds) pairs sorted by day.
+        '''
+        days = cls.__new__(cls)
+        days.days = array("i", [day for day, sec in pairs])
+        days.seconds = array("i", [sec for day, sec in pairs])
+        return days
+
+    def __getstate__(self) -> tuple:
+        return self.days, self.seconds
+
+    def __setstate__(self, state: tuple) -> None:
+        self.days, self.seconds = state
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def total(self) -> int:
+        return sum(self.seconds)
+
+    def history(self) -> tuple:
+        '''
+        Return copy of the arrays for a snapshot.
+        '''
+        return array("i", self.days), array("i", self.seconds)
+
+    def copy(self):
+        days = Days.__new__(Days)
+        days.days = array("i", self.days)
+        days.seconds = array("i", self.seconds)
+        return days
+
+    def get(self, day: date) -> int:
+        ordinal = day.toordinal()
+        idx = bisect_left(self.days, ordinal)
+        if idx < len(self.days) and self.days[idx] == ordinal:
+            return self.seconds[idx]
+        return 0
+
+    def set(self, day: date, sec: int) -> int:
+        '''
+        Set seconds of the day and return previous seconds.
+        '''
+        ordinal = day.toordinal()
+        days = self.days
+        # New days are mostly appended at the end of the history
+        if not days or days[-1] < ordinal:
+            days.append(ordinal)
+            self.seconds.append(sec)
+            return 0
+        idx = bisect_left(days, ordinal)
+        if days[idx] == ordinal:
+            old = self.seconds[idx]
+            self.seconds[idx] = sec
+            return old
+        days.insert(idx, ordinal)
+        self.seconds.insert(idx, sec)
+        return 0
+
+    def pop(self, day: date) -> int:
+        '''
+        Remove the day and return its seconds, None if there is no day.
+        '''
+        ordinal = day.toordinal()
+        idx = bisect_left(self.days, ordinal)
+        if idx == len(self.days) or self.days[idx] != ordinal:
+            return None
+        del self.days[idx]
+        return self.seconds.pop(idx)
+
+    def items(self, start: int = 0, stop: int = None) -> list:
+        '''
+        Return (day, seconds) pairs from start to stop position.
+        '''
+        return [(date.fromordinal(day), sec) for day, sec in
+            zip(self.days[start:stop], self.seconds[start:stop])]
+
+
+class LazyDays(Days):
+    '''
+    History of a snapshot block decoded on first use of its arrays.
+    Length and total come from the snapshot index until then.
+    '''
+    __slots__ = ("snapshot", "entry")
+    decode_lock = Lock()
+
+    def __init__(self, snap: snapshot.Snapshot, entry: list):
+        self.snapshot = snap
+        self.entry = entry
+
+    def __getattr__(self, name: str):
+        # Called only while days and seconds aren't set
+        if name not in Days.__slots__:
+            raise AttributeError(name)
+        with self.decode_lock:
+            if self.snapshot is not None:
+                self.days, self.seconds = self.snapshot.read(self.entry)
+                self.snapshot = None
+        return object.__getattribute__(self, name)
+
+    def decoded(self) -> bool:
+        return self.snapshot is None
+
+    def __len__(self) -> int:
+        if self.snapshot is not None:
+            return self.entry[snapshot.COUNT]
+        return len(self.days)
+
+    def total(self) -> int:
+        if self.snapshot is not None:
+            return self.entry[snapshot.TOTAL]
+        return sum(self.seconds)
+
+    def history(self) -> tuple:
+        '''
+        Return compressed block while it isn't decoded.
+        '''
+        snap = self.snapshot
+        if snap is not None:
+            return self.entry, snap.raw(self.entry)
+        return Days.history(self)
+
+
+class Index:
+    '''
+    Running per-project totals and week/month/year rollups,
+    every change of a cell updates them in O(1). Rollups of histories
+    not decoded yet are built on first use.
+    '''
+    periods = ("week", "month", "year")
+
+    def __init__(self):
+        self.totals = {} # project -> seconds
+        self.rollups = {} # project -> period -> key -> seconds
+        self.day_keys = {} # day ordinal -> rollup keys of periods
+        self.tag_totals = {} # project -> tag -> seconds
+        self.lazy = {} # project -> Days without built rollups
+
+    def build(self, projects: dict, tags: dict = None) -> None:
+        '''
+        Build the index of {project: Days} and {project: {tag: Days}}.
+        Tag time is already included in project time.
+        '''
+        self.totals = {}
+        self.rollups = {}
+        self.lazy = {}
+        self.tag_totals = {prj: {tag: days.total()
+            for tag, days in prj_tags.items() if len(days)}
+            for prj, prj_tags in (tags or {}).items()}
+        for prj, days in projects.items():
+            self.build_project(prj, days)
+
+    def build_project(self, prj: str, days: Days) -> None:
+        '''
+        Build totals and rollups of one project, rollups of a history
+        not decoded yet are left for first use.
+        '''
+        self.totals.pop(prj, None)
+        self.rollups.pop(prj, None)
+        self.lazy.pop(prj, None)
+        if not days:
+            return
+        self.totals[prj] = days.total()
+        if isinstance(days, LazyDays) and not days.decoded():
+            self.lazy[prj] = days
+        else:
+            self.build_rollups(prj, days)
+
+    def build_rollups(self, prj: str, days: Days) -> None:
+        rollups = self.rollups[prj] = {}
+        # Days are sorted, every period is a run of them
+        ordinals, seconds = days.days, days.seconds
+        for period in self.periods:
+            rollup = rollups[period] = {}
+            start = 0
+            while start < len(ordinals):
+                day = date.fromordinal(ordinals[start])
+                stop = bisect_left(ordinals,
+                    period_end(day, period).toordinal(), start)
+                sec = sum(seconds[start:stop])
+                if sec:
+                    rollup[period_key(day, period)] = sec
+                start = stop
+
+    def rollup(self, prj: str, period: str) -> dict:
+        '''
+        Return project rollup of the period.
+        '''
+        days = self.lazy.pop(prj, None)
+        if days is not None:
+            self.build_rollups(prj, days)
+        return self.rollups.get(prj, {}).get(period, {})
+
+    def keys(self, ordinal: int) -> list:
+        '''
+        Return rollup keys of periods for the day ordinal.
+        '''
+        keys = self.day_keys.get(ordinal)
+        if keys is None:
+            day = date.fromordinal(ordinal)
+            keys = self.day_keys[ordinal] = [period_key(day, period)
+                for period in self.periods]
+        return keys
+
+    def change(self, prj: str, day: date, delta: int) -> None:
+        '''
+        Add delta seconds of the project day.
+        '''
+        if not delta:
+            return
+        self.totals[prj] = self.totals.get(prj, 0) + delta
+        if prj in self.lazy:
+            # Built from the changed days on first use
+            return
+        rollups = self.rollups.get(prj)
+        if rollups is None:
+            rollups = self.rollups[prj] = {period: {}
+                for period in self.periods}
+        for period, key in zip(self.periods, self.keys(day.toordinal())):
+            rollup = rollups[period]
+            sec = rollup.get(key, 0) + delta
+            if sec:
+                rollup[key] = sec
+            else:
+                del rollup[key]
+
+    def change_tag(self, prj: str, tag: str, delta: int) -> None:
+        '''
+        Add delta seconds of the project tag.
+        '''
+        totals = self.tag_totals.setdefault(prj, {})
+        sec = totals.get(tag, 0) + delta
+        if sec:
+            totals[tag] = sec
+        else:
+            totals.pop(tag, None)
+
+    def drop(self, prj: str) -> None:
+        self.totals.pop(prj, None)
+        self.rollups.pop(prj, None)
+        self.lazy.pop(prj, None)
+        self.tag_totals.pop(prj, None)
+
+
+class JournalStore(Store):
+    '''
+    In-memory projects database backed by snapshot and journal files.
+    Several processes can share the files: every write takes the journal
+    lock and first replays records appended by the others, a snapshot
+    written by another process means a full reload.
+    '''
+    threadsafe = True # writes hold the journal lock
+
+    def __init__(self, db_file: str = DB_FILE):
+        self.db_file = db_file
+        self.journal_file = path.splitext(db_file)[0] + ".wal"
+        self.old_journal_file = self.journal_file + ".old"
+        self.lock_file = path.splitext(db_file)[0] + ".lock"
+        self.legacy_file = path.splitext(db_file)[0] + ".pyc"
+        self.legacy = False # loaded snapshot is a pickle
+        self.projects = {} # project -> Days
+        self.tags = {} # project -> tag -> Days
+        self.index = Index()
+        self.default = None
+        self.unsaved = {} # (project, day) -> seconds added but not journaled
+        self.unsaved_tags = {} # (project, tag, day) -> the same of tags
+        self.generation = 0 # changed when all projects are reloaded
+        self.changes = {} # project -> number of changes
+        self.fsync = FSYNC # sync every journal record to disk
+        self.records = 0 # journal records since last compaction
+        self.lock = RLock()
+        self.lock_depth = 0
+        self.lock_fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o644)
+        self.journal = None
+        self.journal_gen = 0 # journal rotation which is read up to offset
+        self.offset = 0
+        self.snapshot_gen = 0 # loaded snapshot
+        self.compact_thread = None
+        with self.locked(sync = False):
+            self.load()
+        # Journal left by an interrupted compaction
+        if path.exists(self.old_journal_file):
+            self.compact(wait = True)
+        if self.legacy:
+            self.migrate()
+
+    @contextmanager
+    def locked(self, sync: bool = True):
+        '''
+        Hold the journal lock against other threads and processes.
+        The outermost holder catches up with other processes first.
+        '''
+        with self.lock:
+            if not self.lock_depth:
+                fcntl.lockf(self.lock_fd, fcntl.LOCK_EX, 1, JOURNAL_LOCK)
+            self.lock_depth += 1
+            try:
+                if sync and self.lock_depth == 1:
+                    self.sync()
+                yield
+            finally:
+                self.lock_depth -= 1
+                if not self.lock_depth:
+                    fcntl.lockf(self.lock_fd, fcntl.LOCK_UN, 1, JOURNAL_LOCK)
+
+    @instrument.timed("storage.load")
+    def load(self) -> None:
+        '''
+        Load snapshot and replay journals written after it.
+        Unsaved seconds are added back.
+        '''
+        self.close_journal()
+        unsaved = self.unsaved
+        unsaved_tags = self.unsaved_tags
+        self.unsaved = {}
+        self.unsaved_tags = {}
+        self.projects = {}
+        self.tags = {}
+        self.default = None
+        self.journal_gen, self.snapshot_gen = self.generations()
+        self.legacy = False
+        if path.exists(self.db_file) and snapshot.is_snapshot(self.db_file):
+            snap = snapshot.Snapshot(self.db_file)
+            self.projects = {prj: LazyDays(snap, entry)
+                for prj, entry in snap.projects}
+            for prj, tag, entry in snap.tags:
+                self.tags.setdefault(prj, {})[tag] = LazyDays(snap, entry)
+            self.default = snap.default
+        elif path.exists(self.db_file) or path.exists(self.legacy_file):
+            self.load_legacy()
+        self.generation += 1
+        self.index.build(self.projects, self.tags)
+        if path.exists(self.old_journal_file):
+            self.replay(self.old_journal_file)
+        self.offset = 0
+        self.records = 0
+        if path.exists(self.journal_file):
+            self.records = self.replay(self.journal_file)
+        self.unsaved = unsaved
+        for (prj, day), sec in unsaved.items():
+            self.put(prj, day, self.day_time(prj, day) + sec)
+        self.unsaved_tags = unsaved_tags
+        for (prj, tag, day), sec in unsaved_tags.items():
+            self.put_tag(prj, tag, day, self.tag_time(prj, tag, day) + sec)
+
+    def load_legacy(self) -> None:
+        '''
+        Load pickle snapshot of older versions, it's migrated
+        after load.
+        '''
+        filename = self.db_file
+        if not path.exists(filename):
+            filename = self.legacy_file
+        import pickle # imported for migration only, it's slow to import
+        with open(filename, "rb") as f:
+            data = pickle.load(f)
+        self.projects = data["projects"]
+        self.tags = data.get("tags", {})
+        self.default = data["default"]
+        # Snapshots of older versions keep {date: seconds} dicts
+        for prj, days in self.projects.items():
+            if isinstance(days, dict):
+                self.projects[prj] = Days(days)
+        self.legacy = True
+
+    def migrate(self) -> None:
+        '''
+        Write loaded pickle snapshot in the current format,
+        the pickle file is kept with .bak suffix.
+        '''
+        self.compact(wait = True, force = True)
+        self.legacy = False
+        if self.legacy_file != self.db_file and path.exists(self.legacy_file):
+            os.replace(self.legacy_file, self.legacy_file + ".bak")
+
+    @instrument.timed("storage.sync")
+    def sync(self) -> None:
+        '''
+        Replay records appended by other processes since the last sync.
+        '''
+        journal_gen, snapshot_gen = self.generations()
+        if snapshot_gen != self.snapshot_gen:
+            self.load()
+            return
+        if journal_gen != self.journal_gen:
+            # The journal was moved aside by compaction of other process,
+            # its tail is in the old journal until the snapshot is written
+            if (journal_gen != self.journal_gen + 1 or
+                    not path.exists(self.old_journal_file)):
+                self.load()
+                return
+            self.records += self.replay(self.old_journal_file, self.offset)
+            self.close_journal()
+            self.journal_gen = journal_gen
+            self.offset = 0
+        if path.exists(self.journal_file):
+            self.records += self.replay(self.journal_file, self.offset)
+
+    def generations(self) -> tuple:
+        '''
+        Return journal rotations and snapshots counters of all processes.
+        '''
+        data = os.pread(self.lock_fd, GENERATIONS.size, 0)
+        if len(data) < GENERATIONS.size:
+            return 0, 0
+        return GENERATIONS.unpack(data)
+
+    def set_generations(self, journal_gen: int, snapshot_gen: int) -> None:
+        os.pwrite(self.lock_fd, GENERATIONS.pack(journal_gen, snapshot_gen), 0)
+        self.journal_gen = journal_gen
+        self.snapshot_gen = snapshot_gen
+
+    def replay(self, filename: str, start: int = 0) -> int:
+        '''
+        Apply journal records from start offset to the database and
+        return their count, offset is set to the end of the last one.
+        Stop at the first torn or corrupted record and cut it off.
+        '''
+        count = 0
+        good = start
+        with open(filename, "rb") as f:
+            f.seek(start)
+            for line in f:
+                record = decode_record(line)
+                if record is None:
+                    break
+                self.apply(record)
+                good += len(line)
+                count += 1
+        if good < path.getsize(filename):
+            with open(filename, "r+b") as f:
+                f.truncate(good)
+        self.offset = good
+        if instrument.enabled:
+            instrument.count("storage.replayed_records", count)
+        return count
+
+    def apply(self, record: list) -> None:
+        '''
+        Apply one journal record to the in-memory database.
+        '''
+        op = record[0]
+        if op == "set":
+            _, prj, day, sec = record
+            day = date.fromisoformat(day)
+            if self.unsaved:
+                sec += self.unsaved.get((prj, day), 0)
+            self.put(prj, day, sec)
+        elif op == "del":
+            _, prj, day = record
+            days = self.projects.get(prj)
+            day = date.fromisoformat(day)
+            sec = days.pop(day) if days is not None else None
+            if sec is not None:
+                self.index.change(prj, day, -sec)
+            if (prj, day) in self.unsaved:
+                self.put(prj, day, self.unsaved[(prj, day)])
+            for tag, tag_days in self.tags.get(prj, {}).items():
+                sec = tag_days.pop(day)
+                if sec is not None:
+                    self.index.change_tag(prj, tag, -sec)
+                if (prj, tag, day) in self.unsaved_tags:
+                    self.put_tag(prj, tag, day,
+                        self.unsaved_tags[(prj, tag, day)])
+            self.changes[prj] = self.changes.get(prj, 0) + 1
+        elif op == "cells":
+            self.put_cells(record[1], record[2])
+        elif op == "tag":
+            _, prj, tag, day, sec = record
+            day = date.fromisoformat(day)
+            if self.unsaved_tags:
+                sec += self.unsaved_tags.get((prj, tag, day), 0)
+            self.put_tag(prj, tag, day, sec)
+        elif op == "add":
+            if record[1] not in self.projects:
+                self.projects[record[1]] = Days()
+        elif op == "drop":
+            self.projects.pop(record[1], None)
+            self.tags.pop(record[1], None)
+            self.index.drop(record[1])
+            self.changes[record[1]] = self.changes.get(record[1], 0) + 1
+        elif op == "default":
+            self.default = record[1]
+
+    def put(self, prj: str, day: date, sec: int) -> None:
+        '''
+        Set the cell in memory and update the index.
+        '''
+        days = self.projects.get(prj)
+        if days is None:
+            days = self.projects[prj] = Days()
+        self.index.change(prj, day, sec - days.set(day, sec))
+        self.changes[prj] = self.changes.get(prj, 0) + 1
+
+    def put_cells(self, prj: str, cells: list) -> None:
+        '''
+        Set [day ordinal, seconds] cells of the project in memory.
+        Many cells are set at once by rebuilding the project history
+        and its index entries.
+        '''
+        if self.unsaved:
+            cells = [(ordinal, sec + self.unsaved.get(
+                (prj, date.fromordinal(ordinal)), 0))
+                for ordinal, sec in cells]
+        days = self.projects.get(prj)
+        if len(cells) < BULK_CELLS:
+            for ordinal, sec in cells:
+                self.put(prj, date.fromordinal(ordinal), sec)
+            return
+        merged = dict(zip(days.days, days.seconds)) if days else {}
+        merged.update(cells)
+        days = self.projects[prj] = Days.from_pairs(sorted(merged.items()))
+        self.index.build_project(prj, days)
+        self.changes[prj] = self.changes.get(prj, 0) + 1
+
+    def put_tag(self, prj: str, tag: str, day: date, sec: int) -> None:
+        '''
+        Set the tag cell in memory and update tag totals.
+        '''
+        tags = self.tags.setdefault(prj, {})
+        days = tags.get(tag)
+        if days is None:
+            days = tags[tag] = Days()
+        self.index.change_tag(prj, tag, sec - days.set(day, sec))
+        self.changes[prj] = self.changes.get(prj, 0) + 1
+
+    def tag_time(self, prj: str, tag: str, day: date) -> int:
+        if tag is None:
+            return self.day_time(prj, day)
+        days = self.tags.get(prj, {}).get(tag)
+        return days.get(day) if days is not None else 0
+
+    def tag_totals(self, prj: str) -> dict:
+        return dict(self.index.tag_totals.get(prj, {}))
+
+    def tag_days(self, prj: str, tag: str) -> list:
+        days = self.tags.get(prj, {}).get(tag)
+        return days.items() if days is not None else []
+
+    def project_names(self) -> list:
+        return list(self.projects)
+
+    def has_project(self, prj: str) -> bool:
+        return prj in self.projects
+
+    def first_project(self) -> str:
+        return next(iter(self.projects), None)
+
+    def day_time(self, prj: str, day: date) -> int:
+        days = self.projects.get(prj)
+        return days.get(day) if days is not None else 0
+
+    def days(self, prj: str) -> list:
+        days = self.projects.get(prj)
+        return days.items() if days is not None else []
+
+    def day_count(self, prj: str) -> int:
+        days = self.projects.get(prj)
+        return len(days) if days is not None else 0
+
+    def days_slice(self, prj: str, start: int, stop: int) -> list:
+        days = self.projects.get(prj)
+        return days.items(start, stop) if days is not None else []
+
+    def total(self, prj: str) -> int:
+        return self.index.totals.get(prj, 0)
+
+    def versions(self) -> dict:
+        return {prj: (self.generation, self.changes.get(prj, 0))
+            for prj in self.projects}
+
+    def rollup(self, prj: str, period: str) -> dict:
+        return dict(self.index.rollup(prj, period))
+
+    @instrument.timed("storage.append")
+    def append(self, *records: list) -> int:
+        '''
+        Apply the records, append them to the journal with one sync
+        and return number of written bytes.
+        '''
+        lines = b"".join(encode_record(record) for record in records)
+        with self.locked():
+            for record in records:
+                self.apply(record)
+            if not self.journal:
+                self.journal = open(self.journal_file, "ab")
+            self.journal.write(lines)
+            self.journal.flush()
+            if self.fsync:
+                os.fsync(self.journal.fileno())
+            self.offset = self.journal.tell()
+            self.records += len(records)
+        if self.records >= COMPACT_RECORDS:
+            self.compact()
+        return len(lines)
+
+    def set_time(self, prj: str, day: date, sec: int,
+            save: bool = True) -> int:
+        '''
+        Set project time for the day and return number of journaled bytes.
+        Without save only the in-memory value is changed.
+        '''
+        if save:
+            self.unsaved.pop((prj, day), None)
+            return self.append(["set", prj, day.isoformat(), sec])
+        self.put(prj, day, sec)
+        return 0
+
+    def add_time(self, prj: str, day: date, sec: int,
+            save: bool = True, tag: str = None) -> int:
+        '''
+        Add seconds to project time for the day and return number
+        of journaled bytes. Without save the seconds are kept in memory
+        until the next saved change of the cell. The sum is written after
+        catching up with other processes, so their time isn't overwritten.
+        Tag time is journaled as a separate record of the tag cell.
+        '''
+        key = (prj, day)
+        tag_key = (prj, tag, day)
+        if not save:
+            self.unsaved[key] = self.unsaved.get(key, 0) + sec
+            self.put(prj, day, self.day_time(prj, day) + sec)
+            if tag is not None:
+                self.unsaved_tags[tag_key] = (
+                    self.unsaved_tags.get(tag_key, 0) + sec)
+                self.put_tag(prj, tag, day, self.tag_time(prj, tag, day) + sec)
+            return 0
+        with self.locked():
+            self.unsaved.pop(key, None)
+            records = [["set", prj, day.isoformat(),
+                self.day_time(prj, day) + sec]]
+            if tag is not None:
+                self.unsaved_tags.pop(tag_key, None)
+                records.append(["tag", prj, tag, day.isoformat(),
+                    self.tag_time(prj, tag, day) + sec])
+            return self.append(*records)
+
+    def del_day(self, prj: str, day: date) -> None:
+        self.append(["del", prj, day.isoformat()])
+
+    def del_days(self, prj: str, days: list) -> None:
+        if days:
+            self.append(*[["del", prj, day.isoformat()] for day in days])
+
+    def add_project(self, prj: str) -> None:
+        self.append(["add", prj])
+
+    def del_project(self, prj: str) -> None:
+        self.append(["drop", prj])
+
+    def set_default(self, prj: str) -> None:
+        self.append(["default", prj])
+
+    def replace(self, projects: dict) -> None:
+        '''
+        Replace all projects and write a new snapshot.
+        '''
+        def change() -> None:
+            self.projects = {prj: Days(days)
+                for prj, days in projects.items()}
+            self.tags = {}
+            self.unsaved = {}
+            self.unsaved_tags = {}
+            self.generation += 1
+            self.index.build(self.projects)
+        self.compact(force = True, change = change)
+
+    def merge_days(self, projects: dict, policy: str = "overwrite") -> int:
+        '''
+        Merge days into the projects and return number of journaled bytes.
+        Changed cells of a project are journaled as one "cells" record,
+        records of all projects with one write after catching up with
+        other processes. Unchanged cells are skipped.
+        '''
+        with self.locked():
+            records = []
+            unsaved = self.unsaved
+            for prj, days in projects.items():
+                cur = self.projects.get(prj)
+                if cur is None:
+                    records.append(["add", prj])
+                    # Every policy keeps imported seconds of a new project
+                    cells = [[day.toordinal(), sec]
+                        for day, sec in days.items() if sec]
+                    days = {}
+                else:
+                    cells = []
+                for day, sec in days.items():
+                    saved = cur.get(day)
+                    if unsaved:
+                        saved -= unsaved.get((prj, day), 0)
+                    new = merge_value(policy, saved, sec)
+                    if new != saved:
+                        # Unsaved seconds are added back when it's applied
+                        cells.append([day.toordinal(), new])
+                if cells:
+                    records.append(["cells", prj, cells])
+            return self.append(*records) if records else 0
+
+    def compact(self, wait: bool = False, force: bool = False,
+            change = None) -> None:
+        '''
+        Write the database to a new snapshot and drop the journal.
+        The journal is moved aside first, so records appended while
+        the snapshot is written go to a fresh journal.
+        change function changes the database in memory after catching up
+        with other processes. Such changes are not journaled and need
+        force, otherwise the call is skipped while another compaction
+        of this or other process is running.
+        '''
+        running = self.compact_thread
+        if running:
+            if not (wait or force):
+                return
+            running.join()
+        flags = fcntl.LOCK_EX if force else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.lockf(self.lock_fd, flags, 1, COMPACT_LOCK)
+        except OSError:
+            return
+        try:
+            thread = self.rotate(change)
+        except BaseException:
+            fcntl.lockf(self.lock_fd, fcntl.LOCK_UN, 1, COMPACT_LOCK)
+            raise
+        if wait:
+            thread.join()
+
+    def rotate(self, change = None) -> Thread:
+        '''
+        Move the journal aside and start snapshot writing thread.
+        '''
+        with self.locked():
+            if change:
+                change()
+            self.close_journal()
+            rotations = 0
+            if path.exists(self.journal_file):
+                rotations = 1
+                if path.exists(self.old_journal_file):
+                    # Keep records of a previous unfinished compaction,
+                    # other processes can't follow it and have to reload
+                    with open(self.journal_file, "rb") as src, \
+                            open(self.old_journal_file, "ab") as dst:
+                        dst.write(src.read())
+                    os.remove(self.journal_file)
+                    rotations = 2
+                else:
+                    os.replace(self.journal_file, self.old_journal_file)
+            self.set_generations(self.journal_gen + rotations,
+                self.snapshot_gen)
+            self.offset = 0
+            self.records = 0
+            # Unsaved seconds are journaled later, not snapshotted
+            cells = {}
+            for (prj, day), sec in self.unsaved.items():
+                cells.setdefault(prj, []).append((day, sec))
+            projects = {prj: saved_history(days, cells.get(prj))
+                for prj, days in self.projects.items()}
+            cells = {}
+            for (prj, tag, day), sec in self.unsaved_tags.items():
+                cells.setdefault((prj, tag), []).append((day, sec))
+            tags = {prj: {tag: saved_history(days, cells.get((prj, tag)))
+                for tag, days in prj_tags.items()}
+                for prj, prj_tags in self.tags.items()}
+            data = {"projects": projects, "tags": tags,
+                "default": self.default}
+            thread = Thread(target = self.write_snapshot, args = (data,),
+                daemon = True)
+            self.compact_thread = thread
+            thread.start()
+        return thread
+
+    @instrument.timed("storage.snapshot")
+    def write_snapshot(self, data: dict) -> None:
+        '''
+        Atomically replace snapshot file, then remove the old journal.
+        '''
+        try:
+            tmp_file = self.db_file + ".tmp"
+            with open(tmp_file, "wb") as f:
+                snapshot.dump(f, data["default"], data["projects"],
+                    data["tags"])
+                f.flush()
+                os.fsync(f.fileno())
+            with self.locked(sync = False):
+                os.replace(tmp_file, self.db_file)
+                self.set_generations(self.journal_gen, self.snapshot_gen + 1)
+                if path.exists(self.old_journal_file):
+                    os.remove(self.old_journal_file)
+        finally:
+            self.compact_thread = None
+            fcntl.lockf(self.lock_fd, fcntl.LOCK_UN, 1, COMPACT_LOCK)
+
+    def close_journal(self) -> None:
+        if self.journal:
+            self.journal.close()
+            self.journal = None
+
+    def flush(self) -> None:
+        '''
+        Make sure all journal records are on disk.
+        '''
+        with self.lock:
+            if self.journal:
+                self.journal.flush()
+                os.fsync(self.journal.fileno())
+
+    def close(self) -> None:
+        '''
+        Flush the journal and wait for running compaction.
+        '''
+        thread = self.compact_thread
+        if thread:
+            thread.join()
+        with self.lock:
+            self.flush()
+            self.close_journal()
+            if self.lock_fd is not None:
+                os.close(self.lock_fd)
+                self.lock_fd = None
+
+
+class SqliteStore(Store):
+    '''
+    Projects database in SQLite file.
+    Time of the running timer is kept as pending seconds added to cells
+    until it's saved, then it's added in SQL, so time written
+    by other processes meanwhile is kept.
+    '''
+    schema = """
+        CREATE TABLE IF NOT EXISTS projects (
+            name TEXT PRIMARY KEY
+        );
+        CREATE TABLE IF NOT EXISTS times (
+            project TEXT NOT NULL,
+            day TEXT NOT NULL,
+            seconds INTEGER NOT NULL,
+            PRIMARY KEY (project, day)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS tag_times (
+            project TEXT NOT NULL,
+            tag TEXT NOT NULL,
+            day TEXT NOT NULL,
+            seconds INTEGER NOT NULL,
+            PRIMARY KEY (project, tag, day)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, db_file: str = SQLITE_FILE):
+        self.db_file = db_file
+        self.pending = {} # (project, day) -> unsaved added seconds
+        self.pending_tags = {} # (project, tag, day) -> the same of tags
+        self.generation = 0 # changed by commits of other connections
+        self.changes = {} # project -> number of own changes
+        import sqlite3 # imported by this backend only, it's slow to import
+        new = not path.exists(db_file)
+        self.conn = sqlite3.connect(db_file)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.executescript(self.schema)
+        row = self.conn.execute(
+            "SELECT value FROM settings WHERE key = 'default'").fetchone()
+        self.default = row[0] if row else None
+        journal = [DB_FILE, LEGACY_DB_FILE, path.splitext(DB_FILE)[0] + ".wal"]
+        if new and any(path.exists(filename) for filename in journal):
+            src = JournalStore(DB_FILE)
+            try:
+                migrate(src, self)
+            finally:
+                src.close()
+        self.data_version = self.conn.execute(
+            "PRAGMA data_version").fetchone()[0]
+
+    def project_names(self) -> list:
+        return [row[0] for row in self.conn.execute(
+            "SELECT name FROM projects ORDER BY rowid")]
+
+    def has_project(self, prj: str) -> bool:
+        return self.conn.execute("SELECT 1 FROM projects WHERE name = ?",
+            (prj,)).fetchone() is not None
+
+    def first_project(self) -> str:
+        row = self.conn.execute(
+            "SELECT name FROM projects ORDER BY rowid LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def day_time(self, prj: str, day: date) -> int:
+        return self.saved_time(prj, day) + self.pending.get((prj, day), 0)
+
+    def days(self, prj: str) -> list:
+        days = {date.fromisoformat(day): sec for day, sec in self.conn.execute(
+            "SELECT day, seconds FROM times WHERE project = ? ORDER BY day",
+            (prj,))}
+        for (pending_prj, day), sec in self.pending.items():
+            if pending_prj == prj:
+                days[day] = days.get(day, 0) + sec
+        return list(days.items())
+
+    def day_count(self, prj: str) -> int:
+        self.save_pending()
+        return self.conn.execute("SELECT COUNT(*) FROM times WHERE project = ?",
+            (prj,)).fetchone()[0]
+
+    def day_times(self, prj: str, days: list) -> list:
+        '''
+        Return seconds of the days, queried in chunks of SQL_CHUNK days.
+        '''
+        saved = {}
+        keys = [day.isoformat() for day in days]
+        for idx in range(0, len(keys), SQL_CHUNK):
+            chunk = keys[idx:idx + SQL_CHUNK]
+            saved.update(self.conn.execute(
+                "SELECT day, seconds FROM times WHERE project = ? AND " +
+                f"day IN ({','.join('?' * len(chunk))})", [prj] + chunk))
+        pending = self.pending
+        return [saved.get(key, 0) + pending.get((prj, day), 0)
+            for key, day in zip(keys, days)]
+
+    def days_slice(self, prj: str, start: int, stop: int) -> list:
+        self.save_pending()
+        return [(date.fromisoformat(day), sec) for day, sec in self.conn.execute(
+            "SELECT day, seconds FROM times WHERE project = ? ORDER BY day " +
+            "LIMIT ? OFFSET ?", (prj, max(0, stop - start), start))]
+
+    def total(self, prj: str) -> int:
+        total = self.conn.execute(
+            "SELECT COALESCE(SUM(seconds), 0) FROM times WHERE project = ?",
+            (prj,)).fetchone()[0]
+        for (pending_prj, day), sec in self.pending.items():
+            if pending_prj == prj:
+                total += sec
+        return total
+
+    def rollup(self, prj: str, period: str) -> dict:
+        if period == "week":
+            return Store.rollup(self, prj, period)
+        size = 7 if period == "month" else 4
+        result = {}
+        for key, sec in self.conn.execute(
+                "SELECT substr(day, 1, ?) AS period, SUM(seconds) FROM times " +
+                "WHERE project = ? GROUP BY period", (size, prj)):
+            key = tuple(map(int, key.split("-")))
+            result[key if period == "month" else key[0]] = sec
+        for (pending_prj, day), sec in self.pending.items():
+            if pending_prj == prj:
+                key = period_key(day, period)
+                result[key] = result.get(key, 0) + sec
+        return result
+
+    def versions(self) -> dict:
+        data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self.data_version:
+            self.data_version = data_version
+            self.generation += 1
+        return {prj: (self.generation, self.changes.get(prj, 0))
+            for prj in self.project_names()}
+
+    def touch(self, prj: str) -> None:
+        self.changes[prj] = self.changes.get(prj, 0) + 1
+
+    def saved_time(self, prj: str, day: date) -> int:
+        row = self.conn.execute(
+            "SELECT seconds FROM times WHERE project = ? AND day = ?",
+            (prj, day.isoformat())).fetchone()
+        return row[0] if row else 0
+
+    def items(self, projects: list = None, start: date = None,
+            end: date = None):
+        '''
+        Return iterator over own connection, so it can be used
+        in another thread.
+        '''
+        self.save_pending()
+        query = ("SELECT project, day, seconds FROM times " +
+            "JOIN projects ON name = project WHERE day BETWEEN ? AND ?")
+        args = [start.isoformat() if start else "",
+            end.isoformat() if end else "9"]
+        if projects:
+            query += f" AND project IN ({','.join('?' * len(projects))})"
+            args += projects
+        query += " ORDER BY projects.rowid, day"
+        def rows():
+            import sqlite3
+            conn = sqlite3.connect(self.db_file)
+            try:
+                for prj, day, sec in conn.execute(query, args):
+                    yield prj, date.fromisoformat(day), sec
+            finally:
+                conn.close()
+        return rows()
+
+    def set_time(self, prj: str, day: date, sec: int,
+            save: bool = True) -> int:
+        self.touch(prj)
+        if not save:
+            self.pending[(prj, day)] = sec - self.saved_time(prj, day)
+            return 0
+        self.pending.pop((prj, day), None)
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO projects (name) VALUES (?)", (prj,))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO times (project, day, seconds) " +
+                "VALUES (?, ?, ?)", (prj, day.isoformat(), sec))
+        return 0
+
+    def add_time(self, prj: str, day: date, sec: int,
+            save: bool = True, tag: str = None) -> int:
+        self.touch(prj)
+        self.pending[(prj, day)] = self.pending.get((prj, day), 0) + sec
+        if tag is not None:
+            key = (prj, tag, day)
+            self.pending_tags[key] = self.pending_tags.get(key, 0) + sec
+        if save:
+            self.save_pending()
+        return 0
+
+    def tag_time(self, prj: str, tag: str, day: date) -> int:
+        if tag is None:
+            return self.day_time(prj, day)
+        row = self.conn.execute(
+            "SELECT seconds FROM tag_times WHERE project = ? AND tag = ? " +
+            "AND day = ?", (prj, tag, day.isoformat())).fetchone()
+        return (row[0] if row else 0) + self.pending_tags.get(
+            (prj, tag, day), 0)
+
+    def tag_totals(self, prj: str) -> dict:
+        totals = dict(self.conn.execute(
+            "SELECT tag, SUM(seconds) FROM tag_times WHERE project = ? " +
+            "GROUP BY tag ORDER BY tag", (prj,)))
+        for (pending_prj, tag, day), sec in self.pending_tags.items():
+            if pending_prj == prj:
+                totals[tag] = totals.get(tag, 0) + sec
+        return totals
+
+    def tag_days(self, prj: str, tag: str) -> list:
+        days = {date.fromisoformat(day): sec for day, sec in self.conn.execute(
+            "SELECT day, seconds FROM tag_times WHERE project = ? AND tag = ? " +
+            "ORDER BY day", (prj, tag))}
+        for (pending_prj, pending_tag, day), sec in self.pending_tags.items():
+            if pending_prj == prj and pending_tag == tag:
+                days[day] = days.get(day, 0) + sec
+        return sorted(days.items())
+
+    @instrument.timed("storage.save_pending")
+    def save_pending(self) -> None:
+        '''
+        Add pending seconds to the database.
+        '''
+        if not self.pending and not self.pending_tags:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO projects (name) VALUES (?)",
+                {(prj,) for prj, day in self.pending})
+            self.conn.executemany(
+                "INSERT INTO times (project, day, seconds) VALUES (?, ?, ?) " +
+                "ON CONFLICT (project, day) " +
+                "DO UPDATE SET seconds = seconds + excluded.seconds",
+                [(prj, day.isoformat(), sec)
+                    for (prj, day), sec in self.pending.items()])
+            self.conn.executemany(
+                "INSERT INTO tag_times (project, tag, day, seconds) " +
+                "VALUES (?, ?, ?, ?) ON CONFLICT (project, tag, day) " +
+                "DO UPDATE SET seconds = seconds + excluded.seconds",
+                [(prj, tag, day.isoformat(), sec)
+                    for (prj, tag, day), sec in self.pending_tags.items()])
+        self.pending = {}
+        self.pending_tags = {}
+
+    def del_day(self, prj: str, day: date) -> None:
+        self.touch(prj)
+        with self.conn:
+            self.conn.execute(
+                "DELETE FROM times WHERE project = ? AND day = ?",
+                (prj, day.isoformat()))
+            self.conn.execute(
+                "DELETE FROM tag_times WHERE project = ? AND day = ?",
+                (prj, day.isoformat()))
+
+    def del_days(self, prj: str, days: list) -> None:
+        self.touch(prj)
+        rows = [(prj, day.isoformat()) for day in days]
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM times WHERE project = ? AND day = ?", rows)
+            self.conn.executemany(
+                "DELETE FROM tag_times WHERE project = ? AND day = ?", rows)
+
+    def add_project(self, prj: str) -> None:
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO projects (name) VALUES (?)", (prj,))
+
+    def del_project(self, prj: str) -> None:
+        self.touch(prj)
+        self.pending = {key: sec for key, sec in self.pending.items()
+            if key[0] != prj}
+        self.pending_tags = {key: sec
+            for key, sec in self.pending_tags.items() if key[0] != prj}
+        with self.conn:
+            self.conn.execute("DELETE FROM times WHERE project = ?", (prj,))
+            self.conn.execute("DELETE FROM tag_times WHERE project = ?",
+                (prj,))
+            self.conn.execute("DELETE FROM projects WHERE name = ?", (prj,))
+
+    def set_default(self, prj: str) -> None:
+        self.default = prj
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO settings (key, value) " +
+                "VALUES ('default', ?)", (prj,))
+
+    def replace(self, projects: dict) -> None:
+        self.pending = {}
+        self.pending_tags = {}
+        self.generation += 1
+        with self.conn:
+            self.conn.execute("DELETE FROM times")
+            self.conn.execute("DELETE FROM tag_times")
+            self.conn.execute("DELETE FROM projects")
+            self.conn.executemany("INSERT INTO projects (name) VALUES (?)",
+                [(prj,) for prj in projects])
+            self.conn.executemany(
+                "INSERT INTO times (project, day, seconds) VALUES (?, ?, ?)",
+                [(prj, day.isoformat(), sec)
+                    for prj, days in projects.items()
+                        for day, sec in days.items()])
+
+    def merge_days(self, projects: dict, policy: str = "overwrite") -> int:
+        update = {"sum": "seconds + excluded.seconds",
+            "max": "MAX(seconds, excluded.seconds)"}.get(policy,
+            "excluded.seconds")
+        for prj in projects:
+            self.touch(prj)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO projects (name) VALUES (?)",
+                [(prj,) for prj in projects])
+            self.conn.executemany(
+                "INSERT INTO times (project, day, seconds) VALUES (?, ?, ?) " +
+                f"ON CONFLICT (project, day) DO UPDATE SET seconds = {update}",
+                [(prj, day.isoformat(), sec)
+                    for prj, days in projects.items()
+                        for day, sec in days.items()])
+        return 0
+
+    def flush(self) -> None:
+        self.save_pending()
+
+    def close(self) -> None:
+        self.save_pending()
+        self.conn.close()
+
+    def for_thread(self):
+        # The connection belongs to the thread which opened it
+        return SqliteStore(self.db_file)
+
+
+class Checkpointer:
+    '''
+    Checkpoint scheduler for the running timer.
+    Ticks add seconds to the in-memory database only, changed
+    (project, day, tag) cells are journaled every interval seconds or when
+    unsaved time reaches max_unsaved, so a crash loses at most interval
+    seconds. Only seconds counted by the timer are added, so time written
+    to the same cells by other processes is kept.
+    '''
+    def __init__(self, db: Store, interval: int = CHECKPOINT_INTERVAL,
+            max_unsaved: int = CHECKPOINT_UNSAVED):
+        self.db = db
+        self.interval = interval
+        self.max_unsaved = max_unsaved
+        self.seen = {} # (project, day, tag) -> last seconds of the timer
+        self.dirty = set() # (project, day, tag) cells not saved yet
+        self.unsaved = 0 # unsaved seconds of all dirty cells
+        self.last_save = time.monotonic()
+        # I/O cost counters
+        self.writes = 0
+        self.bytes = 0
+        self.io_time = 0.0
+
+    def start(self, prj: str, day: date, sec: int, tag: str = None) -> None:
+        '''
+        Start checkpointing the timer running from sec seconds.
+        Several timers of different projects or tags can be checkpointed.
+        '''
+        self.seen[(prj, day, tag)] = sec
+
+    def update(self, prj: str, day: date, sec: int, tag: str = None) -> None:
+        '''
+        Add seconds counted since the last update to the cell in memory
+        and checkpoint it when it's due.
+        '''
+        key = (prj, day, tag)
+        delta = sec - self.seen.get(key, sec)
+        self.seen[key] = sec
+        if delta:
+            self.db.add_time(prj, day, delta, save = False, tag = tag)
+            self.dirty.add(key)
+            self.unsaved += abs(delta)
+        if (self.unsaved >= self.max_unsaved or
+                time.monotonic() - self.last_save >= self.interval):
+            self.save()
+
+    @instrument.timed("storage.checkpoint")
+    def save(self) -> None:
+        '''
+        Journal all dirty cells.
+        '''
+        start = time.perf_counter()
+        with self.db.group_changes():
+            for prj, day, tag in self.dirty:
+                self.bytes += self.db.add_time(prj, day, 0, tag = tag)
+                self.writes += 1
+        self.io_time += time.perf_counter() - start
+        self.dirty = set()
+        self.unsaved = 0
+        self.last_save = time.monotonic()
+
+    def stop(self, prj: str = None, tag: str = None) -> None:
+        '''
+        Journal dirty cells and forget the stopped timer,
+        all timers without a project.
+        '''
+        self.save()
+        if prj is None:
+            self.seen = {}
+            return
+        self.seen = {key: sec for key, sec in self.seen.items()
+            if key[0] != prj or key[2] != tag}
+
+    def stats(self) -> dict:
+        '''
+        Return I/O cost of checkpoints.
+        '''
+        return {"writes": self.writes, "bytes": self.bytes,
+            "io_time": self.io_time}
+
+
+def merge_value(policy: str, old: int, new: int) -> int:
+    '''
+    Return merged seconds of a day by one of MERGE_POLICIES.
+    '''
+    if policy == "sum":
+        return old + new
+    if policy == "max":
+        return max(old, new)
+    return new
+
+def period_key(day: date, period: str):
+    '''
+    Return rollup key of the day for "week", "month" or "year" period.
+    '''
+    if period == "week":
+        return day.isocalendar()[:2]
+    if period == "month":
+        return day.year, day.month
+    return day.year
+
+def period_end(day: date, period: str) -> date:
+    '''
+    Return the first day after "week", "month" or "year" of the day.
+    '''
+    if period == "week":
+        return day + timedelta(days = 7 - day.weekday())
+    if period == "month":
+        return (day.replace(day = 28) + timedelta(days = 4)).replace(day = 1)
+    return date(day.year + 1, 1, 1)
+
+def saved_history(days: Days, cells: list) -> tuple:
+    '''
+    Return snapshot history of days without unsaved (day, seconds) cells.
+    '''
+    if not cells:
+        return days.history()
+    days = days.copy()
+    for day, sec in cells:
+        sec = days.get(day) - sec
+        if sec:
+            days.set(day, sec)
+        else:
+            days.pop(day)
+    return days.history()
+
+def encode_record(record: list) -> bytes:
+    '''
+    Return journal line: crc32 of payload and JSON payload.
+    '''
+    payload = json.dumps(record, separators = (",", ":")).encode()
+    return b"%08x %s\n" % (zlib.crc32(payload), payload)
+
+def decode_record(line: bytes) -> list:
+    '''
+    Return record from journal line or None if the line is damaged.
+    '''
+    if not line.endswith(b"\n") or len(line) < 10:
+        return None
+    crc, payload = line[:8], line[9:-1]
+    try:
+        if int(crc, 16) != zlib.crc32(payload):
+            return None
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+def migrate(src: Store, dst: Store) -> None:
+    '''
+    Copy all projects with their tags and default project between stores.
+    Project seconds include tag seconds, so projects are copied without
+    them and tag seconds are added back with their tags.
+    '''
+    projects = {prj: dict(src.days(prj)) for prj in src.project_names()}
+    tags = {prj: {tag: src.tag_days(prj, tag) for tag in src.tag_totals(prj)}
+        for prj in projects}
+    for prj, prj_tags in tags.items():
+        for tag_days in prj_tags.values():
+            for day, sec in tag_days:
+                projects[prj][day] = projects[prj].get(day, 0) - sec
+    dst.replace(projects)
+    with dst.group_changes():
+        for prj, prj_tags in tags.items():
+            for tag, tag_days in prj_tags.items():
+                for day, sec in tag_days:
+                    dst.add_time(prj, day, sec, tag = tag)
+    if src.default:
+        dst.set_default(src.default)
+
+@instrument.timed("storage.load_db")
+def load_db(backend: str = BACKEND) -> Store:
+    '''
+    Open database of the backend and return it with its change
+    history. Existing journal database is migrated to a new SQLite file.
+    '''
+    from history import HistoryStore # history is built on storage
+    if backend == "sqlite":
+        return HistoryStore(SqliteStore(SQLITE_FILE))
+    return HistoryStore(JournalStore(DB_FILE))
+
+@instrument.timed("storage.save")
+def save_projects(db: Store) -> None:
+    '''
+    Save projects. Changes are already journaled,
+    only flush them to disk.
+    '''
+    db.flush()
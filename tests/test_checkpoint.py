@@ -0,0 +1,97 @@
+'''
+Checkpoints of running timers: time lost by a crash is bounded
+by the checkpoint interval.
+'''
+import sys
+import tempfile
+import unittest
+from datetime import date
+from os import path
+from unittest import mock
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from storage import Checkpointer, JournalStore
+
+
+DAY = date(2024, 1, 1)
+INTERVAL = 30
+
+
+class CheckpointTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_file = path.join(self.tmp.name, "data.wtdb")
+        self.db = JournalStore(self.db_file)
+        self.now = 0
+        patcher = mock.patch("time.monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def saved(self, prj: str, tag: str = None) -> int:
+        '''
+        Return seconds another process sees after a crash of this one.
+        '''
+        db = JournalStore(self.db_file)
+        try:
+            if tag:
+                return db.tag_time(prj, tag, DAY)
+            return db.day_time(prj, DAY)
+        finally:
+            db.close()
+
+    def run_timer(self, checkpointer: Checkpointer, sec: int, prj: str,
+            tag: str = None) -> None:
+        for _ in range(sec):
+            self.now += 1
+            checkpointer.update(prj, DAY, int(self.now), tag)
+
+    def test_lost_time(self):
+        checkpointer = Checkpointer(self.db, INTERVAL, 1000)
+        checkpointer.start("work", DAY, 0)
+        for sec in range(1, 200):
+            self.run_timer(checkpointer, 1, "work")
+            self.assertEqual(self.db.day_time("work", DAY), sec)
+            self.assertLess(sec - self.saved("work"), INTERVAL)
+        self.assertEqual(checkpointer.writes, 199 // INTERVAL)
+
+    def test_max_unsaved(self):
+        checkpointer = Checkpointer(self.db, INTERVAL, 10)
+        checkpointer.start("work", DAY, 0)
+        checkpointer.start("work", DAY, 0, "build")
+        for sec in range(1, 60):
+            self.now += 1
+            checkpointer.update("work", DAY, sec)
+            checkpointer.update("work", DAY, sec, "build")
+            # Both timers count, so twice the seconds are unsaved
+            self.assertLessEqual(2 * sec - self.saved("work"), 10)
+        self.assertLessEqual(59 - self.saved("work", "build"), 10)
+
+    def test_stop(self):
+        checkpointer = Checkpointer(self.db, INTERVAL)
+        checkpointer.start("work", DAY, 0)
+        self.run_timer(checkpointer, 45, "work")
+        checkpointer.stop("work")
+        self.assertEqual(self.saved("work"), 45)
+        self.assertEqual(checkpointer.seen, {})
+
+    def test_other_writer(self):
+        checkpointer = Checkpointer(self.db, INTERVAL)
+        checkpointer.start("work", DAY, 0)
+        self.run_timer(checkpointer, 10, "work")
+        other = JournalStore(self.db_file)
+        try:
+            other.add_time("work", DAY, 500)
+        finally:
+            other.close()
+        self.run_timer(checkpointer, 10, "work")
+        checkpointer.stop()
+        self.assertEqual(self.saved("work"), 520)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+'''
+Audit log and undo of changes made through HistoryStore.
+'''
+import sys
+import tempfile
+import unittest
+from datetime import date, timedelta
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+import history
+from history import HistoryStore
+from storage import JournalStore
+
+
+DAY = date(2024, 3, 1)
+
+
+class HistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = self.open()
+        self.db.add_time("work", DAY, 100)
+        self.db.add_time("work", DAY, 30, tag = "build")
+        self.db.add_time("work", DAY + timedelta(1), 200)
+        self.db.add_time("home", DAY, 50)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def open(self) -> HistoryStore:
+        db = JournalStore(path.join(self.tmp.name, "data.wtdb"))
+        return HistoryStore(db, path.join(self.tmp.name, "data.events"))
+
+    def state(self) -> dict:
+        return {prj: (self.db.days(prj), self.db.tag_totals(prj))
+            for prj in self.db.project_names()}
+
+    def test_del_day(self):
+        before = self.state()
+        self.db.del_day("work", DAY)
+        self.assertEqual(self.db.day_time("work", DAY), 0)
+        self.assertEqual(self.db.tag_totals("work"), {})
+        self.assertEqual([event["kind"] for event in self.db.undo()],
+            ["del_day"])
+        self.assertEqual(self.state(), before)
+        self.assertEqual(self.db.undo(), [])
+
+    def test_del_days(self):
+        before = self.state()
+        self.db.del_days("work", [DAY, DAY + timedelta(1)])
+        self.assertEqual(self.db.days("work"), [])
+        events = self.db.events(kind = "del_days")
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]["seconds"], 330)
+        self.assertEqual(len(self.db.undo()), 1)
+        self.assertEqual(self.state(), before)
+
+    def test_del_project(self):
+        before = self.state()
+        self.db.del_project("work")
+        self.assertFalse(self.db.has_project("work"))
+        self.db.undo()
+        self.assertEqual(self.state(), before)
+
+    def test_undo_keeps_later_time(self):
+        self.db.del_day("home", DAY)
+        self.db.add_time("home", DAY, 10)
+        self.db.undo()
+        self.assertEqual(self.db.day_time("home", DAY), 60)
+
+    def test_set(self):
+        new_day = DAY + timedelta(5)
+        self.db.set_time("work", DAY, 500)
+        self.db.set_time("work", new_day, 70)
+        self.db.undo()
+        self.assertNotIn(new_day, dict(self.db.days("work")))
+        self.db.undo()
+        self.assertEqual(self.db.day_time("work", DAY), 130)
+
+    def test_merge(self):
+        before = self.state()
+        self.db.merge_days({"work": {DAY: 1000, DAY + timedelta(7): 5},
+            "new": {DAY: 20}}, "overwrite")
+        self.assertEqual(self.db.day_time("work", DAY), 1000)
+        self.db.undo()
+        self.assertEqual(self.state(), before)
+        self.assertFalse(self.db.has_project("new"))
+
+    def test_replace(self):
+        before = self.state()
+        self.db.set_default("home")
+        self.db.replace({"other": {DAY: 10}})
+        self.assertEqual(self.db.project_names(), ["other"])
+        self.db.undo()
+        self.assertEqual(self.state(), before)
+        self.assertEqual(self.db.default, "home")
+
+    def test_group(self):
+        before = self.state()
+        with self.db.group_changes():
+            self.db.del_day("work", DAY)
+            self.db.del_project("home")
+        self.db.del_day("work", DAY + timedelta(1))
+        self.assertEqual(len(self.db.undo()), 1)
+        self.assertEqual(len(self.db.undo()), 2)
+        self.assertEqual(self.state(), before)
+        undo = self.db.events(kind = "undo")
+        self.assertEqual(len(undo), 2)
+        self.assertTrue(all(event["undone"] for event in
+            self.db.events(kind = "del_day")))
+
+    def test_events(self):
+        self.db.del_day("home", DAY)
+        self.db.set_default("work")
+        kinds = [event["kind"] for event in self.db.events()]
+        self.assertEqual(kinds[-2:], ["del_day", "default"])
+        self.assertEqual([event["kind"] for event in
+            self.db.events(project = "home")], ["ticks", "del_day"])
+        self.assertEqual(len(self.db.events(limit = 2)), 2)
+        self.assertEqual(self.db.events(kind = "merge"), [])
+        self.assertEqual(self.db.events(since = date.today() +
+            timedelta(1)), [])
+        event = self.db.events(kind = "del_day")[0]
+        self.assertTrue(event["undoable"])
+        self.assertNotIn("undo", event)
+        self.assertEqual(history.describe(event), "home 2024-03-01 deleted, " +
+            "0.01 h")
+
+    def test_reopen(self):
+        self.db.del_day("home", DAY)
+        last = self.db.events()[-1]["id"]
+        self.db.close()
+        self.db = self.open()
+        self.db.set_default("work")
+        self.assertEqual(self.db.events()[-1]["id"], last + 1)
+        # The first default has nothing to go back to
+        self.assertEqual(self.db.undo()[0]["kind"], "del_day")
+        self.assertEqual(self.db.day_time("home", DAY), 50)
+
+    def test_trim(self):
+        max_bytes = history.MAX_LOG_BYTES
+        history.MAX_LOG_BYTES = 4096
+        try:
+            self.db.replace({"work": {DAY: 10}})
+            backup = self.db.log.backup_file(self.db.events()[-1]["id"])
+            self.assertTrue(path.exists(backup))
+            for _ in range(200):
+                self.db.add_time("work", DAY, 1)
+            size = path.getsize(path.join(self.tmp.name, "data.events"))
+            self.assertLessEqual(size, 4096)
+            self.assertFalse(path.exists(backup))
+            events = self.db.events()
+            ids = [event["id"] for event in events]
+            self.assertEqual(ids, list(range(ids[0], ids[0] + len(ids))))
+            self.assertEqual(self.db.undo(), [])
+            self.assertEqual(self.db.day_time("work", DAY), 210)
+        finally:
+            history.MAX_LOG_BYTES = max_bytes
+
+
+if __name__ == "__main__":
+    unittest.main()
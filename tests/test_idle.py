@@ -0,0 +1,167 @@
+'''
+Idle detection driven by a simulated idle source and a fake clock:
+timers paused at the threshold, idle time subtracted by the daemon
+and asked about on resume by the GUI (mocked Tk of benchmarks).
+'''
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from os import path
+from unittest import mock
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, path.join(ROOT, "benchmarks"))
+import mock_tk
+mock_tk.install()
+
+import gui
+import idle
+from daemon import Daemon
+from engine import WORKDAY, TimerEngine, TimerGroup
+from idle import IdleMonitor, SimulatedSource
+from storage import JournalStore, load_db
+
+
+START = datetime(2024, 3, 1, 12).timestamp() # wall time of clock zero
+STEP = 5 # seconds between timer ticks
+ACTIVE = 200 # seconds of input before the user leaves
+THRESHOLD = 300
+
+
+class Clock:
+    '''
+    Monotonic and wall clock moved by hand.
+    '''
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def wall(self) -> float:
+        return START + self.now
+
+
+class MonitorTest(unittest.TestCase):
+    def test_threshold(self):
+        clock = Clock()
+        source = SimulatedSource(THRESHOLD - 1)
+        monitor = IdleMonitor(source, THRESHOLD, STEP, clock)
+        self.assertEqual(monitor.check(), 0)
+        source.set(THRESHOLD)
+        clock.now += 1
+        # Not queried again until the poll interval passes
+        self.assertEqual(monitor.check(), 0)
+        clock.now += STEP
+        self.assertEqual(monitor.check(), THRESHOLD)
+        source.set(0)
+        monitor.reset()
+        self.assertEqual(monitor.check(), 0)
+
+
+class IdleCase(unittest.TestCase):
+    '''
+    Timers of a project counting while the user works ACTIVE seconds
+    and then leaves.
+    '''
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        self.clock = Clock()
+        self.source = SimulatedSource()
+        self.monitor = IdleMonitor(self.source, THRESHOLD, STEP, self.clock)
+        patcher = mock.patch("time.time", self.clock.wall)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.day = WORKDAY.today()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def timers(self) -> TimerGroup:
+        return TimerGroup(lambda: TimerEngine(clock = self.clock,
+            wall = self.clock.wall))
+
+    def advance(self) -> None:
+        self.clock.now += STEP
+        self.source.set(max(0.0, self.clock.now - ACTIVE))
+
+
+class DaemonTest(IdleCase):
+    def test_subtract(self):
+        db = JournalStore()
+        daemon = Daemon(db, "data.sock", self.monitor)
+        daemon.timers = self.timers()
+        async def run() -> None:
+            daemon.start("work")
+            while True:
+                self.advance()
+                idle_sec = daemon.idle_monitor.check()
+                if idle_sec:
+                    daemon.pause_idle(idle_sec)
+                    return
+                for key, sec in daemon.timers.poll():
+                    daemon.checkpoint(key, sec)
+        asyncio.run(run())
+        self.assertEqual(self.clock.now, ACTIVE + THRESHOLD)
+        self.assertEqual(len(daemon.timers), 0)
+        self.assertEqual(db.day_time("work", self.day), ACTIVE)
+        db.close()
+
+
+class GuiTest(IdleCase):
+    def setUp(self):
+        super().setUp()
+        db = load_db()
+        db.add_project("work")
+        db.close()
+        self.app = gui.Timer(idle_source = self.source)
+        self.app.idle_monitor = self.monitor
+        self.app.timers = self.timers()
+
+    def tearDown(self):
+        self.app.quit_app()
+        super().tearDown()
+
+    def run_idle(self) -> None:
+        self.app.run_timer()
+        while not self.app.idle_keys:
+            self.advance()
+            self.app.tick()
+        self.assertEqual(self.clock.now, ACTIVE + THRESHOLD)
+        self.assertEqual(len(self.app.timers), 0)
+
+    def test_keep(self):
+        self.run_idle()
+        self.assertEqual(self.app.db.day_time("work", self.day),
+            ACTIVE + THRESHOLD)
+        self.app.run_timer()
+        self.assertEqual(self.app.db.day_time("work", self.day),
+            ACTIVE + THRESHOLD)
+        self.assertIn(("work", None), self.app.timers)
+
+    def test_drop(self):
+        self.run_idle()
+        with mock.patch.object(gui.messagebox, "askyesno",
+                return_value = False):
+            self.app.run_timer()
+        self.assertEqual(self.app.db.day_time("work", self.day), ACTIVE)
+        self.assertEqual(self.app.timer_seconds, ACTIVE)
+        self.assertIn(("work", None), self.app.timers)
+
+    def test_subtract(self):
+        with mock.patch.object(idle, "IDLE_ACTION", "subtract"):
+            self.run_idle()
+        self.assertEqual(self.app.db.day_time("work", self.day), ACTIVE)
+        self.app.run_timer()
+        self.assertEqual(self.app.db.day_time("work", self.day), ACTIVE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+'''
+Journal records: torn and corrupted tails, replay by other stores
+and compaction.
+'''
+import sys
+import tempfile
+import unittest
+from datetime import date
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from storage import JournalStore, encode_record
+
+
+DAY = date(2024, 1, 1)
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_file = path.join(self.tmp.name, "data.wtdb")
+        self.db = JournalStore(self.db_file)
+        self.db.add_time("work", DAY, 100)
+        self.db.add_time("work", DAY, 20, tag = "build")
+        self.db.add_time("home", DAY, 50)
+        self.db.close()
+        self.records = self.db.records
+        self.size = path.getsize(self.db.journal_file)
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def reopen(self) -> JournalStore:
+        self.db.close()
+        self.db = JournalStore(self.db_file)
+        return self.db
+
+    def check(self, db: JournalStore) -> None:
+        self.assertEqual(db.day_time("work", DAY), 120)
+        self.assertEqual(db.tag_time("work", "build", DAY), 20)
+        self.assertEqual(db.day_time("home", DAY), 50)
+
+    def test_replay(self):
+        self.check(self.reopen())
+        self.assertEqual(self.db.records, self.records)
+
+    def test_torn_record(self):
+        record = encode_record(["set", "work", DAY.toordinal(), 999])
+        with open(self.db.journal_file, "ab") as f:
+            f.write(record[:len(record) // 2])
+        db = self.reopen()
+        self.check(db)
+        # The torn tail is cut off and the next record follows the last one
+        self.assertEqual(path.getsize(db.journal_file), self.size)
+        db.add_time("home", DAY, 10)
+        self.assertEqual(self.reopen().day_time("home", DAY), 60)
+        self.assertEqual(self.db.records, self.records + 1)
+
+    def test_corrupted_record(self):
+        record = encode_record(["set", "home", DAY.toordinal(), 999])
+        with open(self.db.journal_file, "ab") as f:
+            f.write(b"0" + record[1:])
+            f.write(encode_record(["set", "home", DAY.toordinal(), 7]))
+        # Records after a damaged one are not trusted
+        self.check(self.reopen())
+        self.assertEqual(path.getsize(self.db.journal_file), self.size)
+
+    def test_other_store(self):
+        db = self.reopen()
+        other = JournalStore(self.db_file)
+        try:
+            other.add_time("work", DAY, 30)
+            other.add_project("new")
+            db.add_time("home", DAY, 5)
+            self.assertEqual(db.day_time("work", DAY), 150)
+            self.assertTrue(db.has_project("new"))
+            other.sync()
+            self.assertEqual(other.day_time("home", DAY), 55)
+        finally:
+            other.close()
+
+    def test_compact(self):
+        self.db = JournalStore(self.db_file)
+        self.db.compact(wait = True, force = True)
+        self.assertEqual(self.db.records, 0)
+        self.assertFalse(path.exists(self.db.old_journal_file))
+        self.db.add_time("work", DAY, 1)
+        db = self.reopen()
+        self.assertEqual(db.day_time("work", DAY), 121)
+        self.assertEqual(db.records, 1)
+        self.assertTrue(path.getsize(self.db_file))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,127 @@
+'''
+Import merge policies of both backends, replace and dry run.
+'''
+import argparse
+import io
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from datetime import date
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+import cli
+from merge import merge_rows
+from storage import JournalStore, SqliteStore
+from transfer import ImportResult, apply_import
+
+
+D1, D2, D3 = date(2024, 1, 1), date(2024, 1, 2), date(2024, 1, 3)
+ROWS = [("work", D1, 30), ("work", D2, 50), ("work", D2, 60),
+    ("work", D3, 40), ("garden", D1, 10)]
+MERGED = {
+    "overwrite": [(D1, 30), (D2, 60), (D3, 40)],
+    "sum": [(D1, 130), (D2, 310), (D3, 40)],
+    "max": [(D1, 100), (D2, 200), (D3, 40)],
+}
+
+
+class MergeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def stores(self):
+        '''
+        Yield both backends with the same projects.
+        '''
+        for store, name in ((JournalStore, "data.wtdb"),
+                (SqliteStore, "data.sqlite")):
+            db = store(path.join(self.tmp.name, name))
+            try:
+                with self.subTest(store.__name__):
+                    db.replace({"work": {D1: 100, D2: 200}, "home": {D1: 50}})
+                    yield db
+            finally:
+                db.close()
+
+    def test_policies(self):
+        for db in self.stores():
+            for policy, days in MERGED.items():
+                db.replace({"work": {D1: 100, D2: 200}, "home": {D1: 50}})
+                diff = merge_rows(db, ROWS, policy)
+                self.assertEqual(db.days("work"), days)
+                self.assertEqual(db.days("home"), [(D1, 50)])
+                self.assertEqual(db.days("garden"), [(D1, 10)])
+                self.assertEqual(diff.new_projects, ["garden"])
+                self.assertEqual(diff.projects["work"].added, 1)
+
+    def test_unchanged(self):
+        for db in self.stores():
+            diff = merge_rows(db, [("work", D1, 40), ("work", D2, 300)],
+                "max")
+            self.assertEqual(diff.affected(), ["work"])
+            self.assertEqual(diff.projects["work"].unchanged, 1)
+            self.assertEqual(diff.changes, [("work", D2, 200, 300)])
+
+    def test_unsaved(self):
+        db = JournalStore(path.join(self.tmp.name, "data.wtdb"))
+        try:
+            db.replace({"work": {D1: 100}})
+            db.add_time("work", D1, 5, save = False)
+            merge_rows(db, [("work", D1, 30)])
+            # Seconds of the running timer are kept on top of imported ones
+            self.assertEqual(db.day_time("work", D1), 35)
+        finally:
+            db.close()
+
+    def test_replace(self):
+        for db in self.stores():
+            result = ImportResult()
+            result.projects = {"work": {D3: 40}}
+            self.assertIsNone(apply_import(db, result, "replace"))
+            self.assertEqual(db.project_names(), ["work"])
+            self.assertEqual(db.days("work"), [(D3, 40)])
+
+    def test_dry_run(self):
+        for db in self.stores():
+            diff = merge_rows(db, ROWS, "sum", dry_run = True)
+            self.assertEqual(db.project_names(), ["work", "home"])
+            self.assertEqual(db.days("work"), [(D1, 100), (D2, 200)])
+            self.assertEqual(diff.summary(), "Would merge (sum): " +
+                "2 projects, 1 new, 2 days added, 2 changed, +0.05 h")
+
+    def test_command_line(self):
+        filename = path.join(self.tmp.name, "import.txt")
+        with open(filename, "w") as f:
+            f.write("".join(f"{prj},{day},{sec}\n" for prj, day, sec in ROWS))
+        for db in self.stores():
+            args = argparse.Namespace(file = filename, mode = "sum",
+                dry_run = True)
+            out = io.StringIO()
+            with redirect_stdout(out):
+                self.assertEqual(cli.cmd_import(db, args), 0)
+            lines = out.getvalue().splitlines()
+            self.assertTrue(lines[0].startswith("Imported 5 lines"))
+            self.assertEqual(lines[1:], [
+                "Would merge (sum): 2 projects, 1 new, 2 days added, " +
+                    "2 changed, +0.05 h",
+                "work: 1 added, 2 changed, 0 unchanged, +0.05 h",
+                "garden (new): 1 added, 0 changed, 0 unchanged, +0.00 h",
+                "  work 2024-01-01: 100 -> 130",
+                "  work 2024-01-02: 200 -> 310",
+                "  work 2024-01-03: 0 -> 40",
+                "  garden 2024-01-01: 0 -> 10",
+            ])
+            self.assertEqual(db.days("work"), [(D1, 100), (D2, 200)])
+            args.mode = "replace"
+            with redirect_stdout(io.StringIO()):
+                self.assertEqual(cli.cmd_import(db, args), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+'''
+Journal data with tags migrated to SQLite.
+'''
+import sys
+import tempfile
+import unittest
+from datetime import date
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+from storage import JournalStore, SqliteStore, migrate
+
+
+class MigrateTest(unittest.TestCase):
+    def test_tags(self):
+        day = date(2024, 1, 1)
+        with tempfile.TemporaryDirectory() as tmp:
+            src = JournalStore(path.join(tmp, "data.wtdb"))
+            src.add_time("work", day, 100)
+            src.add_time("work", day, 30, tag = "build")
+            src.add_time("work", day, 20, tag = "meeting")
+            src.add_time("home", day, 10, tag = "garden")
+            src.set_default("home")
+            dst = SqliteStore(path.join(tmp, "data.sqlite"))
+            try:
+                migrate(src, dst)
+                for prj in ("work", "home"):
+                    self.assertEqual(dst.days(prj), src.days(prj))
+                    self.assertEqual(dst.tag_totals(prj), src.tag_totals(prj))
+                self.assertEqual(dst.tag_days("work", "build"), [(day, 30)])
+                self.assertEqual(dst.day_time("work", day), 150)
+                self.assertEqual(dst.default, "home")
+            finally:
+                dst.close()
+                src.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
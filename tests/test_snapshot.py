@@ -0,0 +1,159 @@
+'''
+Versioned snapshot format, lazy decoding of project histories
+and migration of pickle snapshots.
+'''
+import pickle
+import struct
+import sys
+import tempfile
+import unittest
+from array import array
+from datetime import date
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+import snapshot
+from storage import Days, JournalStore, LazyDays
+
+
+D1, D2 = date(2024, 1, 1), date(2024, 1, 5)
+
+
+def history(*pairs) -> tuple:
+    return (array("i", [day.toordinal() for day, sec in pairs]),
+        array("i", [sec for day, sec in pairs]))
+
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_file = path.join(self.tmp.name, "data.wtdb")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def dump(self, codec: str = snapshot.CODEC) -> None:
+        with open(self.db_file, "wb") as f:
+            snapshot.dump(f, "home", {"work": history((D1, 100), (D2, 200)),
+                "home": history((D1, 50))},
+                {"work": {"build": history((D2, 30))}}, codec)
+
+    def test_codecs(self):
+        for codec in snapshot.CODECS:
+            self.dump(codec)
+            snap = snapshot.Snapshot(self.db_file)
+            self.assertEqual(snap.default, "home")
+            prj, entry = snap.projects[0]
+            self.assertEqual(prj, "work")
+            self.assertEqual(entry[snapshot.COUNT], 2)
+            self.assertEqual(entry[snapshot.TOTAL], 300)
+            self.assertEqual(entry[snapshot.CODEC_NAME], codec)
+            self.assertEqual(snap.read(entry), history((D1, 100), (D2, 200)))
+            prj, tag, entry = snap.tags[0]
+            self.assertEqual(snap.read(entry), history((D2, 30)))
+
+    def test_version(self):
+        self.dump()
+        with open(self.db_file, "r+b") as f:
+            f.seek(len(snapshot.MAGIC))
+            f.write(struct.pack("<H", snapshot.VERSION + 1))
+        with self.assertRaisesRegex(ValueError, "newer than supported"):
+            snapshot.Snapshot(self.db_file)
+
+    def test_corrupted_block(self):
+        self.dump()
+        with open(self.db_file, "r+b") as f:
+            f.seek(-1, 2)
+            last = f.read(1)
+            f.seek(-1, 2)
+            f.write(bytes([last[0] ^ 0xff]))
+        snap = snapshot.Snapshot(self.db_file)
+        # The last block is the tag history
+        snap.read(snap.projects[0][1])
+        with self.assertRaisesRegex(ValueError, "Corrupted"):
+            snap.read(snap.tags[0][2])
+
+    def test_lazy(self):
+        self.dump()
+        db = JournalStore(self.db_file)
+        try:
+            self.assertIsInstance(db.projects["work"], LazyDays)
+            self.assertEqual(db.total("work"), 300)
+            self.assertEqual(db.day_count("work"), 2)
+            self.assertEqual(db.tag_totals("work"), {"build": 30})
+            self.assertFalse(db.projects["work"].decoded())
+            self.assertEqual(db.day_time("work", D2), 200)
+            self.assertTrue(db.projects["work"].decoded())
+            self.assertFalse(db.projects["home"].decoded())
+            db.add_time("work", D2, 1)
+            db.compact(wait = True, force = True)
+            self.assertFalse(db.projects["home"].decoded())
+        finally:
+            db.close()
+        db = JournalStore(self.db_file)
+        try:
+            self.assertEqual(db.days("work"), [(D1, 100), (D2, 201)])
+            self.assertEqual(db.days("home"), [(D1, 50)])
+            self.assertEqual(db.default, "home")
+        finally:
+            db.close()
+
+    def test_lazy_codec(self):
+        self.dump("lzma")
+        db = JournalStore(self.db_file)
+        try:
+            self.assertEqual(db.days("home"), [(D1, 50)])
+        finally:
+            db.close()
+
+
+class PickleTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_file = path.join(self.tmp.name, "data.wtdb")
+        self.legacy_file = path.join(self.tmp.name, "data.pyc")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def check(self, db: JournalStore) -> None:
+        self.assertEqual(db.days("work"), [(D1, 100), (D2, 200)])
+        self.assertEqual(db.days("home"), [])
+        self.assertEqual(db.default, "work")
+        self.assertTrue(snapshot.is_snapshot(self.db_file))
+
+    def test_legacy_file(self):
+        # Oldest versions kept {date: seconds} dicts in data.pyc
+        with open(self.legacy_file, "wb") as f:
+            pickle.dump({"projects": {"work": {D1: 100, D2: 200},
+                "home": {}}, "default": "work"}, f)
+        db = JournalStore(self.db_file)
+        try:
+            self.check(db)
+            self.assertFalse(db.legacy)
+        finally:
+            db.close()
+        self.assertFalse(path.exists(self.legacy_file))
+        self.assertTrue(path.exists(self.legacy_file + ".bak"))
+        db = JournalStore(self.db_file)
+        try:
+            self.check(db)
+        finally:
+            db.close()
+
+    def test_pickle_snapshot(self):
+        with open(self.db_file, "wb") as f:
+            pickle.dump({"projects": {"work": Days({D1: 100, D2: 200}),
+                "home": Days()}, "tags": {"work": {"build": Days({D2: 30})}},
+                "default": "work"}, f)
+        db = JournalStore(self.db_file)
+        try:
+            self.check(db)
+            self.assertEqual(db.tag_days("work", "build"), [(D2, 30)])
+        finally:
+            db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
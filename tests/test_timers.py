@@ -0,0 +1,76 @@
+'''
+Timers of one project counting the same seconds can't run at once.
+'''
+import argparse
+import asyncio
+import sys
+import tempfile
+import unittest
+from os import path
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+import cli
+from client import DaemonError
+from daemon import Daemon
+from engine import TimerGroup
+from storage import JournalStore
+
+
+class OverlapTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = JournalStore(path.join(self.tmp.name, "data.wtdb"))
+        self.db.add_project("work")
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def test_group(self):
+        timers = TimerGroup()
+        timers.start(("work", "build"), 0, None)
+        timers.start(("work", "meeting"), 0, None)
+        timers.start(("home", None), 0, None)
+        self.assertEqual(timers.overlapping(("work", None)),
+            ("work", "build"))
+        self.assertEqual(timers.overlapping(("home", "build")),
+            ("home", None))
+        self.assertIsNone(timers.overlapping(("work", "review")))
+        self.assertIsNone(timers.overlapping(("other", None)))
+
+    def test_daemon(self):
+        daemon = Daemon(self.db, path.join(self.tmp.name, "data.sock"))
+        async def run() -> None:
+            daemon.start("work")
+            with self.assertRaises(DaemonError):
+                daemon.start("work", "build")
+            daemon.stop("work")
+            daemon.start("work", "build")
+            with self.assertRaises(DaemonError):
+                daemon.start("work")
+            daemon.start("home")
+        asyncio.run(run())
+        self.assertEqual(daemon.timers.keys(),
+            [("work", "build"), ("home", None)])
+
+    def test_command_line(self):
+        run_file = cli.RUN_FILE
+        cli.RUN_FILE = path.join(self.tmp.name, "data.run")
+        try:
+            def start(tag: str = None) -> int:
+                args = argparse.Namespace(client = None, project = "work",
+                    tag = tag)
+                return cli.cmd_start(self.db, args)
+            self.assertEqual(start("build"), 0)
+            self.assertEqual(start(), 1)
+            self.assertEqual(start("meeting"), 0)
+            with cli.running_timers() as timers:
+                self.assertEqual([timer["tag"] for timer in timers],
+                    ["build", "meeting"])
+        finally:
+            cli.RUN_FILE = run_file
+
+
+if __name__ == "__main__":
+    unittest.main()
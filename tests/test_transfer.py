@@ -0,0 +1,150 @@
+'''
+Import and export files.
+'''
+import sys
+import tempfile
+import unittest
+from datetime import date
+from os import path
+from unittest import mock
+
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
+
+import transfer
+from storage import JournalStore
+from transfer import (EXPORT_FORMATS, Progress, detect_format, export_file,
+    import_file, parse_file)
+
+
+D1, D2 = date(2024, 1, 1), date(2024, 1, 2)
+
+
+class ImportTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.filename = path.join(self.tmp.name, "import.txt")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, text: str) -> None:
+        with open(self.filename, "w") as f:
+            f.write(text)
+
+    def test_errors(self):
+        self.write("work,2024-01-01,100\n" +
+            "work,2024-01-01\n" +
+            "work,2024-13-01,100\n" +
+            "work,2024-01-02,ten\n" +
+            "\n" +
+            "work,2024-01-02,-5\n" +
+            "home, 2024-01-02 ,50\n")
+        result = parse_file(self.filename)
+        self.assertEqual(result.projects, {"work": {D1: 100},
+            "home": {D2: 50}})
+        self.assertEqual(result.errors, [(2, "3 fields for line"),
+            (3, "Wrong date format"), (4, "Wrong seconds format"),
+            (6, "Negative seconds")])
+        self.assertEqual(result.lines, 6)
+        self.assertTrue(result.summary().startswith("Imported 2 lines"))
+        self.assertTrue(result.summary().endswith(
+            "4 errors. Line: 2 3 fields for line"))
+
+    def test_quoted_names(self):
+        self.write('"work, client",2024-01-01,100\n' +
+            '"say ""hi""",2024-01-01,20\n')
+        result = parse_file(self.filename)
+        self.assertEqual(result.errors, [])
+        self.assertEqual(result.projects, {"work, client": {D1: 100},
+            'say "hi"': {D1: 20}})
+
+    def test_jsonl_errors(self):
+        self.write(
+            '{"project": "work", "date": "2024-01-01", "seconds": 9}\n' +
+            '{"project": "work"}\n' +
+            '{"project": 5, "date": "2024-01-01", "seconds": 9}\n' +
+            "not json\n")
+        result = parse_file(self.filename)
+        self.assertEqual(result.projects, {"work": {D1: 9}})
+        self.assertEqual(result.errors, [(2, "3 fields for line"),
+            (3, "Wrong project name"), (4, "3 fields for line")])
+
+    def test_max_errors(self):
+        self.write("bad\n" * 150)
+        with mock.patch.object(transfer, "MAX_ERRORS", 10):
+            result = parse_file(self.filename)
+        self.assertEqual(result.error_count, 150)
+        self.assertEqual(len(result.errors), 10)
+
+    def test_stream(self):
+        self.write("work,2024-01-01,100\nwork,bad,1\nhome,2024-01-02,50\n")
+        db = JournalStore(path.join(self.tmp.name, "data.wtdb"))
+        try:
+            progress = Progress()
+            result, diff = import_file(db, self.filename, "merge",
+                progress = progress)
+            self.assertEqual(result.errors, [(2, "Wrong date format")])
+            self.assertEqual(db.days("work"), [(D1, 100)])
+            self.assertEqual(db.days("home"), [(D2, 50)])
+            self.assertEqual(diff.new_projects, ["work", "home"])
+            self.assertTrue(progress.finished)
+            self.assertEqual(progress.percent(), 100)
+        finally:
+            db.close()
+
+
+class ExportTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = JournalStore(path.join(self.tmp.name, "data.wtdb"))
+        self.db.replace({"work, client": {D1: 100, D2: 200},
+            'say "hi"': {D2: 5}, "home": {D1: 50}, "empty": {}})
+
+    def tearDown(self):
+        self.db.close()
+        self.tmp.cleanup()
+
+    def export(self, fmt: str, *args) -> str:
+        filename = path.join(self.tmp.name, "export" + EXPORT_FORMATS[fmt])
+        self.assertEqual(export_file(filename, self.db.items(*args), fmt),
+            len(list(self.db.items(*args))))
+        self.assertEqual(detect_format(filename), fmt)
+        return filename
+
+    def test_round_trip(self):
+        projects = {prj: dict(self.db.days(prj))
+            for prj in self.db.project_names() if self.db.days(prj)}
+        for fmt in EXPORT_FORMATS:
+            with self.subTest(fmt):
+                result = parse_file(self.export(fmt), "replace")
+                self.assertEqual(result.errors, [])
+                self.assertEqual(result.projects, projects)
+
+    def test_filter(self):
+        for fmt in EXPORT_FORMATS:
+            with self.subTest(fmt):
+                filename = self.export(fmt, ["work, client", "home"], D2)
+                self.assertEqual(parse_file(filename).projects,
+                    {"work, client": {D2: 200}})
+
+    def test_chunks(self):
+        days = {date.fromordinal(D1.toordinal() + idx): idx + 1
+            for idx in range(25)}
+        self.db.replace({"work": days})
+        with mock.patch.object(transfer, "CHUNK_ROWS", 10):
+            for fmt in EXPORT_FORMATS:
+                with self.subTest(fmt):
+                    result = parse_file(self.export(fmt))
+                    self.assertEqual(result.projects, {"work": days})
+
+    def test_cancel(self):
+        filename = path.join(self.tmp.name, "export.txt")
+        progress = Progress()
+        progress.cancelled = True
+        export_file(filename, self.db.items(), "csv", progress)
+        self.assertTrue(progress.finished)
+        self.assertFalse(path.exists(filename))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+'''
+Sessions split at work day boundaries, midnight by default
+or WORKING_TIMER_DAY_START hour.
+'''
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from datetime import date, datetime
+from os import path
+from unittest import mock
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from daemon import Daemon
+from engine import TimerEngine, TimerGroup, WorkDay
+from storage import JournalStore
+
+
+DAY = date(2024, 3, 1)
+NEXT_DAY = date(2024, 3, 2)
+
+
+def stamp(day: date, hour: int, minute: int = 0) -> float:
+    return datetime(day.year, day.month, day.day, hour, minute).timestamp()
+
+
+class Clock:
+    '''
+    Monotonic clock moved by hand and wall clock starting at start.
+    '''
+    def __init__(self, start: float):
+        self.start = start
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def wall(self) -> float:
+        return self.start + self.now
+
+
+class WorkDayTest(unittest.TestCase):
+    def test_midnight(self):
+        workday = WorkDay()
+        self.assertEqual(workday.day(stamp(NEXT_DAY, 0)), NEXT_DAY)
+        self.assertEqual(workday.split(stamp(DAY, 23), stamp(NEXT_DAY, 1, 30)),
+            [(DAY, 3600), (NEXT_DAY, 5400)])
+
+    def test_day_start(self):
+        workday = WorkDay(day_start = 4)
+        self.assertEqual(workday.day(stamp(NEXT_DAY, 3, 59)), DAY)
+        self.assertEqual(workday.day(stamp(NEXT_DAY, 4)), NEXT_DAY)
+        self.assertEqual(workday.split(stamp(DAY, 23), stamp(NEXT_DAY, 5)),
+            [(DAY, 5 * 3600), (NEXT_DAY, 3600)])
+
+    def test_environment(self):
+        code = ("import engine; from datetime import datetime; " +
+            "print(engine.WORKDAY.day(datetime(2024, 3, 2, 3).timestamp()))")
+        env = dict(os.environ, WORKING_TIMER_DAY_START = "4")
+        out = subprocess.run([sys.executable, "-c", code], cwd = ROOT,
+            env = env, capture_output = True, text = True, check = True)
+        self.assertEqual(out.stdout.strip(), DAY.isoformat())
+
+
+class SessionTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock(stamp(DAY, 23, 50))
+
+    def timer(self, workday: WorkDay = WorkDay()) -> TimerEngine:
+        return TimerEngine(clock = self.clock, wall = self.clock.wall,
+            workday = workday)
+
+    def run_timer(self, timer: TimerEngine) -> None:
+        timer.start()
+        while self.clock.now < 1200:
+            self.clock.now += 10
+            timer.poll()
+
+    def test_timer(self):
+        timer = self.timer()
+        self.run_timer(timer)
+        self.assertEqual(timer.day, NEXT_DAY)
+        self.assertEqual(timer.take_ended_days(), [(DAY, 600)])
+        self.assertEqual(timer.stop(), 600)
+        self.assertEqual(timer.take_ended_days(), [])
+
+    def test_day_start(self):
+        timer = self.timer(WorkDay(day_start = 4))
+        self.run_timer(timer)
+        self.assertEqual(timer.stop(), 1200)
+        self.assertEqual(timer.day, DAY)
+        self.assertEqual(timer.take_ended_days(), [])
+
+    def test_daemon(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db = JournalStore(path.join(tmp, "data.wtdb"))
+            daemon = Daemon(db, path.join(tmp, "data.sock"))
+            daemon.timers = TimerGroup(self.timer)
+            async def run() -> None:
+                daemon.start("work", "build")
+                while self.clock.now < 1200:
+                    self.clock.now += 5
+                    for key, sec in daemon.timers.poll():
+                        daemon.checkpoint(key, sec)
+                daemon.stop()
+            try:
+                with mock.patch("time.time", self.clock.wall):
+                    asyncio.run(run())
+                self.assertEqual(db.days("work"),
+                    [(DAY, 600), (NEXT_DAY, 600)])
+                self.assertEqual(db.tag_days("work", "build"),
+                    [(DAY, 600), (NEXT_DAY, 600)])
+            finally:
+                db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
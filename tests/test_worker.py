@@ -0,0 +1,104 @@
+'''
+Background I/O of the GUI (mocked Tk of benchmarks): coalesced saves,
+no disk syncs on the Tk thread and imports applied by a worker.
+'''
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from datetime import date
+from os import path
+from unittest import mock
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, path.join(ROOT, "benchmarks"))
+import mock_tk
+mock_tk.install()
+
+import gui
+from storage import load_db
+
+
+class GuiIOTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        self.syncs = [] # names of threads which synced files
+        fsync = os.fsync
+        def counted(fd: int) -> None:
+            self.syncs.append(threading.current_thread().name)
+            fsync(fd)
+        patcher = mock.patch("os.fsync", counted)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.app.quit_app()
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def open_app(self, backend: str = "journal") -> gui.Timer:
+        db = load_db(backend)
+        for prj in ("a", "b", "c"):
+            db.add_project(prj)
+        db.close()
+        with mock.patch.object(gui, "load_db", lambda: load_db(backend)):
+            self.app = gui.Timer()
+        self.app.config_frame()
+        return self.app
+
+    def wait(self, app: gui.Timer) -> None:
+        while app.io.busy():
+            time.sleep(0.01)
+            app.io.poll()
+
+    def test_saves(self):
+        app = self.open_app()
+        self.syncs = []
+        app.run_timer()
+        for prj in "bcabcabcab":
+            app.choice_project.set(prj)
+            app.cfg_switch_project()
+        app.run_timer()
+        app.db.del_day("a", date.today())
+        self.wait(app)
+        self.assertNotIn("MainThread", self.syncs)
+        # Switches made while a save runs are coalesced
+        self.assertLess(len(self.syncs), 10)
+
+    def import_file(self, app: gui.Timer, mode: str) -> None:
+        with open("import.txt", "w") as f:
+            f.write('"a, b",2024-01-01,100\nbad line\n')
+        with mock.patch.object(gui.fd, "askopenfilename",
+                return_value = "import.txt"):
+            app.import_projects(mode)
+        self.assertTrue(app.io.job)
+        app.run_timer()
+        self.assertFalse(app.timers)
+        self.wait(app)
+
+    def check_import(self, backend: str) -> None:
+        app = self.open_app(backend)
+        self.import_file(app, "sum")
+        self.import_file(app, "sum")
+        self.assertEqual(app.db.days("a, b"), [(date(2024, 1, 1), 200)])
+        self.import_file(app, "replace")
+        self.assertEqual(app.db.project_names(), ["a, b"])
+        self.assertEqual(app.db.undo()[0]["kind"], "replace")
+        self.assertEqual(app.db.project_names(), ["a", "b", "c", "a, b"])
+        app.run_timer()
+        self.assertTrue(app.timers)
+
+    def test_import(self):
+        self.check_import("journal")
+
+    def test_import_sqlite(self):
+        # Applied through a connection of the worker thread
+        self.check_import("sqlite")
+
+if __name__ == "__main__":
+    unittest.main()
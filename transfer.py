@@ -0,0 +1,314 @@
+'''
+Import and export of projects data.
+
+Formats:
+- csv: text lines "project name,date iso,seconds", project names
+  with commas or quotes are quoted.
+- jsonl: JSON Lines {"project": ..., "date": ..., "seconds": ...}.
+- bin: compact binary, BIN_MAGIC header and little-endian int32 pairs:
+  (0, name length) followed by UTF-8 project name starts a project,
+  (day ordinal, seconds) is a day of the current project.
+Files are read and written as streams in chunks.
+'''
+import csv
+import json
+import struct
+import time
+from datetime import date
+from os import path, remove
+
+import instrument
+from merge import MergeDiff, merge_rows
+from storage import merge_value
+
+
+IMPORT_MODES = ("merge", "sum", "max", "replace")
+# Merge policies of import modes, replace mode replaces all projects
+MERGE_MODES = {"merge": "overwrite", "sum": "sum", "max": "max"}
+EXPORT_FORMATS = {"csv": ".txt", "jsonl": ".jsonl", "bin": ".wtx"}
+MAX_ERRORS = 100 # collected import error messages
+CHUNK_ROWS = 10000 # rows per write and progress update
+BIN_MAGIC = b"WTX\x01"
+BIN_PAIR = struct.Struct("<ii")
+
+
+class Progress:
+    '''
+    Progress of a background job, written by the job thread
+    and read by the GUI.
+    '''
+    def __init__(self, total: int = 0):
+        self.total = total # total bytes or rows
+        self.done = 0 # processed bytes or rows
+        self.lines = 0
+        self.started = time.perf_counter()
+        self.finished = False
+        self.cancelled = False
+
+    def percent(self) -> int:
+        if not self.total:
+            return 100
+        return min(100, int(self.done * 100 / self.total))
+
+    def rate(self) -> float:
+        '''
+        Return processed lines per second.
+        '''
+        elapsed = time.perf_counter() - self.started
+        return self.lines / elapsed if elapsed else 0.0
+
+
+class ImportResult:
+    '''
+    Parsed import file: {project: {day: seconds}} and line errors.
+    '''
+    def __init__(self):
+        self.projects = {}
+        self.errors = [] # (line number, message), first MAX_ERRORS
+        self.error_count = 0
+        self.lines = 0
+        self.elapsed = 0.0
+
+    def error(self, line: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append((line, message))
+
+    def summary(self) -> str:
+        text = (f"Imported {self.lines - self.error_count} lines" +
+            f" in {self.elapsed:.1f} s")
+        if self.error_count:
+            line, message = self.errors[0]
+            text += f", {self.error_count} errors. Line: {line} {message}"
+        return text
+
+
+def detect_format(filename: str) -> str:
+    '''
+    Return import file format by its first bytes.
+    '''
+    with open(filename, "rb") as f:
+        head = f.read(len(BIN_MAGIC))
+    if head == BIN_MAGIC:
+        return "bin"
+    if head.lstrip()[:1] == b"{":
+        return "jsonl"
+    return "csv"
+
+def read_csv(f):
+    yield from csv.reader(f)
+
+def read_jsonl(f):
+    for line in f:
+        if not line.strip():
+            yield []
+            continue
+        try:
+            item = json.loads(line)
+            yield [item["project"], item["date"], item["seconds"]]
+        except (ValueError, KeyError, TypeError):
+            yield [line]
+
+def read_bin(f):
+    '''
+    Yield [project, day ordinal, seconds] rows of binary file.
+    '''
+    if f.read(len(BIN_MAGIC)) != BIN_MAGIC:
+        raise ValueError("Not a binary export file")
+    prj = None
+    while True:
+        pair = f.read(BIN_PAIR.size)
+        if len(pair) < BIN_PAIR.size:
+            if pair:
+                yield ["truncated"]
+            return
+        ordinal, value = BIN_PAIR.unpack(pair)
+        if ordinal == 0:
+            prj = f.read(value).decode()
+            continue
+        yield [prj, ordinal, value]
+
+def read_rows(filename: str, result: ImportResult,
+        progress: Progress = None):
+    '''
+    Stream and validate import file, yield (project, day, seconds)
+    of valid lines. Invalid lines are collected as result errors.
+    '''
+    if progress:
+        progress.total = path.getsize(filename)
+    fmt = detect_format(filename)
+    if fmt == "bin":
+        f = open(filename, "rb")
+        reader, to_date, pos = read_bin(f), date.fromordinal, f.tell
+    else:
+        f = open(filename, "r", newline = "")
+        reader = read_jsonl(f) if fmt == "jsonl" else read_csv(f)
+        to_date, pos = date.fromisoformat, f.buffer.tell
+    dates = {} # parsed dates cache, histories share few thousands of days
+    start = time.perf_counter()
+    with f:
+        for idx, row in enumerate(reader, 1):
+            if progress and not idx % CHUNK_ROWS:
+                if progress.cancelled:
+                    break
+                progress.done = pos()
+                progress.lines = idx
+            if not row:
+                continue
+            result.lines += 1
+            if not len(row) == 3:
+                result.error(idx, "3 fields for line")
+                continue
+            prj, _date, sec = row
+            if not isinstance(prj, str):
+                result.error(idx, "Wrong project name")
+                continue
+            prj = prj.strip()
+            if isinstance(_date, str):
+                _date = _date.strip()
+            day = dates.get(_date)
+            if day is None:
+                try:
+                    day = dates[_date] = to_date(_date)
+                except (ValueError, TypeError):
+                    result.error(idx, "Wrong date format")
+                    continue
+            try:
+                sec = int(sec)
+            except (ValueError, TypeError):
+                result.error(idx, "Wrong seconds format")
+                continue
+            if sec < 0:
+                result.error(idx, "Negative seconds")
+                continue
+            yield prj, day, sec
+    result.elapsed = time.perf_counter() - start
+    if progress:
+        progress.done = progress.total
+        progress.lines = result.lines
+        progress.finished = True
+
+@instrument.timed("io.import_parse")
+def parse_file(filename: str, mode: str = "merge",
+        progress: Progress = None) -> ImportResult:
+    '''
+    Read import file into result projects. Repeated (project, day)
+    lines are combined by the merge policy of the mode, the last one
+    wins in replace mode.
+    '''
+    result = ImportResult()
+    policy = MERGE_MODES.get(mode, "overwrite")
+    projects = result.projects
+    for prj, day, sec in read_rows(filename, result, progress):
+        days = projects.get(prj)
+        if days is None:
+            days = projects[prj] = {}
+        if day in days:
+            sec = merge_value(policy, days[day], sec)
+        days[day] = sec
+    return result
+
+@instrument.timed("io.import_apply")
+def apply_import(db, result: ImportResult, mode: str = "merge",
+        dry_run: bool = False) -> MergeDiff:
+    '''
+    Apply parsed import to the database and return the merge diff,
+    None in replace mode. merge: imported days overwrite existing ones,
+    sum: imported seconds are added to existing ones, max: the larger
+    seconds are kept, replace: all projects are replaced.
+    Only imported days of imported projects are touched by merge modes.
+    '''
+    if mode == "replace":
+        if not dry_run:
+            db.replace(result.projects)
+        return None
+    rows = ((prj, day, sec) for prj, days in result.projects.items()
+        for day, sec in days.items())
+    return merge_rows(db, rows, MERGE_MODES[mode], dry_run)
+
+@instrument.timed("io.import_stream")
+def import_file(db, filename: str, mode: str = "merge",
+        dry_run: bool = False, progress: Progress = None) -> tuple:
+    '''
+    Merge import file into the database as it's read and return
+    (ImportResult without projects, MergeDiff). Memory use depends
+    on merge.RUN_ROWS only.
+    '''
+    result = ImportResult()
+    rows = read_rows(filename, result, progress)
+    return result, merge_rows(db, rows, MERGE_MODES[mode], dry_run)
+
+def write_text(f, rows, fmt: str):
+    '''
+    Write rows as CSV or JSON Lines, yield after every chunk.
+    '''
+    writer = csv.writer(f, lineterminator = "\n")
+    chunk = []
+    for prj, day, sec in rows:
+        if fmt == "csv":
+            chunk.append((prj, day.isoformat(), sec))
+        else:
+            chunk.append(json.dumps({"project": prj,
+                "date": day.isoformat(), "seconds": sec}) + "\n")
+        if len(chunk) == CHUNK_ROWS:
+            yield write_chunk(f, writer, chunk, fmt)
+            chunk = []
+    yield write_chunk(f, writer, chunk, fmt)
+
+def write_chunk(f, writer, chunk: list, fmt: str) -> int:
+    if fmt == "csv":
+        writer.writerows(chunk)
+    else:
+        f.write("".join(chunk))
+    return len(chunk)
+
+def write_bin(f, rows):
+    '''
+    Write rows in binary format, yield after every chunk.
+    '''
+    f.write(BIN_MAGIC)
+    chunk = bytearray()
+    count = 0
+    cur_prj = None
+    for prj, day, sec in rows:
+        if prj != cur_prj:
+            name = prj.encode()
+            chunk += BIN_PAIR.pack(0, len(name)) + name
+            cur_prj = prj
+        chunk += BIN_PAIR.pack(day.toordinal(), sec)
+        count += 1
+        if count == CHUNK_ROWS:
+            f.write(chunk)
+            yield count
+            chunk = bytearray()
+            count = 0
+    f.write(chunk)
+    yield count
+
+@instrument.timed("io.export")
+def export_file(filename: str, rows, fmt: str = "csv",
+        progress: Progress = None) -> int:
+    '''
+    Stream (project, day, seconds) rows to the file and return
+    number of rows. Memory use doesn't depend on number of rows.
+    A cancelled export removes the partial file.
+    '''
+    if fmt == "bin":
+        f = open(filename, "wb")
+        chunks = write_bin(f, rows)
+    else:
+        f = open(filename, "w", newline = "")
+        chunks = write_text(f, rows, fmt)
+    count = 0
+    with f:
+        for done in chunks:
+            count += done
+            if progress:
+                progress.done = progress.lines = count
+                if progress.cancelled:
+                    break
+    if progress:
+        progress.finished = True
+        if progress.cancelled:
+            remove(filename)
+    return count
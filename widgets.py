@@ -0,0 +1,309 @@
+'''
+Reusable widgets.
+'''
+import tkinter as tk
+
+
+class VirtualList(tk.Frame):
+    '''
+    Listbox with scrollbar for long sequences of rows.
+    Only visible rows are fetched and rendered: fetch(start, stop)
+    callback returns (key, text) pairs of rows from start to stop.
+    '''
+    def __init__(self, master, fetch, size: int = 0, width: int = 36,
+            height: int = 10, **kwargs):
+        tk.Frame.__init__(self, master, **kwargs)
+        self.fetch = fetch
+        self.size = size # rows in the sequence
+        self.rows = height # visible rows
+        self.top = 0 # index of the first visible row
+        self.keys = [] # keys of rendered rows
+        self.selection = None # selected row index
+
+        self.listbox = tk.Listbox(self, width = width, height = height)
+        self.listbox.grid(row = 0, column = 0)
+        self.yscroll = tk.Scrollbar(self, command = self.yview,
+            orient = tk.VERTICAL)
+        self.yscroll.grid(row = 0, column = 1, sticky = "NS")
+        self.listbox.bind("<<ListboxSelect>>", self.on_select)
+        self.listbox.bind("<MouseWheel>", self.on_wheel)
+        self.listbox.bind("<Button-4>", lambda event: self.scroll(-1))
+        self.listbox.bind("<Button-5>", lambda event: self.scroll(1))
+        self.listbox.bind("<Up>", lambda event: self.move_selection(-1))
+        self.listbox.bind("<Down>", lambda event: self.move_selection(1))
+
+    def set_size(self, size: int, top: int = None) -> None:
+        '''
+        Set new sequence size and render rows from top,
+        by default show the last rows.
+        '''
+        self.size = size
+        self.selection = None
+        self.top = self.size - self.rows if top is None else top
+        self.render()
+
+    def render(self) -> None:
+        '''
+        Fetch and show visible rows.
+        '''
+        self.top = max(0, min(self.top, self.size - self.rows))
+        rows = self.fetch(self.top, min(self.size, self.top + self.rows))
+        self.keys = [key for key, text in rows]
+        self.listbox.delete(0, tk.END)
+        self.listbox.insert(tk.END, *[text for key, text in rows])
+        if self.selection is not None:
+            idx = self.selection - self.top
+            if 0 <= idx < len(self.keys):
+                self.listbox.selection_set(idx)
+        self.update_scrollbar()
+
+    def update_scrollbar(self) -> None:
+        if not self.size:
+            self.yscroll.set(0, 1)
+            return
+        self.yscroll.set(self.top / self.size,
+            min(self.size, self.top + self.rows) / self.size)
+
+    def yview(self, *args) -> None:
+        '''
+        Scrollbar command.
+        '''
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * self.size)
+            self.render()
+        elif args[0] == "scroll":
+            step = self.rows if args[2] == "pages" else 1
+            self.scroll(int(args[1]) * step)
+
+    def scroll(self, rows: int) -> None:
+        top = self.top
+        self.top += rows
+        self.top = max(0, min(self.top, self.size - self.rows))
+        if self.top == top:
+            return
+        if abs(rows) == 1 and len(self.keys) == self.rows:
+            self.shift(rows)
+        else:
+            self.render()
+
+    def shift(self, rows: int) -> None:
+        '''
+        Scroll one row: drop one rendered row and fetch one new row.
+        '''
+        if rows > 0:
+            idx = self.top + self.rows - 1
+            (key, text), = self.fetch(idx, idx + 1)
+            self.listbox.delete(0)
+            self.listbox.insert(tk.END, text)
+            self.keys = self.keys[1:] + [key]
+        else:
+            (key, text), = self.fetch(self.top, self.top + 1)
+            self.listbox.delete(tk.END)
+            self.listbox.insert(0, text)
+            self.keys = [key] + self.keys[:-1]
+        self.listbox.selection_clear(0, tk.END)
+        if self.selection is not None:
+            idx = self.selection - self.top
+            if 0 <= idx < len(self.keys):
+                self.listbox.selection_set(idx)
+        self.update_scrollbar()
+
+    def on_wheel(self, event) -> None:
+        self.scroll(-1 if event.delta > 0 else 1)
+
+    def on_select(self, event) -> None:
+        sel = self.listbox.curselection()
+        if sel:
+            self.selection = self.top + sel[0]
+
+    def move_selection(self, rows: int) -> str:
+        '''
+        Move selection with arrow keys, scroll if it leaves the view.
+        '''
+        if self.selection is None or not self.size:
+            return "break"
+        self.selection = max(0, min(self.size - 1, self.selection + rows))
+        if self.selection < self.top:
+            self.scroll(self.selection - self.top)
+        elif self.selection >= self.top + self.rows:
+            self.scroll(self.selection - self.top - self.rows + 1)
+        self.listbox.selection_clear(0, tk.END)
+        self.listbox.selection_set(self.selection - self.top)
+        return "break"
+
+    def selected_key(self):
+        '''
+        Return key of selected row or None.
+        '''
+        if self.selection is None:
+            return None
+        idx = self.selection - self.top
+        if 0 <= idx < len(self.keys):
+            return self.keys[idx]
+        return self.fetch(self.selection, self.selection + 1)[0][0]
+
+    def delete_selected(self) -> None:
+        '''
+        Remove the selected row from the view. The row must be already
+        removed from the sequence. Only the row is deleted, one row
+        below or above is fetched to fill the view.
+        '''
+        idx = self.selection - self.top
+        self.size -= 1
+        self.selection = None
+        if not 0 <= idx < len(self.keys):
+            self.render()
+            return
+        self.listbox.delete(idx)
+        del self.keys[idx]
+        if self.top + self.rows <= self.size:
+            # Fill the view from below
+            key, text = self.fetch(self.top + self.rows - 1,
+                self.top + self.rows)[0]
+            self.listbox.insert(tk.END, text)
+            self.keys.append(key)
+        elif self.top > 0:
+            # Last rows are shown, fill the view from above
+            self.top -= 1
+            key, text = self.fetch(self.top, self.top + 1)[0]
+            self.listbox.insert(0, text)
+            self.keys.insert(0, key)
+        self.update_scrollbar()
+
+
+class SearchList(tk.Frame):
+    '''
+    Scrollable list of widget rows with a search entry.
+    Widgets are created only for visible rows and reused:
+    make_row(parent, row) creates and grids widgets of one row
+    and returns them, render_row(widgets, key) shows the key in them.
+    Scrolling, search and changes of the keys reconfigure only rows
+    which show other keys than before.
+    '''
+    def __init__(self, master, make_row, render_row, height: int = 10,
+            **kwargs):
+        tk.Frame.__init__(self, master, **kwargs)
+        self.make_row = make_row
+        self.render_row = render_row
+        self.rows = height # visible rows
+        self.keys = [] # all keys
+        self.shown = [] # keys matching the search
+        self.top = 0 # index of the first visible key in shown
+        self.row_widgets = [] # widgets of created rows
+        self.row_keys = [] # keys rendered in created rows
+
+        self.search = tk.StringVar()
+        self.search.trace_add("write", lambda *args: self.on_search())
+        self.entry = tk.Entry(self, textvariable = self.search)
+        self.entry.grid(row = 0, column = 0, columnspan = 2, sticky = "WE")
+        self.body = tk.Frame(self, background = self.cget("background"))
+        self.body.grid(row = 1, column = 0, sticky = "NWE")
+        self.yscroll = tk.Scrollbar(self, command = self.yview,
+            orient = tk.VERTICAL)
+        self.yscroll.grid(row = 1, column = 1, sticky = "NS")
+        self.empty_label = tk.Label(self.body, text = "Nothing found")
+        self.bind_wheel(self.body)
+
+    def bind_wheel(self, widget) -> None:
+        widget.bind("<MouseWheel>",
+            lambda event: self.scroll(-1 if event.delta > 0 else 1))
+        widget.bind("<Button-4>", lambda event: self.scroll(-1))
+        widget.bind("<Button-5>", lambda event: self.scroll(1))
+
+    def set_keys(self, keys: list) -> None:
+        '''
+        Set all keys of the list, nothing is redrawn if they are the same.
+        '''
+        if keys == self.keys:
+            return
+        self.keys = list(keys)
+        self.filter()
+
+    def on_search(self) -> None:
+        self.top = 0
+        self.filter()
+
+    def filter(self) -> None:
+        '''
+        Show keys containing the search text.
+        '''
+        text = self.search.get().lower()
+        if text:
+            self.shown = [key for key in self.keys if text in key.lower()]
+        else:
+            self.shown = self.keys
+        self.render()
+
+    def see(self, key: str) -> None:
+        '''
+        Scroll the list to show the key.
+        '''
+        if key not in self.shown:
+            return
+        idx = self.shown.index(key)
+        if not self.top <= idx < self.top + self.rows:
+            self.top = idx - self.rows + 1 if idx > self.top else idx
+            self.render()
+
+    def refresh(self) -> None:
+        '''
+        Render all visible rows again, when their look depends
+        on state other than keys.
+        '''
+        self.row_keys = [None] * len(self.row_keys)
+        self.render()
+
+    def render(self) -> None:
+        '''
+        Show keys from top in the rows, create missing rows
+        and hide unused ones.
+        '''
+        self.top = max(0, min(self.top, len(self.shown) - self.rows))
+        visible = self.shown[self.top:self.top + self.rows]
+        while len(self.row_widgets) < len(visible):
+            widgets = self.make_row(self.body, len(self.row_widgets))
+            for widget in widgets:
+                self.bind_wheel(widget)
+            self.row_widgets.append(widgets)
+            self.row_keys.append(None)
+        for idx, widgets in enumerate(self.row_widgets):
+            key = visible[idx] if idx < len(visible) else None
+            if key == self.row_keys[idx] and key is not None:
+                continue
+            if key is None:
+                for widget in widgets:
+                    widget.grid_remove()
+            else:
+                for widget in widgets:
+                    widget.grid()
+                self.render_row(widgets, key)
+            self.row_keys[idx] = key
+        if visible:
+            self.empty_label.grid_remove()
+        else:
+            self.empty_label.grid(row = 0, column = 0)
+        self.update_scrollbar()
+
+    def update_scrollbar(self) -> None:
+        size = len(self.shown)
+        if size <= self.rows:
+            self.yscroll.set(0, 1)
+            return
+        self.yscroll.set(self.top / size, (self.top + self.rows) / size)
+
+    def yview(self, *args) -> None:
+        '''
+        Scrollbar command.
+        '''
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * len(self.shown))
+            self.render()
+        elif args[0] == "scroll":
+            step = self.rows if args[2] == "pages" else 1
+            self.scroll(int(args[1]) * step)
+
+    def scroll(self, rows: int) -> None:
+        top = self.top
+        self.top = max(0, min(self.top + rows, len(self.shown) - self.rows))
+        if self.top != top:
+            self.render()
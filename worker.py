@@ -0,0 +1,183 @@
+'''
+Background I/O of the GUI.
+
+IOExecutor runs file jobs (import, export) and database saves in a
+thread pool. Their results and errors come back to the Tk thread
+through a queue polled with after(), so callbacks touch widgets
+on the Tk thread only.
+- One file job runs at a time, it's cancelled through its Progress
+  (see transfer.py) and its progress is shown every PROGRESS_MS.
+- Saves sync changes already written by the Tk thread to disk
+  (see storage.FSYNC). They are coalesced: requests made while a save
+  runs only mark the database dirty and one more save follows it, so
+  saves requested in quick succession never queue up.
+'''
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import instrument
+
+
+IO_WORKERS = 2 # a file job and a save run at once
+POLL_MS = 50 # results queue polling
+PROGRESS_MS = 200 # job progress refresh
+
+
+class Job:
+    '''
+    Background file job.
+    '''
+    def __init__(self, name: str, progress, done, failed = None):
+        self.name = name
+        self.progress = progress
+        self.done = done # called with the result on the Tk thread
+        self.failed = failed # called with the error, status text by default
+        self.future = None
+
+
+class IOExecutor:
+    '''
+    Thread pool of file jobs and saves reporting back to the Tk thread.
+    status shows a text line, e.g. Timer.flash_status.
+    '''
+    def __init__(self, widget, status, workers: int = IO_WORKERS):
+        self.widget = widget
+        self.status = status
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix = "io")
+        self.results = queue.SimpleQueue() # (callback, args) for Tk thread
+        self.job = None # running file job
+        self.save_func = None
+        self.saving = False
+        self.save_again = False # save requested while saving
+        self.poll_job = None
+        self.last_progress = 0.0
+
+    def submit(self, name: str, func, progress, done,
+            failed = None) -> bool:
+        '''
+        Run file job function in background and call done with its
+        result on the Tk thread. Return False if a job is running.
+        '''
+        if self.job:
+            return False
+        job = self.job = Job(name, progress, done, failed)
+        job.future = self.pool.submit(self.run, job, func)
+        self.last_progress = time.monotonic()
+        self.schedule()
+        return True
+
+    def run(self, job: Job, func) -> None:
+        '''
+        Run the job in a worker thread.
+        '''
+        try:
+            result = func()
+        except Exception as error:
+            self.results.put((self.finish, (job, None, error)))
+        else:
+            self.results.put((self.finish, (job, result, None)))
+
+    def finish(self, job: Job, result, error: Exception) -> None:
+        self.job = None
+        if job.progress.cancelled:
+            self.status(f"{job.name} cancelled")
+        elif error is not None:
+            if job.failed:
+                job.failed(error)
+            else:
+                self.status(f"{job.name} error. {error}")
+        else:
+            job.done(result)
+
+    def cancel(self) -> bool:
+        '''
+        Cancel the running job, return False if there is none.
+        The job stops at its next progress update, a job with finished
+        progress (e.g. an import being applied) isn't cancelled.
+        '''
+        job = self.job
+        if not job:
+            return False
+        if job.progress.finished:
+            self.status(f"{job.name} is finishing")
+            return True
+        job.progress.cancelled = True
+        if job.future.cancel():
+            self.results.put((self.finish, (job, None, None)))
+        self.status(f"{job.name} cancelling")
+        return True
+
+    def save(self, func) -> None:
+        '''
+        Run save function in background. Requests made while a save
+        runs are coalesced into one save after it.
+        '''
+        self.save_func = func
+        if self.saving:
+            self.save_again = True
+            if instrument.enabled:
+                instrument.count("io.save_coalesced")
+            return
+        self.saving = True
+        self.pool.submit(self.run_save, func)
+        self.schedule()
+
+    def run_save(self, func) -> None:
+        try:
+            func()
+        except Exception as error:
+            self.results.put((self.saved, (error,)))
+        else:
+            self.results.put((self.saved, (None,)))
+
+    def saved(self, error: Exception) -> None:
+        self.saving = False
+        if error is not None:
+            self.status(f"Save error. {error}")
+        if self.save_again:
+            self.save_again = False
+            self.save(self.save_func)
+
+    def busy(self) -> bool:
+        return bool(self.job or self.saving)
+
+    def schedule(self) -> None:
+        if not self.poll_job:
+            self.poll_job = self.widget.after(POLL_MS, self.poll)
+
+    def poll(self) -> None:
+        '''
+        Run callbacks of finished work and show progress of the job.
+        '''
+        self.poll_job = None
+        while True:
+            try:
+                callback, args = self.results.get_nowait()
+            except queue.Empty:
+                break
+            callback(*args)
+        job = self.job
+        if job and not job.progress.cancelled:
+            now = time.monotonic()
+            if now - self.last_progress >= PROGRESS_MS / 1000:
+                self.last_progress = now
+                self.status(f"{job.name} {job.progress.percent()}% " +
+                    f"{job.progress.rate():.0f} lines/s")
+        if self.busy():
+            self.schedule()
+
+    def shutdown(self) -> None:
+        '''
+        Cancel the job and wait for running work, a save requested
+        meanwhile is done at once. Callbacks aren't called any more.
+        '''
+        if self.job:
+            self.job.progress.cancelled = True
+        if self.poll_job:
+            self.widget.after_cancel(self.poll_job)
+            self.poll_job = None
+        self.pool.shutdown(wait = True)
+        if self.save_again:
+            self.save_again = False
+            self.save_func()